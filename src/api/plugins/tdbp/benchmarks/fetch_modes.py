@@ -0,0 +1,122 @@
+"""Benchmark LRS statements fetch modes of the sliding window indicator.
+
+Each LRS request is served by a fake LRS adding a fixed latency, so that results
+reflect the number of HTTP round trips required by each fetch mode.
+
+Usage:
+
+    python benchmarks/fetch_modes.py --actions 200 --statements 50 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import date, datetime, timedelta
+from typing import List
+from urllib.parse import parse_qs, urlencode
+
+import httpx
+from ralph.backends.data.async_lrs import AsyncLRSDataBackend
+from ralph.backends.data.lrs import LRSDataBackendSettings
+from warren.indicators import BaseIndicator
+
+from warren_tdbp.conf import settings
+from warren_tdbp.indicators import SlidingWindowIndicator
+
+COURSE_IRI = "https://fake-lms.com/course/bench"
+PAGE_SIZE = 500
+
+
+def generate_statements(actions: int, statements: int) -> List[dict]:
+    """Generate `statements` statements for each of the `actions` course actions."""
+    today = datetime.combine(date.today(), datetime.min.time())
+    return [
+        {
+            "id": f"{action}-{index}",
+            "timestamp": (today - timedelta(days=index % 30 + 1)).isoformat(),
+            "actor": {"account": {"name": f"student_{index % 20}"}},
+            "object": {
+                "id": f"https://fake-lms.com/action/{action}",
+                "definition": {"name": {"en": f"Action {action}"}},
+            },
+            "context": {
+                "extensions": {
+                    "http://lrs.learninglocker.net/define/extensions/info": {
+                        "event_name": "\\\\mod_page\\\\event\\\\course_module_viewed"
+                    }
+                }
+            },
+        }
+        for action in range(actions)
+        for index in range(statements)
+    ]
+
+
+def fake_lrs(statements: List[dict], latency: float) -> httpx.AsyncBaseTransport:
+    """Return a fake LRS transport serving paginated statements with a latency."""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        params = {
+            key: values[-1]
+            for key, values in parse_qs(request.url.query.decode()).items()
+        }
+        activity = params["activity"]
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", PAGE_SIZE))
+        selected = [
+            statement
+            for statement in statements
+            if activity in (COURSE_IRI, statement["object"]["id"])
+        ]
+        page = selected[offset : offset + limit]
+        more = None
+        if offset + limit < len(selected):
+            more = f"/xAPI/statements?{urlencode({'offset': offset + limit})}"
+        return httpx.Response(200, json={"statements": page, "more": more})
+
+    return httpx.MockTransport(handler)
+
+
+async def run(mode: str, actions: int, statements: int, latency: float) -> float:
+    """Return the duration of the `get_statements` call for a fetch mode."""
+    course_actions = [
+        f"https://fake-lms.com/action/{action}" for action in range(actions)
+    ]
+
+    class BenchmarkIndicator(SlidingWindowIndicator):
+        async def get_course_actions(self) -> List[str]:
+            return course_actions
+
+    lrs_client = AsyncLRSDataBackend(
+        settings=LRSDataBackendSettings(BASE_URL="http://fake-lrs.com")
+    )
+    lrs_client._client = httpx.AsyncClient(
+        transport=fake_lrs(generate_statements(actions, statements), latency)
+    )
+    BaseIndicator.lrs_client = lrs_client  # type: ignore[misc]
+    settings.LRS_FETCH_MODE = mode  # type: ignore[assignment]
+
+    indicator = BenchmarkIndicator(course_id=COURSE_IRI, sliding_window_min=0)
+    start = time.perf_counter()
+    await indicator.get_statements()
+    duration = time.perf_counter() - start
+    await lrs_client.close()
+    return duration
+
+
+def main():
+    """Run the benchmark for both fetch modes."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--actions", type=int, default=200)
+    parser.add_argument("--statements", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    for mode in ("action", "course"):
+        duration = asyncio.run(run(mode, args.actions, args.statements, args.latency))
+        print(f"{mode:>8}: {duration:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
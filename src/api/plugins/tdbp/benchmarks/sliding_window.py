@@ -0,0 +1,127 @@
+"""Benchmark sliding window search algorithms across course history lengths.
+
+The legacy algorithm steps back one day at a time, filtering statements and
+counting distinct students per action on each step; the incremental algorithm
+(`warren_tdbp.window.find_sliding_window`) unions students bitmaps of the days
+entering the window instead. Active actions requirements are set so that the
+window spans the whole history (worst case).
+
+Usage:
+
+    python benchmarks/sliding_window.py --days 30 90 180 365 --statements 200
+"""
+
+import argparse
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from warren_tdbp.statements import StatementFrame
+from warren_tdbp.window import WindowSearchResult, find_sliding_window
+
+ACTIONS = 50
+ACTORS = 100
+UNTIL = 20000
+
+
+def generate_statements(days: int, statements: int) -> StatementFrame:
+    """Generate `statements` statements per day over `days` days.
+
+    The last action is only made on the first day of the course history.
+    """
+    rng = np.random.default_rng(0)
+    size = days * statements
+    data = pd.DataFrame(
+        {
+            "actor": rng.integers(0, ACTORS, size),
+            "action": rng.integers(0, ACTIONS - 1, size),
+            "day": UNTIL - 1 - np.arange(size) // statements,
+        }
+    )
+    data.loc[data.index[-statements:], "action"] = ACTIONS - 1
+    data["name"] = data["action"]
+    data["module_type"] = 0
+    data["score"] = np.nan
+    return StatementFrame(
+        data.astype({"actor": "int32", "action": "int32", "day": "int32"}),
+        actors=pd.Index([f"student_{code}" for code in range(ACTORS)]),
+        actions=pd.Index([f"action_{code}" for code in range(ACTIONS)]),
+        names=pd.Index([f"name_{code}" for code in range(ACTIONS)]),
+        module_types=pd.Index(["page"]),
+    )
+
+
+def legacy_sliding_window(
+    statements: StatementFrame,
+    until: int,
+    sliding_window_min: int,
+    active_actions_min: int,
+    dynamic_cohort_min: int,
+) -> Optional[WindowSearchResult]:
+    """Search the sliding window stepping back one day at a time."""
+    data = statements.data
+    min_day = data["day"].min()
+    since = until - sliding_window_min
+    active_actions = pd.DataFrame(columns=["action", "name", "module_type"])
+    described = (data["name"] >= 0) & (data["module_type"] >= 0)
+
+    while since >= min_day:
+        in_window = since <= data["day"]
+        window_statements = data[in_window]
+        if window_statements.empty:
+            since -= 1
+            continue
+        cohort = window_statements["actor"].unique()
+        actions = (
+            data[in_window & described]
+            .groupby(["action", "name", "module_type"])["actor"]
+            .nunique()
+            .reset_index()
+            .rename(columns={"actor": "cohort"})
+        )
+        for _, action in actions.iterrows():
+            if action.action in active_actions["action"].values:
+                continue
+            if (
+                0.1 * len(cohort) <= action.cohort
+                and action.cohort >= dynamic_cohort_min
+            ):
+                active_actions.loc[len(active_actions)] = action[
+                    ["action", "name", "module_type"]
+                ]
+        if len(active_actions) >= active_actions_min:
+            return WindowSearchResult(since, active_actions, cohort)
+        since -= 1
+
+    return None
+
+
+def measure(algorithm, statements: StatementFrame) -> float:
+    """Return the duration of a sliding window search."""
+    start = time.perf_counter()
+    result = algorithm(statements, UNTIL, 7, ACTIONS, 1)
+    duration = time.perf_counter() - start
+    if result is None:
+        raise ValueError("No sliding window found")
+    return duration
+
+
+def main():
+    """Run the benchmark for each history length."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 90, 180, 365])
+    parser.add_argument("--statements", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'days':>6} {'statements':>10} {'legacy':>9} {'incremental':>11}")
+    for days in args.days:
+        statements = generate_statements(days, args.statements)
+        legacy = measure(legacy_sliding_window, statements)
+        incremental = measure(find_sliding_window, statements)
+        print(f"{days:>6} {len(statements):>10} {legacy:>8.3f}s {incremental:>10.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,10 +13,29 @@ from warren.tests.fixtures.db import (
     force_db_test_session,
 )
 
-from .fixtures import sliding_window_fake_dataset
+from warren_tdbp.artifacts import artifacts
+from warren_tdbp.context import clear_contexts
+
+from .fixtures import course_statements_fake_dataset, sliding_window_fake_dataset
 
 
 @pytest.fixture
 def non_mocked_hosts() -> list:
     """pytest-httpx: let requests to warren pass untouched."""
     return ["localhost"]
+
+
+@pytest.fixture(autouse=True)
+def computation_contexts():
+    """Start each test with empty indicators computation contexts."""
+    clear_contexts()
+    yield
+    clear_contexts()
+
+
+@pytest.fixture(autouse=True)
+def artifacts_cache():
+    """Start each test with an empty in-process artifacts cache."""
+    artifacts.clear()
+    yield
+    artifacts.clear()
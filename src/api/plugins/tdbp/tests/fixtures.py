@@ -89,3 +89,26 @@ def sliding_window_fake_dataset(monkeypatch, httpx_mock):
         )
 
     return statements
+
+
+@pytest.fixture
+def course_statements_fake_dataset(httpx_mock, sliding_window_fake_dataset):
+    """Mock course statements for the "course" LRS fetch mode.
+
+    Statements of actions that are not indexed as course contents are also
+    returned by the course LRS query.
+    """
+    course_id = "https://fake-lms.com/course/tdbp_101"
+    datetime_until = datetime.combine(datetime.now().date(), time.min)
+
+    httpx_mock.add_response(
+        url=(
+            f"http://fake-lrs.com/xAPI/statements?activity={quote(course_id)}"
+            f"&related_activities=true&until={datetime_until.isoformat()}&limit=500"
+        ),
+        method="GET",
+        json={"statements": sliding_window_fake_dataset},
+        status_code=200,
+    )
+
+    return sliding_window_fake_dataset
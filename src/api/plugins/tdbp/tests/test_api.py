@@ -1,13 +1,26 @@
 """Tests for the TdBP Warren plugin."""
 
-from datetime import datetime
+import json
+import sys
+from datetime import datetime, timedelta
 
 import httpx
 import pytest
 from pydantic import ValidationError
 from warren.utils import LTIUser, forge_lti_token
 
-from warren_tdbp.models import Grades, Scores, SlidingWindow
+from warren_tdbp.artifacts import artifacts
+from warren_tdbp.conf import settings
+from warren_tdbp.context import clear_contexts
+from warren_tdbp.models import (
+    Dashboard,
+    Grades,
+    Scores,
+    SlidingWindow,
+    SlidingWindowHistory,
+)
+
+from .factory import test_settings
 
 
 @pytest.mark.anyio
@@ -65,6 +78,65 @@ async def test_api_sliding_window_with_invalid_auth_headers(
     assert response.json().get("detail") == "Could not validate credentials"
 
 
+@pytest.mark.anyio
+async def test_api_sliding_window_history_with_invalid_params(
+    http_client: httpx.AsyncClient, auth_headers: dict
+):
+    """Test `/window/history` endpoint with invalid date ranges returns 422."""
+    date_until = datetime.now().date()
+    for since_until in (
+        date_until + timedelta(days=1),
+        date_until - timedelta(days=settings.HISTORY_MAX_DAYS),
+    ):
+        response = await http_client.get(
+            "/api/v1/tdbp/window/history",
+            params={"since_until": since_until, "until": date_until},
+            headers=auth_headers,
+        )
+
+        assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_api_sliding_window_history_with_valid_params(
+    http_client: httpx.AsyncClient,
+    db_session,
+    sliding_window_fake_dataset,
+):
+    """Test `/window/history` endpoint returns a sliding window for each day."""
+    date_until = datetime.now().date()
+
+    for role in ("instructor", "student"):
+        token = forge_lti_token(
+            user=LTIUser(id="student_1", email="student_1@example.com"),
+            roles=(role,),
+            course_id="https://fake-lms.com/course/tdbp_101",
+        )
+        response = await http_client.get(
+            "/api/v1/tdbp/window/history",
+            params={
+                "since_until": date_until - timedelta(days=2),
+                "until": date_until,
+            },
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+        assert response.status_code == 200
+        history = SlidingWindowHistory.parse_obj(response.json())
+        assert [window.window.until for window in history.windows] == [
+            date_until - timedelta(days=2),
+            date_until - timedelta(days=1),
+            date_until,
+        ]
+        for window in history.windows:
+            assert window.dynamic_cohort is None or isinstance(
+                window.dynamic_cohort, int
+            )
+            for action in window.active_actions or []:
+                assert action.activation_students is None
+                assert (action.is_activator_student is None) == (role != "student")
+
+
 @pytest.mark.anyio
 async def test_api_cohort_with_invalid_params(
     http_client: httpx.AsyncClient, auth_headers: dict
@@ -330,3 +402,445 @@ async def test_api_grades_with_invalid_auth_headers(
 
     assert response.status_code == 401
     assert response.json().get("detail") == "Could not validate credentials"
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "query_params",
+    [
+        {"until": "today"},  # Wrong "until" parameter data type
+        {"indicators": "unknown"},  # Unknown indicator
+        {"average": 2},  # Wrong "average" parameter data type
+    ],
+)
+async def test_api_dashboard_with_invalid_params(
+    query_params, http_client: httpx.AsyncClient, auth_headers: dict
+):
+    """Test `/dashboard` endpoint with invalid query parameters returns 422."""
+    response = await http_client.get(
+        "/api/v1/tdbp/dashboard",
+        params=query_params,
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_api_dashboard_with_valid_params_instructor(
+    http_client: httpx.AsyncClient,
+    db_session,
+    sliding_window_fake_dataset,
+    httpx_mock,
+):
+    """Test `/dashboard` endpoint computes all indicators from a single load."""
+    token = forge_lti_token(
+        roles=("instructor",),
+        course_id="https://fake-lms.com/course/tdbp_101",
+    )
+    date_until = datetime.now().date()
+
+    response = await http_client.get(
+        "/api/v1/tdbp/dashboard",
+        params={"until": date_until, "average": True, "totals": True},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+
+    try:
+        dashboard = Dashboard.parse_obj(response.json())
+    except ValidationError as err:
+        pytest.fail(f"Dashboard indicators are invalid: {err}")
+
+    assert dashboard.window.dynamic_cohort
+    assert dashboard.cohort
+    assert dashboard.scores.total
+    assert dashboard.grades.average
+
+    # Statements of each course action have been fetched once
+    lrs_requests = [
+        request
+        for request in httpx_mock.get_requests()
+        if request.url.host == "fake-lrs.com"
+    ]
+    assert len(lrs_requests) == test_settings.ACTIVE_ACTIONS
+
+    # Indicators are the same as those returned by their own endpoint
+    response = await http_client.get(
+        "/api/v1/tdbp/scores",
+        params={"until": date_until, "average": True, "totals": True},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert Scores.parse_obj(response.json()) == dashboard.scores
+
+
+@pytest.mark.anyio
+async def test_api_dashboard_with_valid_params_student(
+    http_client: httpx.AsyncClient,
+    db_session,
+    sliding_window_fake_dataset,
+):
+    """Test `/dashboard` endpoint for a student only returns requested indicators."""
+    token = forge_lti_token(
+        user=LTIUser(
+            id="johndoe",
+            email="johndoe@example.com",
+        ),
+        roles=("student",),
+        course_id="https://fake-lms.com/course/tdbp_101",
+    )
+    date_until = datetime.now().date()
+
+    response = await http_client.get(
+        "/api/v1/tdbp/dashboard",
+        params={
+            "until": date_until,
+            "indicators": ["window", "scores"],
+            "average": True,
+            "totals": True,
+        },
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+
+    try:
+        dashboard = Dashboard.parse_obj(response.json())
+    except ValidationError as err:
+        pytest.fail(f"Dashboard indicators are invalid: {err}")
+
+    assert dashboard.cohort is None
+    assert dashboard.grades is None
+    # Student can neither see the dynamic cohort nor scores of other students
+    assert dashboard.window.dynamic_cohort is None
+    assert list(dashboard.scores.scores) == ["johndoe"]
+    assert not dashboard.scores.average
+    assert not dashboard.scores.total
+
+
+@pytest.mark.anyio
+async def test_api_dashboard_inactive_student(
+    http_client: httpx.AsyncClient,
+    db_session,
+    sliding_window_fake_dataset,
+):
+    """Test `/dashboard` endpoint computes every indicator for an inactive student."""
+    token = forge_lti_token(
+        user=LTIUser(
+            id="johndoe",
+            email="johndoe@example.com",
+        ),
+        roles=("student",),
+        course_id="https://fake-lms.com/course/tdbp_101",
+    )
+
+    response = await http_client.get(
+        "/api/v1/tdbp/dashboard",
+        params={"until": datetime.now().date()},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+
+    try:
+        dashboard = Dashboard.parse_obj(response.json())
+    except ValidationError as err:
+        pytest.fail(f"Dashboard indicators are invalid: {err}")
+
+    # The student has no statements, hence no active actions
+    assert dashboard.cohort == {"johndoe": []}
+    assert list(dashboard.scores.scores) == ["johndoe"]
+    assert not dashboard.grades.grades
+    assert dashboard.window.dynamic_cohort is None
+
+
+@pytest.mark.anyio
+async def test_api_dashboard_with_invalid_auth_headers(
+    http_client: httpx.AsyncClient,
+):
+    """Test `/dashboard` endpoint with an invalid `auth_headers`."""
+    date_until = datetime.now().date()
+    response = await http_client.get(
+        "/api/v1/tdbp/dashboard",
+        params={"until": date_until},
+        headers={"Authorization": "Bearer Wrong_Token"},
+    )
+
+    assert response.status_code == 401
+    assert response.json().get("detail") == "Could not validate credentials"
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "endpoint,params,field",
+    [
+        ("cohort", {}, "actions"),
+        ("scores", {"average": True, "totals": True}, "scores"),
+        ("grades", {"average": True}, "grades"),
+    ],
+)
+async def test_api_ndjson_format(  # noqa: PLR0913
+    endpoint,
+    params,
+    field,
+    http_client: httpx.AsyncClient,
+    db_session,
+    sliding_window_fake_dataset,
+):
+    """Test indicators streamed as NDJSON records match their JSON response."""
+    token = forge_lti_token(
+        roles=("instructor",),
+        course_id="https://fake-lms.com/course/tdbp_101",
+    )
+    headers = {"Authorization": f"Bearer {token}"}
+    params["until"] = datetime.now().date()
+
+    expected = (
+        await http_client.get(
+            f"/api/v1/tdbp/{endpoint}", params=params, headers=headers
+        )
+    ).json()
+    response = await http_client.get(
+        f"/api/v1/tdbp/{endpoint}",
+        params={**params, "format": "ndjson"},
+        headers=headers,
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    header, *rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) > 1
+    students = {row["student"]: row[field] for row in rows}
+    if endpoint == "cohort":
+        assert students == expected
+        assert header["actions"]
+    else:
+        assert students == expected[field]
+        assert header == {key: expected[key] for key in header}
+
+
+@pytest.mark.anyio
+async def test_api_ndjson_format_student(
+    http_client: httpx.AsyncClient,
+    db_session,
+    sliding_window_fake_dataset,
+):
+    """Test the cohort streamed to a student does not expose other students."""
+    token = forge_lti_token(
+        user=LTIUser(
+            id="student_2",
+            email="student_2@example.com",
+        ),
+        roles=("student",),
+        course_id="https://fake-lms.com/course/tdbp_101",
+    )
+
+    response = await http_client.get(
+        "/api/v1/tdbp/cohort",
+        params={"until": datetime.now().date(), "format": "ndjson"},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    header, *rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["student"] for row in rows] == ["student_2"]
+    assert header["actions"]
+    for action in header["actions"]:
+        assert action["activation_students"] is None
+        assert action["is_activator_student"] is not None
+    other_students = {
+        statement["actor"]["account"]["name"]
+        for statement in sliding_window_fake_dataset
+    } - {"student_2"}
+    assert not any(student in response.text for student in other_students)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "endpoint,params,field",
+    [
+        ("scores", {"average": True, "totals": True}, "scores"),
+        ("grades", {"average": True}, "grades"),
+    ],
+)
+async def test_api_compact_format(  # noqa: PLR0913
+    endpoint,
+    params,
+    field,
+    http_client: httpx.AsyncClient,
+    db_session,
+    sliding_window_fake_dataset,
+):
+    """Test compact indicators in COO format match their JSON response."""
+    token = forge_lti_token(
+        roles=("instructor",),
+        course_id="https://fake-lms.com/course/tdbp_101",
+    )
+    headers = {"Authorization": f"Bearer {token}"}
+    params["until"] = datetime.now().date()
+
+    expected = (
+        await http_client.get(
+            f"/api/v1/tdbp/{endpoint}", params=params, headers=headers
+        )
+    ).json()
+    response = await http_client.get(
+        f"/api/v1/tdbp/{endpoint}",
+        params={**params, "format": "compact"},
+        headers=headers,
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    compact = response.json()
+    assert compact["students"] == list(expected[field])
+    assert compact["values"]
+    table = {
+        student: [None] * len(compact["actions"]) for student in compact["students"]
+    }
+    for row, column, value in zip(
+        compact["rows"], compact["columns"], compact["values"]
+    ):
+        table[compact["students"][row]][column] = value
+    if endpoint == "scores":
+        # Scores which are not listed are the opposite of activation rates
+        for scores in table.values():
+            for column, action in enumerate(compact["actions"]):
+                if scores[column] is None:
+                    scores[column] = -action["activation_rate"]
+    assert table == expected[field]
+    for key in set(expected) - {field}:
+        assert compact[key] == expected[key]
+
+
+@pytest.mark.anyio
+async def test_api_msgpack_format(
+    http_client: httpx.AsyncClient,
+    db_session,
+    sliding_window_fake_dataset,
+    monkeypatch,
+):
+    """Test compact indicators are encoded with MessagePack if available."""
+    token = forge_lti_token(
+        roles=("instructor",),
+        course_id="https://fake-lms.com/course/tdbp_101",
+    )
+    headers = {"Authorization": f"Bearer {token}"}
+    params = {"until": datetime.now().date(), "average": True}
+
+    expected = (
+        await http_client.get(
+            "/api/v1/tdbp/grades",
+            params={**params, "format": "compact"},
+            headers=headers,
+        )
+    ).json()
+
+    # The msgpack optional dependency is not installed
+    monkeypatch.setitem(sys.modules, "msgpack", None)
+    response = await http_client.get(
+        "/api/v1/tdbp/grades", params={**params, "format": "msgpack"}, headers=headers
+    )
+    assert response.status_code == 406
+    monkeypatch.undo()
+
+    msgpack = pytest.importorskip("msgpack")
+    response = await http_client.get(
+        "/api/v1/tdbp/grades", params={**params, "format": "msgpack"}, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content) == expected
+
+
+@pytest.mark.anyio
+async def test_api_conditional_requests(
+    http_client: httpx.AsyncClient,
+    db_session,
+    sliding_window_fake_dataset,
+    httpx_mock,
+):
+    """Test responses have an entity tag and are not computed if unchanged."""
+    course_id = "https://fake-lms.com/course/tdbp_101"
+    date_until = datetime.now().date()
+    instructor = forge_lti_token(roles=("instructor",), course_id=course_id)
+    student = forge_lti_token(roles=("student",), course_id=course_id)
+
+    def count_statements_requests():
+        return sum(
+            request.url.host == "fake-lrs.com" for request in httpx_mock.get_requests()
+        )
+
+    async def get_window(token, etag=None):
+        headers = {"Authorization": f"Bearer {token}"}
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        return await http_client.get(
+            "/api/v1/tdbp/window", params={"until": date_until}, headers=headers
+        )
+
+    # Entity tags are derived from computed artifacts
+    response = await get_window(instructor)
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+    response = await get_window(instructor)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    statements_requests = count_statements_requests()
+
+    # Unchanged responses are not computed again
+    clear_contexts()
+    artifacts.clear()
+    response = await get_window(instructor, etag)
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert not response.content
+    assert count_statements_requests() == statements_requests
+
+    # Entity tags depend on the role scope and the indicator parameters
+    response = await get_window(student, etag)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    for _ in range(2):
+        # The cohort is computed by the first request
+        response = await http_client.get(
+            "/api/v1/tdbp/cohort",
+            params={"until": date_until, "format": "ndjson"},
+            headers={"Authorization": f"Bearer {instructor}", "If-None-Match": etag},
+        )
+        assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    # Entity tags change once the served artifacts are computed again
+    sliding_window = (await get_window(instructor)).json()
+    clear_contexts()
+    artifacts.invalidate(course_id, db_session)
+    response = await get_window(instructor, etag)
+    assert response.status_code == 200
+    assert response.json() == sliding_window
+    response = await get_window(instructor, etag)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+@pytest.mark.anyio
+async def test_api_conditional_requests_without_validator(
+    http_client: httpx.AsyncClient,
+    db_session,
+    sliding_window_fake_dataset,
+):
+    """Test responses are computed if their entity tag cannot be computed."""
+    token = forge_lti_token(
+        roles=("instructor",), course_id="https://fake-lms.com/course/tdbp_101"
+    )
+
+    # The sliding window has not been computed yet
+    response = await http_client.get(
+        "/api/v1/tdbp/window",
+        params={"until": datetime.now().date()},
+        headers={"Authorization": f"Bearer {token}", "If-None-Match": "*"},
+    )
+
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
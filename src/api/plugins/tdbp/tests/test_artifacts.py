@@ -0,0 +1,320 @@
+"""Tests for the TdBP artifacts cache."""
+
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlmodel import select
+from warren.indicators.models import CacheEntry
+
+from warren_tdbp.artifacts import ArtifactCache, artifacts
+from warren_tdbp.conf import settings
+from warren_tdbp.context import clear_contexts
+from warren_tdbp.indicators import (
+    CohortIndicator,
+    GradesIndicator,
+    ScoresIndicator,
+    SlidingWindowIndicator,
+)
+from warren_tdbp.models import Grades
+from warren_tdbp.statements import StatementFrame
+
+
+def _factory(value, calls):
+    """Return a coroutine function returning a value and recording its calls."""
+
+    async def factory():
+        calls.append(value)
+        return value
+
+    return factory
+
+
+@pytest.mark.anyio
+async def test_artifacts_get_or_compute(db_session):
+    """Test artifacts are computed once and shared through the database."""
+    cache = ArtifactCache()
+    calls = []
+    args = ("course_actions", "course", ())
+
+    assert await cache.get_or_compute(*args, _factory(["a"], calls), db_session) == [
+        "a"
+    ]
+    assert await cache.get_or_compute(*args, _factory(["b"], calls), db_session) == [
+        "a"
+    ]
+    assert calls == [["a"]]
+
+    # Another worker loads the artifact from the shared cache
+    other = ArtifactCache()
+    assert await other.get_or_compute(*args, _factory(["c"], calls), db_session) == [
+        "a"
+    ]
+    assert calls == [["a"]]
+
+    # Artifacts versions are their computation dates, wherever they are cached
+    version = cache.version(*args, db_session)
+    assert version is not None
+    assert other.version(*args, db_session) == version
+    assert ArtifactCache().version(*args, db_session) == version
+    assert cache.version("course_actions", "course", (1,), db_session) is None
+
+    # Artifacts are keyed by their parameters
+    assert await cache.get_or_compute(
+        "course_actions", "course", (1,), _factory(["d"], calls), db_session
+    ) == ["d"]
+    assert len(cache) == 2
+
+
+@pytest.mark.anyio
+async def test_artifacts_get_or_compute_expired(db_session, monkeypatch):
+    """Test expired artifacts are computed again."""
+    monkeypatch.setitem(settings.ARTIFACT_CACHE_TTL, "course_actions", 60)
+    cache = ArtifactCache()
+    calls = []
+    args = ("course_actions", "course", ())
+
+    await cache.get_or_compute(*args, _factory(["a"], calls), db_session)
+    entry = db_session.exec(select(CacheEntry)).one()
+    entry.created_at = datetime.now(timezone.utc) - timedelta(seconds=61)
+    db_session.add(entry)
+    db_session.commit()
+    cache.clear()
+
+    assert await cache.get_or_compute(*args, _factory(["b"], calls), db_session) == [
+        "b"
+    ]
+    assert calls == [["a"], ["b"]]
+    assert db_session.exec(select(CacheEntry)).one().value == ["b"]
+
+
+@pytest.mark.anyio
+async def test_artifacts_get_or_compute_naive_datetime(db_session, monkeypatch):
+    """Test shared artifacts created at naive (UTC) datetimes are not expired."""
+    cache = ArtifactCache()
+    calls = []
+    monkeypatch.setattr(
+        cache,
+        "_get_shared",
+        lambda session, key: CacheEntry(
+            key=key,
+            value=["a"],
+            created_at=datetime.now(timezone.utc).replace(tzinfo=None),
+        ),
+    )
+
+    assert await cache.get_or_compute(
+        "course_actions", "course", (), _factory(["b"], calls), db_session
+    ) == ["a"]
+    assert calls == []
+
+
+@pytest.mark.anyio
+async def test_artifacts_memory_budget(db_session, monkeypatch):
+    """Test least recently used artifacts are evicted beyond the memory budget."""
+    monkeypatch.setattr("warren_tdbp.conf.settings.ARTIFACT_CACHE_SHARED", False)
+    monkeypatch.setattr("warren_tdbp.conf.settings.ARTIFACT_CACHE_MAX_MEMORY", 20)
+    cache = ArtifactCache()
+    calls = []
+
+    for parameter in ("a", "b", "a", "c"):
+        await cache.get_or_compute(
+            "course_actions",
+            "course",
+            (parameter,),
+            _factory([parameter * 5], calls),
+            db_session,
+        )
+
+    # Each artifact is 9 bytes long: "b" has been evicted to cache "c"
+    assert calls == [["aaaaa"], ["bbbbb"], ["ccccc"]]
+    assert len(cache) == 2
+    assert cache.size == 18
+
+    # Artifacts exceeding the budget are not kept in process
+    await cache.get_or_compute(
+        "course_actions", "course", ("d",), _factory(["d" * 40], calls), db_session
+    )
+    assert len(cache) == 2
+    assert not db_session.exec(select(CacheEntry)).all()
+
+
+@pytest.mark.anyio
+async def test_artifacts_invalidate(db_session):
+    """Test artifacts of a course are invalidated in both tiers."""
+    cache = ArtifactCache()
+    calls = []
+    for course in ("course_1", "course_2"):
+        await cache.get_or_compute(
+            "course_actions", course, (), _factory([course], calls), db_session
+        )
+
+    cache.invalidate("course_1", db_session)
+
+    assert len(cache) == 1
+    assert [entry.value for entry in db_session.exec(select(CacheEntry))] == [
+        ["course_2"]
+    ]
+    assert await cache.get_or_compute(
+        "course_actions", "course_1", (), _factory(["new"], calls), db_session
+    ) == ["new"]
+
+
+@pytest.mark.anyio
+async def test_artifacts_statements_serialization(db_session):
+    """Test statements frames are restored from the shared cache."""
+    statements = StatementFrame(
+        pd.DataFrame(
+            {
+                "actor": [1, 0],
+                "action": [0, 0],
+                "name": [0, -1],
+                "module_type": [-1, 0],
+                "day": [19000, 19001],
+                "score": [0.5, float("nan")],
+            }
+        ).astype({"actor": "int32", "action": "int32", "day": "int32"}),
+        actors=pd.Index(["student_0", "student_1"], dtype=object),
+        actions=pd.Index(["https://lms.com/a"], dtype=object),
+        names=pd.Index(["A"], dtype=object),
+        module_types=pd.Index(["\\mod_page\\event\\course_module_viewed"]),
+    )
+    await ArtifactCache().get_or_compute(
+        "statements", "course", (), _factory(statements, []), db_session
+    )
+
+    restored = await ArtifactCache().get_or_compute(
+        "statements", "course", (), _factory(None, []), db_session
+    )
+
+    pd.testing.assert_frame_equal(restored.data, statements.data)
+    for lookup in ("actors", "actions", "names", "module_types"):
+        pd.testing.assert_index_equal(
+            getattr(restored, lookup), getattr(statements, lookup)
+        )
+
+
+def test_artifacts_key_thresholds():
+    """Test sliding window keys depend on the indicator thresholds."""
+    cache = ArtifactCache()
+    keys = {
+        cache.key(
+            "sliding_window",
+            "https://lms.com/course",
+            (date(2024, 1, 1), *thresholds, None),
+        )
+        for thresholds in [(15, 6, 3), (16, 6, 3), (15, 7, 3), (15, 6, 4)]
+    }
+
+    assert len(keys) == 4
+    assert all(len(key) <= 100 for key in keys)
+
+
+@pytest.mark.anyio
+async def test_artifacts_sliding_window_indicator(
+    db_session, sliding_window_fake_dataset, httpx_mock
+):
+    """Test sliding window artifacts are reused by other computation contexts."""
+    course_id = "https://fake-lms.com/course/tdbp_101"
+    sliding_window = await SlidingWindowIndicator(course_id=course_id).compute()
+    requests = len(httpx_mock.get_requests())
+
+    # Another worker computes indicators for the same course
+    artifacts.clear()
+    clear_contexts()
+    assert await SlidingWindowIndicator(course_id=course_id).compute() == sliding_window
+    assert len(httpx_mock.get_requests()) == requests
+
+
+@pytest.mark.anyio
+async def test_artifacts_grades_undefined_average(db_session):
+    """Test undefined grades averages are restored from the shared artifacts tier."""
+    grades = Grades(actions=[], grades={}, average=[0.5, float("nan")])
+    await ArtifactCache().get_or_compute(
+        "grades", "course", (), _factory(grades, []), db_session
+    )
+
+    restored = await ArtifactCache().get_or_compute(
+        "grades", "course", (), _factory(None, []), db_session
+    )
+
+    assert restored.average[0] == 0.5
+    assert np.isnan(restored.average[1])
+
+
+@pytest.mark.anyio
+async def test_artifacts_student_indicators(
+    db_session, sliding_window_fake_dataset, httpx_mock, monkeypatch
+):
+    """Test student indicators are sliced from course-level artifacts."""
+    course_id = "https://fake-lms.com/course/tdbp_101"
+    until = date.today()
+    course = [
+        await indicator_class(course_id=course_id, until=until).compute()
+        for indicator_class in (CohortIndicator, ScoresIndicator, GradesIndicator)
+    ]
+    requests = len(httpx_mock.get_requests())
+
+    # Course-level computations are not run again for students
+    calls = []
+    for indicator_class, method in (
+        (CohortIndicator, "_compute_course_cohort"),
+        (ScoresIndicator, "_compute_course_scores"),
+        (GradesIndicator, "_compute_course_grades"),
+    ):
+        original = getattr(indicator_class, method)
+
+        async def recorded(self, original=original, method=method):
+            calls.append(method)
+            return await original(self)
+
+        monkeypatch.setattr(indicator_class, method, recorded)
+
+    clear_contexts()
+    for student_id in course[0]:
+        cohort, scores, grades = [
+            await indicator_class(
+                course_id=course_id, until=until, student_id=student_id
+            ).compute()
+            for indicator_class in (CohortIndicator, ScoresIndicator, GradesIndicator)
+        ]
+        assert cohort == {student_id: course[0][student_id]}
+        assert scores.actions == course[1].actions
+        assert scores.scores == {student_id: course[1].scores[student_id]}
+        assert all(action.iri in course[0][student_id] for action in grades.actions)
+
+    assert calls == []
+    assert len(httpx_mock.get_requests()) == requests
+
+
+@pytest.mark.anyio
+async def test_artifacts_records_streamed(
+    db_session, sliding_window_fake_dataset, monkeypatch
+):
+    """Test cohort records are streamed from course artifacts without copying them."""
+    course_id = "https://fake-lms.com/course/tdbp_101"
+    until = date.today()
+    scores, grades = [
+        await indicator_class(course_id=course_id, until=until, average=True).compute()
+        for indicator_class in (ScoresIndicator, GradesIndicator)
+    ]
+
+    async def compute(self):
+        raise AssertionError("Per-student results should not be built")
+
+    for indicator_class in (ScoresIndicator, GradesIndicator):
+        monkeypatch.setattr(indicator_class, "compute", compute)
+
+    records = await ScoresIndicator(
+        course_id=course_id, until=until, average=True
+    ).compute_records()
+    assert records.header["total"] is None
+    assert records.header["average"] == scores.average
+    assert {row["student"]: row["scores"] for row in records.rows} == scores.scores
+
+    records = await GradesIndicator(
+        course_id=course_id, until=until, average=True
+    ).compute_records()
+    assert records.header["actions"] == grades.actions
+    assert {row["student"]: row["grades"] for row in records.rows} == grades.grades
@@ -0,0 +1,39 @@
+"""Tests for the TdBP students bitmaps."""
+
+import numpy as np
+
+from warren_tdbp.bitmaps import POPCOUNT, StudentBitmaps
+
+
+def test_bitmaps_popcount():
+    """Test the popcount table counts set bits of each byte value."""
+    assert POPCOUNT.tolist() == [bin(byte).count("1") for byte in range(256)]
+
+
+def test_bitmaps_add():
+    """Test students are added to sets whatever the number of times."""
+    bitmaps = StudentBitmaps(3, 10)
+
+    bitmaps.add([0, 0, 1, 0, 1], [9, 0, 3, 9, 3])
+
+    # Bitmaps of 10 students are packed in 2 bytes
+    assert bitmaps.bits.shape == (3, 2)
+    assert bitmaps.count().tolist() == [2, 1, 0]
+    assert bitmaps.count([1, 0]).tolist() == [1, 2]
+    assert np.unpackbits(bitmaps.bits[0], count=10).nonzero()[0].tolist() == [0, 9]
+
+    # Sets are united with added students
+    bitmaps.add([0, 2], [1, 8])
+    assert bitmaps.count().tolist() == [3, 1, 1]
+
+
+def test_bitmaps_contain():
+    """Test students membership of each set."""
+    bitmaps = StudentBitmaps(2, 10)
+    bitmaps.add([0, 1, 1], [9, 9, 3])
+
+    assert bitmaps.contain(9).tolist() == [True, True]
+    assert bitmaps.contain(3).tolist() == [False, True]
+    assert bitmaps.contain(1).tolist() == [False, False]
+    # Unknown students do not belong to any set
+    assert bitmaps.contain(-1).tolist() == [False, False]
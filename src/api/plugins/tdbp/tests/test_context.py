@@ -0,0 +1,86 @@
+"""Tests for the TdBP indicators computation context."""
+
+import asyncio
+from datetime import date
+
+import pytest
+
+from warren_tdbp.context import ComputationContext, get_context
+
+
+@pytest.mark.anyio
+async def test_context_memoize_concurrent_calls():
+    """Test concurrent calls with the same key share the same computation."""
+    context = ComputationContext("course", date(2024, 1, 1))
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    results = await asyncio.gather(*(context.memoize("foo", factory) for _ in range(5)))
+
+    assert results == [1] * 5
+    assert await context.memoize("foo", factory) == 1
+    assert await context.memoize("bar", factory) == 2
+    assert len(calls) == 2
+
+
+@pytest.mark.anyio
+async def test_context_memoize_failure():
+    """Test failed computations are not memoized."""
+    context = ComputationContext("course", date(2024, 1, 1))
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ValueError("Boom")
+        return "ok"
+
+    with pytest.raises(ValueError, match="Boom"):
+        await context.memoize("foo", factory)
+
+    assert await context.memoize("foo", factory) == "ok"
+    assert len(calls) == 2
+
+
+@pytest.mark.anyio
+async def test_context_peek():
+    """Test memoized results are peeked without being computed."""
+    context = ComputationContext("course", date(2024, 1, 1))
+
+    async def factory():
+        return "ok"
+
+    async def failing_factory():
+        raise ValueError("Boom")
+
+    assert context.peek("foo") is None
+    await context.memoize("foo", factory)
+    assert context.peek("foo") == "ok"
+
+    with pytest.raises(ValueError, match="Boom"):
+        await context.memoize("bar", failing_factory)
+    assert context.peek("bar") is None
+
+
+@pytest.mark.anyio
+async def test_context_get_context(monkeypatch):
+    """Test contexts are shared per course and date, with a TTL and a max size."""
+    monkeypatch.setattr("warren_tdbp.conf.settings.COMPUTATION_CONTEXT_MAX_SIZE", 2)
+
+    context = get_context("course_1", date(2024, 1, 1))
+
+    assert get_context("course_1", date(2024, 1, 1)) is context
+    assert get_context("course_1", date(2024, 1, 2)) is not context
+    assert get_context("course_2", date(2024, 1, 1)) is not context
+
+    # The least recently used context has been discarded
+    assert get_context("course_1", date(2024, 1, 1)) is not context
+
+    # Expired contexts are renewed
+    context = get_context("course_1", date(2024, 1, 1))
+    monkeypatch.setattr("warren_tdbp.conf.settings.COMPUTATION_CONTEXT_TTL", -1)
+    assert get_context("course_1", date(2024, 1, 1)) is not context
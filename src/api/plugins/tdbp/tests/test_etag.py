@@ -0,0 +1,64 @@
+"""Tests for the TdBP responses entity tags."""
+
+from datetime import date
+
+import pytest
+
+from warren_tdbp.artifacts import artifacts
+from warren_tdbp.context import clear_contexts
+from warren_tdbp.etag import get_etag
+from warren_tdbp.indicators import SlidingWindowIndicator, get_artifact_parameters
+from warren_tdbp.models import SlidingWindow, Window
+
+COURSE_ID = "https://lms.com/course"
+UNTIL = date(2024, 1, 10)
+SLIDING_WINDOW = SlidingWindow(
+    window=Window(since=date(2024, 1, 1), until=UNTIL), dynamic_cohort=[]
+)
+
+
+async def _compute_artifact(db_session, kind, value):
+    """Compute a course artifact in the computation context of the course."""
+
+    async def factory():
+        return value
+
+    indicator = SlidingWindowIndicator(course_id=COURSE_ID, until=UNTIL)
+    return await indicator.memoize_artifact(
+        kind, get_artifact_parameters(indicator, kind), factory
+    )
+
+
+@pytest.mark.anyio
+async def test_etag_get_etag(db_session):
+    """Test entity tags change with the served artifacts, scope and parameters."""
+    parameters = [("average", "true"), ("totals", "true")]
+    args = (COURSE_ID, UNTIL, None, parameters, ["cohort"])
+
+    # No entity tag is computed until served artifacts are computed
+    assert get_etag(*args) is None
+    await _compute_artifact(db_session, "cohort", {"student_1": ["action_1"]})
+    assert get_etag(*args) is None
+    await _compute_artifact(db_session, "sliding_window", SLIDING_WINDOW)
+
+    etag = get_etag(*args)
+    assert etag.startswith('"') and etag.endswith('"')
+    # Parameters order does not matter
+    assert get_etag(*args[:3], parameters[::-1], args[4]) == etag
+
+    assert get_etag(*args[:2], "student", *args[3:]) != etag
+    assert get_etag(*args[:3], [("average", "false")], args[4]) != etag
+    assert get_etag(*args[:4], ["window"]) != etag
+    assert get_etag(COURSE_ID, date(2024, 1, 11), *args[2:]) is None
+
+    # Artifacts are looked up in the cache once the context expired
+    clear_contexts()
+    artifacts.clear()
+    assert get_etag(*args) == etag
+
+    # Entity tags change once served artifacts are computed again
+    artifacts.invalidate(COURSE_ID, db_session)
+    assert get_etag(*args) is None
+    await _compute_artifact(db_session, "cohort", {"student_1": ["action_1"]})
+    await _compute_artifact(db_session, "sliding_window", SLIDING_WINDOW)
+    assert get_etag(*args) not in (None, etag)
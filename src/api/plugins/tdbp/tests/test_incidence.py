@@ -0,0 +1,94 @@
+"""Tests for the TdBP incidence matrix."""
+
+import numpy as np
+import pandas as pd
+
+from warren_tdbp.incidence import Incidence
+from warren_tdbp.statements import StatementFrame
+
+
+def _statements(rows):
+    """Return a statements frame of (actor, action, day, score) rows."""
+    actor, action, day, score = zip(*rows)
+    return StatementFrame(
+        pd.DataFrame(
+            {
+                "actor": np.array(actor, dtype=np.int32),
+                "action": np.array(action, dtype=np.int32),
+                "name": np.zeros(len(rows), dtype=np.int32),
+                "module_type": np.zeros(len(rows), dtype=np.int32),
+                "day": np.array(day, dtype=np.int32),
+                "score": np.array(score, dtype=float),
+            }
+        ),
+        actors=pd.Index(["student_0", "student_1", "student_2"], dtype=object),
+        actions=pd.Index(["a", "b", "c", "d"], dtype=object),
+        names=pd.Index(["A"], dtype=object),
+        module_types=pd.Index(["\\mod_quiz\\event\\attempt_submitted"]),
+    )
+
+
+def test_incidence_from_statements():
+    """Test students x actions entries follow statements order per student."""
+    statements = _statements(
+        [
+            (2, 2, 10, np.nan),
+            (0, 1, 10, 0.5),
+            (2, 0, 11, np.nan),
+            (0, 1, 12, 0.7),
+            (2, 2, 12, np.nan),
+            (0, 1, 13, np.nan),
+            # Statements of actions out of the matrix are ignored
+            (1, 3, 10, np.nan),
+        ]
+    )
+
+    incidence = Incidence.from_statements(statements, np.array([0, 1, 2]))
+
+    assert incidence.students.tolist() == [0, 2]
+    assert incidence.indptr.tolist() == [0, 1, 3]
+    assert incidence.row_actions(0).tolist() == [1]
+    assert incidence.row_actions(1).tolist() == [2, 0]
+    # The most recent scored statement gives the grade
+    assert incidence.grades[0] == 0.7
+    assert np.isnan(incidence.grades[1:]).all()
+    assert incidence.to_dense().tolist() == [
+        [False, True],
+        [True, False],
+        [False, True],
+    ]
+
+
+def test_incidence_grades_table():
+    """Test grades tables only keep students having made the selected columns."""
+    statements = _statements(
+        [(0, 0, 10, 0.5), (1, 1, 10, np.nan), (2, 0, 10, np.nan), (2, 2, 11, 0.9)]
+    )
+    incidence = Incidence.from_statements(statements, np.array([0, 1, 2]))
+
+    students, table = incidence.grades_table(np.array([0, 2]))
+
+    assert students.tolist() == [0, 2]
+    np.testing.assert_array_equal(table, [[0.5, np.nan], [np.nan, 0.9]])
+
+    students, table = incidence.grades_table(np.array([], dtype=int))
+    assert students.tolist() == []
+    assert table.shape == (0, 0)
+
+
+def test_incidence_entries():
+    """Test submatrix entries are listed in row-major order."""
+    statements = _statements(
+        [(2, 2, 10, 0.3), (0, 1, 10, 0.5), (2, 0, 11, np.nan), (0, 2, 12, np.nan)]
+    )
+    incidence = Incidence.from_statements(statements, np.array([0, 1, 2]))
+
+    assert incidence.student_rows(np.array([2, 1, 0])).tolist() == [1, -1, 0]
+
+    rows, columns, entries = incidence.entries(np.array([1, -1, 0]), np.array([2, 0]))
+    assert rows.tolist() == [0, 0, 2]
+    assert columns.tolist() == [0, 1, 0]
+    np.testing.assert_array_equal(incidence.grades[entries], [0.3, np.nan, np.nan])
+
+    rows, columns, entries = incidence.entries(np.array([-1]), np.array([0, 1, 2]))
+    assert rows.tolist() == columns.tolist() == entries.tolist() == []
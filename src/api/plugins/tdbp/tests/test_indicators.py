@@ -1,19 +1,30 @@
 """Tests for the TdBP Warren plugin."""
 
-from datetime import datetime
+import json
+from datetime import datetime, time, timedelta
 from typing import List
+from urllib.parse import quote, quote_plus, urljoin
+from uuid import NAMESPACE_URL, uuid3
 
 import pandas as pd
 import pytest
+from ralph.backends.data.async_lrs import AsyncLRSDataBackend
+from ralph.backends.data.lrs import LRSDataBackendSettings
+from warren.exceptions import LrsClientException
+from warren.indicators import BaseIndicator
 
+from warren_tdbp.artifacts import artifacts
+from warren_tdbp.context import clear_contexts
 from warren_tdbp.indicators import (
     CohortIndicator,
     GradesIndicator,
     ScoresIndicator,
     SlidingWindowIndicator,
 )
+from warren_tdbp.models import Activities, Ressources
+from warren_tdbp.statements import StatementFrame, from_epoch_day
 
-from .factory import test_settings
+from .factory import SlidingWindowStatementsFactory, test_settings
 
 
 @pytest.mark.anyio
@@ -306,3 +317,344 @@ async def test_indicators_grades_valid_parameters(
             grades.grades["student_1"][activity_index]
             == statement["result"]["score"]["scaled"]
         )
+
+
+@pytest.mark.anyio
+async def test_indicators_sliding_window_statements_concurrent_fetch(
+    db_session, sliding_window_fake_dataset, monkeypatch
+):
+    """Test statements are fetched concurrently and merged in a stable order."""
+    course_id = "https://fake-lms.com/course/tdbp_101"
+    monkeypatch.setattr("warren_tdbp.conf.settings.LRS_MAX_CONCURRENT_REQUESTS", 2)
+
+    indicator = SlidingWindowIndicator(course_id=course_id)
+    course_actions = await indicator.get_course_actions()
+    statements = await indicator.get_statements()
+
+    # Statements are merged following the course actions order
+    fetched_actions = statements.decode_actions(
+        statements.data["action"].drop_duplicates()
+    )
+    assert fetched_actions == [
+        action for action in course_actions if action in fetched_actions
+    ]
+    assert len(statements) == len(
+        [
+            statement
+            for statement in sliding_window_fake_dataset
+            if statement["object"]["id"] in course_actions
+        ]
+    )
+
+
+@pytest.mark.anyio
+async def test_indicators_sliding_window_statements_lrs_failure(
+    monkeypatch, httpx_mock
+):
+    """Test a failing LRS request raises a LrsClientException."""
+    fake_lrs_url = "http://fake-lrs.com"
+    actions = [f"https://fake-lms.com/action/{idx}" for idx in range(1, 4)]
+
+    async def get_course_actions(self):
+        return actions
+
+    monkeypatch.setattr(
+        BaseIndicator,
+        "lrs_client",
+        AsyncLRSDataBackend(
+            settings=LRSDataBackendSettings(
+                BASE_URL=fake_lrs_url,
+                USERNAME="ralph",
+                PASSWORD="secret",  # noqa: S106
+            )
+        ),
+    )
+    monkeypatch.setattr(
+        SlidingWindowIndicator, "get_course_actions", get_course_actions
+    )
+
+    until = datetime.combine(datetime.now().date(), time.min).isoformat()
+    for action_iri in actions[:-1]:
+        httpx_mock.add_response(
+            url=f"{fake_lrs_url}/xAPI/statements?activity={quote(action_iri)}"
+            f"&until={until}&limit=500",
+            method="GET",
+            json={"statements": []},
+        )
+    httpx_mock.add_response(
+        url=f"{fake_lrs_url}/xAPI/statements?activity={quote(actions[-1])}"
+        f"&until={until}&limit=500",
+        method="GET",
+        status_code=500,
+    )
+
+    indicator = SlidingWindowIndicator(course_id="https://fake-lms.com/course/1")
+    with pytest.raises(LrsClientException, match="Failed to fetch statements"):
+        await indicator.get_statements()
+
+
+@pytest.mark.anyio
+async def test_indicators_sliding_window_course_actions_deduplicated(
+    monkeypatch, httpx_mock
+):
+    """Test course contents are resolved once from the Experience Index."""
+    fake_xi_url = "http://fake-xi.com"
+    monkeypatch.setattr("warren_tdbp.conf.settings.BASE_XI_URL", fake_xi_url)
+    monkeypatch.setattr("warren_tdbp.conf.settings.XI_MAX_CONCURRENT_REQUESTS", 2)
+
+    course_id = "https://fake-lms.com/course/tdbp_101"
+    factory = SlidingWindowStatementsFactory(
+        course_id=course_id, settings=test_settings
+    )
+    course_experience = factory.get_course_experience()
+    # Duplicate course relations
+    course_experience.relations_target += course_experience.relations_target
+
+    httpx_mock.add_response(
+        url=urljoin(fake_xi_url, f"/experiences?iri={quote_plus(course_id)}"),
+        method="GET",
+        json=[json.loads(course_experience.json())],
+    )
+    httpx_mock.add_response(
+        url=urljoin(fake_xi_url, f"/experiences/{factory.course_experience_id}"),
+        method="GET",
+        json=json.loads(course_experience.json()),
+    )
+    expected = []
+    for action_id in range(1, test_settings.ACTIVE_ACTIONS + 1):
+        action_iri = f"https://fake-lms.com/action/{action_id}"
+        expected.append(action_iri)
+        httpx_mock.add_response(
+            url=urljoin(
+                fake_xi_url, f"/experiences/{uuid3(NAMESPACE_URL, action_iri)}"
+            ),
+            method="GET",
+            json=json.loads(
+                factory.get_course_content_experience(source_id=action_iri).json()
+            ),
+        )
+
+    indicator = SlidingWindowIndicator(course_id=course_id)
+    course_actions = await indicator.get_course_actions()
+
+    assert course_actions == expected
+    # The course (looked up by IRI, then by ID) and each distinct content have been
+    # requested once
+    assert len(httpx_mock.get_requests()) == test_settings.ACTIVE_ACTIONS + 2
+
+
+@pytest.mark.anyio
+async def test_indicators_sliding_window_course_fetch_mode(
+    db_session, course_statements_fake_dataset, monkeypatch
+):
+    """Test the "course" LRS fetch mode gives the same results as the default one."""
+    course_id = "https://fake-lms.com/course/tdbp_101"
+    indicator = SlidingWindowIndicator(course_id=course_id)
+
+    monkeypatch.setattr("warren_tdbp.conf.settings.LRS_FETCH_MODE", "action")
+    action_statements = await indicator.get_statements()
+    action_sliding_window = await indicator.compute()
+
+    monkeypatch.setattr("warren_tdbp.conf.settings.LRS_FETCH_MODE", "course")
+    clear_contexts()
+    artifacts.invalidate(course_id, db_session)
+    course_statements = await indicator.get_statements()
+    course_sliding_window = await indicator.compute()
+
+    # Statements of actions which are not course contents have been filtered out
+    course_actions = await indicator.get_course_actions()
+    assert set(course_statements.actions) <= set(course_actions)
+    assert len(course_statements) == len(action_statements)
+    assert course_sliding_window == action_sliding_window
+
+
+@pytest.mark.anyio
+async def test_indicators_shared_computation_context(
+    db_session, sliding_window_fake_dataset, httpx_mock
+):
+    """Test composite indicators fetch course data only once."""
+    course_id = "https://fake-lms.com/course/tdbp_101"
+    date_until = datetime.now().date()
+
+    await ScoresIndicator(course_id=course_id, until=date_until).compute()
+    await GradesIndicator(course_id=course_id, until=date_until).compute()
+    await CohortIndicator(course_id=course_id, until=date_until).compute()
+
+    requests = httpx_mock.get_requests()
+    lrs_requests = [r for r in requests if r.url.host == "fake-lrs.com"]
+    xi_requests = [r for r in requests if r.url.host == "fake-xi.com"]
+
+    # Each course action statements have been fetched once
+    assert len(lrs_requests) == test_settings.ACTIVE_ACTIONS
+    # The course (looked up by IRI, then by ID) and each content have been resolved
+    # once
+    assert len(xi_requests) == test_settings.ACTIVE_ACTIONS + 2
+
+
+@pytest.mark.anyio
+async def test_indicators_sliding_window_history(
+    db_session, sliding_window_fake_dataset, httpx_mock
+):
+    """Test sliding windows of a range of dates are computed from one load."""
+    course_id = "https://fake-lms.com/course/tdbp_101"
+    date_until = datetime.now().date()
+    since_until = date_until - timedelta(days=30)
+
+    history = await SlidingWindowIndicator(
+        course_id=course_id, until=date_until
+    ).compute_history(since_until)
+    sliding_window = await SlidingWindowIndicator(
+        course_id=course_id, until=date_until
+    ).compute()
+
+    assert [window.window.until for window in history.windows] == [
+        since_until + timedelta(days=day) for day in range(31)
+    ]
+    # The last day sliding window is the sliding window until the range end
+    last = history.windows[-1]
+    assert last.window == sliding_window.window
+    assert last.dynamic_cohort == len(sliding_window.dynamic_cohort)
+    assert last.active_actions == [
+        action.copy(update={"activation_students": None})
+        for action in sliding_window.active_actions
+    ]
+    # Sliding windows cannot start before the first statement
+    assert history.windows[0].active_actions is None
+    assert history.windows[0].dynamic_cohort is None
+
+    # Course actions statements have been fetched once
+    lrs_requests = [
+        request
+        for request in httpx_mock.get_requests()
+        if request.url.host == "fake-lrs.com"
+    ]
+    assert len(lrs_requests) == test_settings.ACTIVE_ACTIONS
+
+
+def test_indicators_sliding_window_compute_activation():
+    """Test activation of active actions is computed from all their statements."""
+    statements = StatementFrame(
+        pd.DataFrame(
+            {
+                "actor": [1, 0, 1, 2, 0],
+                "action": [0, 0, 1, 0, 1],
+                "name": [0, 0, 1, 0, 1],
+                "module_type": [0, 0, 1, 0, 1],
+                "day": [19001, 19000, 19003, 19002, 19004],
+                "score": float("nan"),
+            }
+        ),
+        actors=pd.Index(["student_0", "student_1", "student_2"]),
+        actions=pd.Index(["https://lms.com/a", "https://lms.com/b"]),
+        names=pd.Index(["A", "B"]),
+        module_types=pd.Index([Ressources.PAGE.value, Activities.TEST.value]),
+    )
+    active_actions = pd.DataFrame(
+        {"action": [1, 0], "name": [1, 0], "module_type": [1, 0]}
+    )
+    indicator = SlidingWindowIndicator(course_id="https://lms.com/course")
+
+    # 1. For an instructor
+    actions = indicator._compute_activation(statements, active_actions, 2, None)
+
+    assert [action.iri for action in actions] == [
+        "https://lms.com/b",
+        "https://lms.com/a",
+    ]
+    assert [action.activation_date for action in actions] == [
+        from_epoch_day(19003),
+        from_epoch_day(19000),
+    ]
+    # Activation rates are capped
+    assert [action.activation_rate for action in actions] == [1.0, 1.0]
+    assert [action.activation_students for action in actions] == [
+        ["student_1", "student_0"],
+        ["student_1", "student_0", "student_2"],
+    ]
+    assert all(action.is_activator_student is None for action in actions)
+
+    # 2. For a student
+    actions = indicator._compute_activation(statements, active_actions, 4, "student_2")
+
+    assert [action.activation_rate for action in actions] == [0.5, 0.75]
+    assert [action.is_activator_student for action in actions] == [False, True]
+    assert all(action.activation_students is None for action in actions)
+
+    # 3. For an unknown student
+    actions = indicator._compute_activation(statements, active_actions, 4, "foo")
+
+    assert [action.is_activator_student for action in actions] == [False, False]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("student_id", [None, "student_1"])
+async def test_indicators_polars_compute_engine(
+    student_id, db_session, sliding_window_fake_dataset, monkeypatch
+):
+    """Test the "polars" compute engine gives the same results as pandas."""
+    pytest.importorskip("polars")
+    course_id = "https://fake-lms.com/course/tdbp_101"
+    date_until = datetime.now().date()
+    indicators = [
+        SlidingWindowIndicator(course_id=course_id, student_id=student_id),
+        CohortIndicator(course_id=course_id, until=date_until, student_id=student_id),
+        ScoresIndicator(
+            course_id=course_id,
+            until=date_until,
+            student_id=student_id,
+            totals=True,
+            average=True,
+        ),
+        GradesIndicator(
+            course_id=course_id, until=date_until, student_id=student_id, average=True
+        ),
+    ]
+
+    results = {}
+    for engine in ("pandas", "polars"):
+        monkeypatch.setattr("warren_tdbp.conf.settings.COMPUTE_ENGINE", engine)
+        clear_contexts()
+        artifacts.invalidate(course_id, db_session)
+        results[engine] = [await indicator.compute() for indicator in indicators]
+
+    assert type(await indicators[0].get_statements()).__name__ == (
+        "PolarsStatementFrame"
+    )
+    assert results["polars"] == results["pandas"]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("student_id", [None, "student_2", "student_9"])
+@pytest.mark.parametrize(
+    "indicator_class,field", [(ScoresIndicator, "scores"), (GradesIndicator, "grades")]
+)
+async def test_indicators_compute_compact(
+    indicator_class, field, student_id, db_session, sliding_window_fake_dataset
+):
+    """Test compact indicators read from the incidence matrix match indicators."""
+    indicator = indicator_class(
+        course_id="https://fake-lms.com/course/tdbp_101",
+        until=datetime.now().date(),
+        student_id=student_id,
+        average=True,
+    )
+    expected = await indicator.compute()
+    compact = await indicator.compute_compact()
+
+    assert compact["actions"] == expected.actions
+    assert compact["average"] == expected.average
+    assert compact["students"] == list(getattr(expected, field))
+    table = {
+        student: [None] * len(compact["actions"]) for student in compact["students"]
+    }
+    for row, column, value in zip(
+        compact["rows"], compact["columns"], compact["values"]
+    ):
+        table[compact["students"][row]][column] = value
+    if field == "scores":
+        # Scores which are not listed are the opposite of activation rates
+        for scores in table.values():
+            for column, action in enumerate(compact["actions"]):
+                if scores[column] is None:
+                    scores[column] = -action.activation_rate
+    assert table == getattr(expected, field)
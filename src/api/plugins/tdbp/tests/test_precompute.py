@@ -0,0 +1,219 @@
+"""Tests for the TdBP indicators precomputation."""
+
+from datetime import date, datetime, time, timedelta
+from urllib.parse import quote, quote_plus, urljoin
+from uuid import uuid4
+
+import pytest
+from click.testing import CliRunner
+from sqlmodel import select
+from warren.indicators.models import CacheEntry
+
+from warren_tdbp import cli
+from warren_tdbp.artifacts import ArtifactCache
+from warren_tdbp.indicators import (
+    CohortIndicator,
+    GradesIndicator,
+    ScoresIndicator,
+    SlidingWindowIndicator,
+)
+from warren_tdbp.precompute import CoursePrecomputation, list_courses, precompute
+
+COURSE_ID = "https://fake-lms.com/course/tdbp_101"
+
+
+def _lrs_action_url(action_id, since, until):
+    """Return the LRS URL looking for new statements of a course action."""
+    since = datetime.combine(since, time.min).isoformat()
+    until = datetime.combine(until, time.min).isoformat()
+    return (
+        "http://fake-lrs.com/xAPI/statements?"
+        f"activity={quote(f'https://fake-lms.com/action/{action_id}')}"
+        f"&since={since}&until={until}&limit=1"
+    )
+
+
+@pytest.mark.anyio
+async def test_precompute_courses(db_session, sliding_window_fake_dataset, httpx_mock):
+    """Test indicators of courses with new statements are precomputed and cached."""
+    unknown_course_id = "https://fake-lms.com/course/unknown"
+    until = datetime.now().date()
+    since = until - timedelta(days=1)
+
+    # New statements are looked for with a query per course action
+    new_statement = {**sliding_window_fake_dataset[0], "stored": since.isoformat()}
+    for action_id in range(1, 14):
+        httpx_mock.add_response(
+            url=_lrs_action_url(action_id, since, until),
+            json={"statements": [new_statement] if action_id == 13 else []},
+        )
+    httpx_mock.add_response(
+        url=f"http://fake-xi.com/experiences?iri={quote_plus(unknown_course_id)}",
+        json=[],
+    )
+
+    results = await precompute([COURSE_ID, unknown_course_id], until, since, workers=2)
+
+    assert [(result.course_id, result.status) for result in results] == [
+        (COURSE_ID, "computed"),
+        (unknown_course_id, "failed"),
+    ]
+    assert "Unknown course" in results[1].error
+
+    # Course-level results have been cached as artifacts, not as final results
+    for kind in ("sliding_window", "cohort", "scores", "grades"):
+        assert db_session.exec(
+            select(CacheEntry).where(
+                CacheEntry.key.startswith(
+                    f"tdbp-{kind}-{ArtifactCache.course_digest(COURSE_ID)}-"
+                )
+            )
+        ).one_or_none()
+    for indicator_class in (
+        SlidingWindowIndicator,
+        CohortIndicator,
+        ScoresIndicator,
+        GradesIndicator,
+    ):
+        indicator = indicator_class(course_id=COURSE_ID, until=until)
+        assert (
+            db_session.exec(
+                select(CacheEntry).where(CacheEntry.key == indicator.cache_key)
+            ).one_or_none()
+            is None
+        )
+
+    # The course is skipped once no statement has been stored since
+    for action_id in range(1, 14):
+        httpx_mock.add_response(
+            url=_lrs_action_url(action_id, until, until),
+            json={"statements": []},
+        )
+
+    results = await precompute([COURSE_ID], until, until)
+
+    assert [(result.course_id, result.status) for result in results] == [
+        (COURSE_ID, "skipped")
+    ]
+
+
+@pytest.mark.anyio
+async def test_precompute_courses_unexpected_error(monkeypatch):
+    """Test an unexpected error of a course does not cancel other courses."""
+
+    async def fake_precompute_course(course_id, until):
+        if course_id == "course_2":
+            raise ValueError("Unexpected value")
+
+    monkeypatch.setattr(
+        "warren_tdbp.precompute.precompute_course", fake_precompute_course
+    )
+
+    results = await precompute(
+        ["course_1", "course_2", "course_3"], date(2024, 1, 10), workers=1
+    )
+
+    assert [(result.course_id, result.status) for result in results] == [
+        ("course_1", "computed"),
+        ("course_2", "failed"),
+        ("course_3", "computed"),
+    ]
+    assert results[1].error == "Unexpected value"
+
+
+@pytest.mark.anyio
+async def test_precompute_list_courses(httpx_mock, monkeypatch):
+    """Test indexed courses are listed from the Experience Index."""
+    fake_xi_url = "http://fake-xi.com"
+    monkeypatch.setattr("warren_tdbp.conf.settings.BASE_XI_URL", fake_xi_url)
+    monkeypatch.setattr("warren_tdbp.precompute.XI_PAGE_SIZE", 2)
+    experiences = [
+        {
+            "id": str(uuid4()),
+            "iri": f"https://fake-lms.com/course/{index}",
+            "title": {"en": f"Course {index}"},
+            "language": "en",
+            "description": {},
+            "structure": "hierarchical",
+            "aggregation_level": 3,
+            "technical_datatypes": [],
+            "duration": None,
+            "created_at": "2024-01-01T00:00:00",
+            "updated_at": "2024-01-01T00:00:00",
+            "relations_source": [],
+            "relations_target": [],
+        }
+        for index in range(3)
+    ]
+    for offset in (0, 2):
+        httpx_mock.add_response(
+            url=urljoin(
+                fake_xi_url,
+                f"/experiences?aggregation_level=3&offset={offset}&limit=2",
+            ),
+            json=[
+                {"id": experience["id"], "title": experience["title"]}
+                for experience in experiences[offset : offset + 2]
+            ],
+        )
+    for experience in experiences:
+        httpx_mock.add_response(
+            url=urljoin(fake_xi_url, f"/experiences/{experience['id']}"),
+            json=experience,
+        )
+
+    assert await list_courses() == [experience["iri"] for experience in experiences]
+
+
+def test_precompute_command(monkeypatch):
+    """Test the precompute command reports the precomputation of each course."""
+    calls = []
+
+    async def fake_precompute(courses, until, since, workers):
+        calls.append((courses, until, since, workers))
+        return [
+            CoursePrecomputation(courses[0], "computed", 1.5),
+            CoursePrecomputation(courses[1], "skipped", 0.1),
+        ]
+
+    monkeypatch.setattr(cli, "precompute", fake_precompute)
+    runner = CliRunner()
+
+    result = runner.invoke(
+        cli.cli,
+        ["precompute", "-c", "course_1", "-c", "course_2", "--until", "2024-01-10"],
+    )
+    assert result.exit_code == 0
+    assert calls[-1] == (
+        ["course_1", "course_2"],
+        date(2024, 1, 10),
+        date(2024, 1, 9),
+        cli.settings.PRECOMPUTE_WORKERS,
+    )
+    assert result.output.splitlines()[:2] == [
+        "course_1\tcomputed\t1.500s",
+        "course_2\tskipped\t0.100s",
+    ]
+    assert result.output.splitlines()[2].startswith("1 computed, 1 skipped, 0 failed")
+
+    # Courses without new statements are precomputed as well with --all
+    result = runner.invoke(
+        cli.cli, ["precompute", "-c", "course_1", "-c", "course_2", "-a", "-w", "8"]
+    )
+    assert result.exit_code == 0
+    assert calls[-1] == (["course_1", "course_2"], date.today(), None, 8)
+
+
+def test_precompute_command_failure(monkeypatch):
+    """Test the precompute command fails if a course precomputation failed."""
+
+    async def fake_precompute(courses, until, since, workers):
+        return [CoursePrecomputation(courses[0], "failed", 0.5, "Unknown course")]
+
+    monkeypatch.setattr(cli, "precompute", fake_precompute)
+
+    result = CliRunner().invoke(cli.cli, ["precompute", "-c", "course_1"])
+
+    assert result.exit_code == 1
+    assert "course_1\tfailed\t0.500s\tUnknown course" in result.output
+    assert "Failed to precompute 1 course(s)" in result.output
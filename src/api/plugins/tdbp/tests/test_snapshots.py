@@ -0,0 +1,147 @@
+"""Tests for the TdBP indicators snapshots."""
+
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from click.testing import CliRunner
+from sqlmodel import select
+from warren.indicators.models import CacheEntry
+
+from warren_tdbp import cli, snapshots
+from warren_tdbp.artifacts import artifacts
+from warren_tdbp.context import clear_contexts
+from warren_tdbp.indicators import ScoresIndicator
+from warren_tdbp.snapshots import (
+    get_or_compute_snapshot,
+    invalidate_snapshots,
+    is_snapshottable,
+)
+
+COURSE_ID = "https://fake-lms.com/course/tdbp_101"
+
+
+def _factory(value, calls):
+    """Return a coroutine function returning a value and recording its calls."""
+
+    async def factory():
+        calls.append(value)
+        return value
+
+    return factory
+
+
+@pytest.mark.anyio
+async def test_snapshots_get_or_compute(db_session):
+    """Test snapshots are computed once and stored with their date."""
+    calls = []
+    until = date(2024, 1, 10)
+    args = ("cohort", "course_1", until, (until, 15, 6, 3))
+
+    for value in ({"student": ["a"]}, {"student": ["b"]}):
+        assert await get_or_compute_snapshot(
+            *args, _factory(value, calls), db_session
+        ) == {"student": ["a"]}
+    assert calls == [{"student": ["a"]}]
+
+    snapshot = db_session.exec(
+        select(CacheEntry).where(CacheEntry.key.startswith("tdbp_snapshot-cohort-"))
+    ).one()
+    assert snapshot.until == datetime(2024, 1, 10, tzinfo=timezone.utc)
+
+
+def test_snapshots_is_snapshottable():
+    """Test only course-level results until past dates are snapshotted."""
+    yesterday = date.today() - timedelta(days=1)
+
+    assert is_snapshottable("scores", yesterday)
+    assert not is_snapshottable("scores", date.today())
+    assert not is_snapshottable("statements", yesterday)
+
+
+@pytest.mark.anyio
+async def test_snapshots_invalidate(db_session):
+    """Test snapshots of a course are invalidated, optionally for a range of dates."""
+    for course_id in ("course_1", "course_2"):
+        for day in (1, 2, 3):
+            await get_or_compute_snapshot(
+                "cohort",
+                course_id,
+                date(2024, 1, day),
+                (date(2024, 1, day), 15, 6, 3),
+                _factory({}, []),
+                db_session,
+            )
+
+    assert invalidate_snapshots(db_session, "course_1", since=date(2024, 1, 2)) == 2
+    assert invalidate_snapshots(db_session, "course_1", until=date(2024, 1, 2)) == 1
+    assert invalidate_snapshots(db_session, "course_1") == 0
+    assert (
+        invalidate_snapshots(db_session, "course_2", date(2024, 1, 2), date(2024, 1, 2))
+        == 1
+    )
+    assert invalidate_snapshots(db_session, "course_2") == 2
+
+
+@pytest.mark.anyio
+async def test_snapshots_past_dates(
+    db_session, sliding_window_fake_dataset, httpx_mock, monkeypatch
+):
+    """Test results of past dates are served from snapshots until invalidated."""
+    until = date.today()
+
+    # Results until today are considered past results tomorrow
+    class Tomorrow(date):
+        @classmethod
+        def today(cls):
+            return until + timedelta(days=1)
+
+    monkeypatch.setattr(snapshots, "date", Tomorrow)
+
+    def lrs_requests():
+        return [
+            request
+            for request in httpx_mock.get_requests()
+            if request.url.host == "fake-lrs.com"
+        ]
+
+    scores = await ScoresIndicator(course_id=COURSE_ID, until=until).compute()
+    requests = len(lrs_requests())
+
+    # Snapshots outlive artifacts
+    artifacts.invalidate(COURSE_ID, db_session)
+    clear_contexts()
+    assert await ScoresIndicator(course_id=COURSE_ID, until=until).compute() == scores
+    assert len(lrs_requests()) == requests
+
+    # Invalidated results are recomputed
+    invalidate_snapshots(db_session, COURSE_ID)
+    artifacts.invalidate(COURSE_ID, db_session)
+    clear_contexts()
+    assert await ScoresIndicator(course_id=COURSE_ID, until=until).compute() == scores
+    assert len(lrs_requests()) == 2 * requests
+
+
+@pytest.mark.anyio
+async def test_snapshots_invalidate_command(db_session, monkeypatch):
+    """Test the invalidate command invalidates snapshots of courses."""
+    monkeypatch.setattr(cli, "get_session", lambda: db_session)
+    for day in (1, 2):
+        await get_or_compute_snapshot(
+            "cohort",
+            "course_1",
+            date(2024, 1, day),
+            (date(2024, 1, day), 15, 6, 3),
+            _factory({}, []),
+            db_session,
+        )
+
+    result = CliRunner().invoke(
+        cli.cli,
+        ["invalidate", "-c", "course_1", "-c", "course_2", "--since", "2024-01-02"],
+    )
+
+    assert result.exit_code == 0
+    assert result.output.splitlines() == [
+        "course_1\t1 snapshot(s) invalidated",
+        "course_2\t0 snapshot(s) invalidated",
+    ]
@@ -0,0 +1,291 @@
+"""Tests for the TdBP statements ingestion."""
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from warren_tdbp.statements import (
+    ACTOR,
+    COLUMNS,
+    EVENT_NAME,
+    ID,
+    OBJECT_ID,
+    OBJECT_NAME,
+    SCORE,
+    TIMESTAMP,
+    StatementFrame,
+    StatementsAccumulator,
+    from_epoch_day,
+    project_statement,
+    to_epoch_day,
+)
+
+
+def _statement(statement_id, object_id, **kwargs):
+    """Return a minimal xAPI statement."""
+    return {
+        "id": statement_id,
+        "timestamp": "2024-01-01T10:00:00+00:00",
+        "actor": {"account": {"name": "student_1", "homePage": "http://lms.com"}},
+        "verb": {"id": "http://adlnet.gov/expapi/verbs/completed"},
+        "object": {
+            "id": object_id,
+            "definition": {"name": {"fr": f"Nom {object_id}", "en": object_id}},
+        },
+        **kwargs,
+    }
+
+
+def test_statements_project_statement():
+    """Test only fields used by indicators are extracted from a statement."""
+    statement = _statement(
+        "1",
+        "a",
+        context={
+            "extensions": {
+                "http://lrs.learninglocker.net/define/extensions/info": {
+                    "event_name": "\\mod_quiz\\event\\attempt_submitted"
+                },
+                "http://foo.bar": {"baz": 1},
+            }
+        },
+        result={"score": {"scaled": 0.8, "raw": 8}},
+        stored="2024-01-01T10:00:01+00:00",
+    )
+
+    assert project_statement(statement) == (
+        "1",
+        "2024-01-01T10:00:00+00:00",
+        "a",
+        "Nom a",
+        "student_1",
+        "\\mod_quiz\\event\\attempt_submitted",
+        0.8,
+        "2024-01-01T10:00:01+00:00",
+    )
+    assert project_statement({}) == (None,) * len(COLUMNS)
+
+
+def test_statements_accumulator_chunks():
+    """Test statements are projected by chunks into a single typed DataFrame."""
+    accumulator = StatementsAccumulator(chunk_size=2)
+    statements = [
+        _statement("1", "a"),
+        _statement("2", "b", timestamp="2024-01-02T10:00:00.123Z"),
+        _statement("3", "c", result={"score": {"scaled": 0.5}}),
+    ]
+    for statement in statements:
+        accumulator.append(statement)
+
+    # The first page has been converted, the second one is still pending
+    assert len(accumulator._chunks) == 1
+    assert len(accumulator._page) == 1
+    assert len(accumulator) == 3
+
+    frame = accumulator.to_frame()
+
+    assert frame.columns.tolist() == list(COLUMNS)
+    assert frame[ID].tolist() == ["1", "2", "3"]
+    assert frame[OBJECT_ID].tolist() == ["a", "b", "c"]
+    assert frame[OBJECT_NAME].tolist() == ["Nom a", "Nom b", "Nom c"]
+    assert frame[ACTOR].tolist() == ["student_1"] * 3
+    assert frame[EVENT_NAME].isna().all()
+    assert frame[SCORE].dtype == float
+    assert np.isnan(frame[SCORE].tolist()[:2]).all()
+    assert frame[SCORE].tolist()[2] == 0.5
+    assert str(frame[TIMESTAMP].dtype) == "datetime64[ns, UTC]"
+    assert frame[TIMESTAMP].tolist()[1] == pd.Timestamp(
+        "2024-01-02T10:00:00.123", tz="UTC"
+    )
+    # Chunks have been consumed
+    assert len(accumulator) == 0
+
+
+def test_statements_accumulator_duplicates():
+    """Test statements with an already seen identifier are skipped."""
+    seen_ids = set()
+    first = StatementsAccumulator(chunk_size=1, seen_ids=seen_ids)
+    second = StatementsAccumulator(chunk_size=1, seen_ids=seen_ids)
+
+    first.append(_statement("1", "a"))
+    first.append(_statement("1", "a"))
+    second.append(_statement("1", "a"))
+    second.append(_statement("2", "a"))
+    # Statements without identifier are kept
+    second.append(_statement(None, "a"))
+
+    assert len(first) == 1
+    assert len(second) == 2
+    assert seen_ids == {"1", "2"}
+
+
+def test_statements_accumulator_merge():
+    """Test accumulators are merged following their order."""
+    accumulators = []
+    for action in ("b", "a", "c"):
+        accumulator = StatementsAccumulator(chunk_size=10)
+        for index in range(3):
+            accumulator.append(_statement(f"{action}{index}", action))
+        accumulators.append(accumulator)
+
+    merged = StatementsAccumulator.merge(accumulators)
+
+    assert len(merged) == 9
+    assert all(len(accumulator) == 0 for accumulator in accumulators)
+    assert merged.to_frame()[OBJECT_ID].tolist() == ["b"] * 3 + ["a"] * 3 + ["c"] * 3
+
+
+def test_statements_accumulator_voided():
+    """Test voiding statements drop the statements they void."""
+    first = StatementsAccumulator()
+    second = StatementsAccumulator()
+    first.append(_statement("1", "a"))
+    first.append(_statement("2", "a"))
+    second.append(
+        _statement(
+            "3",
+            "1",
+            verb={"id": "http://adlnet.gov/expapi/verbs/voided"},
+            object={"objectType": "StatementRef", "id": "1"},
+        )
+    )
+
+    merged = StatementsAccumulator.merge([first, second])
+
+    assert merged.voided == {"1"}
+    assert merged.to_frame()[ID].tolist() == ["2"]
+
+
+def test_statements_accumulator_empty():
+    """Test an empty accumulator returns an empty DataFrame."""
+    frame = StatementsAccumulator().to_frame()
+    assert frame.empty
+    assert frame.columns.tolist() == list(COLUMNS)
+
+
+def test_statements_epoch_days():
+    """Test dates conversion from and to epoch days."""
+    assert to_epoch_day(date(1970, 1, 1)) == 0
+    assert to_epoch_day(date(2024, 1, 1)) == 19723
+    assert from_epoch_day(19723) == date(2024, 1, 1)
+
+
+def test_statements_frame_encoding():
+    """Test projected statements are dictionary-encoded."""
+    accumulator = StatementsAccumulator()
+    accumulator.append(_statement("1", "b", timestamp="2024-01-02T23:59:59+00:00"))
+    accumulator.append(_statement("2", "a", actor={"account": {"name": "student_2"}}))
+    accumulator.append(_statement("3", "b", result={"score": {"scaled": 0.5}}))
+    # Statements without actor cannot be attributed
+    accumulator.append(_statement("4", "c", actor={"mbox": "mailto:foo@bar.com"}))
+
+    statements = StatementFrame.from_frame(accumulator.to_frame())
+
+    assert len(statements) == 3
+    assert statements.actors.tolist() == ["student_1", "student_2"]
+    # Codes order follows values order
+    assert statements.actions.tolist() == ["a", "b", "c"]
+    assert statements.data["actor"].tolist() == [0, 1, 0]
+    assert statements.data["action"].tolist() == [1, 0, 1]
+    assert statements.data["name"].tolist() == [1, 0, 1]
+    assert statements.data["module_type"].tolist() == [-1, -1, -1]
+    assert statements.data["day"].tolist() == [19724, 19723, 19723]
+    assert np.isnan(statements.data["score"].tolist()[:2]).all()
+    assert statements.data["score"].tolist()[2] == 0.5
+    assert str(statements.data["actor"].dtype) == "int32"
+    assert str(statements.data["day"].dtype) == "int32"
+
+    assert statements.actor_code("student_2") == 1
+    assert statements.actor_code("student_3") == -1
+    assert statements.action_codes(["b", "d"]).tolist() == [1, -1]
+    assert statements.decode_actors([1, 0]) == ["student_2", "student_1"]
+    assert statements.decode_actions([2, 0]) == ["c", "a"]
+
+    filtered = statements.filter(statements.data["action"] == 1)
+    assert len(filtered) == 2
+    assert filtered.actions is statements.actions
+
+
+def test_statements_frame_rollup():
+    """Test statements are rolled up into daily facts keeping their latest score."""
+    accumulator = StatementsAccumulator()
+    # A student viewing a page several times a day is a single fact
+    for index in range(40):
+        accumulator.append(_statement(f"view_{index}", "b"))
+    accumulator.append(_statement("view_40", "b", timestamp="2024-01-02T10:00:00Z"))
+    accumulator.append(_statement("other", "a", actor={"account": {"name": "s_2"}}))
+    # The most recent score of a fact is kept, whatever statements order
+    for statement_id, hour, score in (("1", 12, 0.8), ("2", 11, 0.5), ("3", 13, None)):
+        accumulator.append(
+            _statement(
+                statement_id,
+                "c",
+                timestamp=f"2024-01-01T{hour}:00:00Z",
+                result={"score": {"scaled": score}},
+            )
+        )
+
+    statements = StatementFrame.from_frame(accumulator.to_frame())
+
+    assert len(statements) == 4
+    assert statements.data["actor"].tolist() == [1, 1, 0, 1]
+    assert statements.data["action"].tolist() == [1, 1, 0, 2]
+    assert statements.data["day"].tolist() == [19723, 19724, 19723, 19723]
+    assert np.isnan(statements.data["score"].tolist()[:3]).all()
+    assert statements.data["score"].tolist()[3] == 0.8
+
+
+def test_statements_frame_actor_codes():
+    """Test actors codes lookup, unknown actors being coded -1."""
+    statements = StatementFrame(
+        pd.DataFrame(
+            {
+                "actor": [0, 2],
+                "action": [0, 0],
+                "name": [0, 0],
+                "module_type": [0, 0],
+                "day": [19723, 19723],
+                "score": [np.nan, np.nan],
+            }
+        ),
+        actors=pd.Index([f"student_{index}" for index in range(4)], dtype=object),
+        actions=pd.Index(["a"], dtype=object),
+        names=pd.Index(["A"], dtype=object),
+        module_types=pd.Index(["\\mod_page\\event\\course_module_viewed"]),
+    )
+
+    assert statements.actor_code("student_2") == 2
+    assert statements.actor_codes(["student_3", "unknown"]).tolist() == [3, -1]
+
+
+def test_statements_frame_bitmaps():
+    """Test bitmaps of students who made actions match their activators."""
+    statements = StatementFrame(
+        pd.DataFrame(
+            {
+                "actor": [0, 9, 9, 3, 0, 3],
+                "action": [1, 1, 0, 0, 2, 0],
+                "name": [0] * 6,
+                "module_type": [0] * 6,
+                "day": [19723, 19723, 19724, 19725, 19725, 19726],
+                "score": [np.nan] * 6,
+            }
+        ).astype({"actor": np.int32, "action": np.int32, "day": np.int32}),
+        actors=pd.Index([f"student_{index}" for index in range(10)], dtype=object),
+        actions=pd.Index(["a", "b", "c"], dtype=object),
+        names=pd.Index(["A"], dtype=object),
+        module_types=pd.Index(["\\mod_page\\event\\course_module_viewed"]),
+    )
+    action_codes = [1, 0]
+
+    bitmaps = statements.bitmaps(action_codes)
+    activation = statements.activations(action_codes).loc[action_codes]
+
+    assert activation["day"].tolist() == [19723, 19724]
+    assert activation["activators"].tolist() == [[0, 9], [9, 3]]
+    assert bitmaps.count().tolist() == [2, 2]
+    for student in range(-1, 10):
+        assert bitmaps.contain(student).tolist() == [
+            student in activators for activators in activation["activators"]
+        ]
@@ -0,0 +1,225 @@
+"""Tests for the TdBP statements store."""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import parse_qs
+
+import httpx
+import pandas as pd
+import pytest
+from ralph.backends.data.async_lrs import AsyncLRSDataBackend
+from ralph.backends.data.lrs import LRSDataBackendSettings
+from warren.indicators import BaseIndicator
+
+from warren_tdbp.statements import ID, TIMESTAMP, StatementsAccumulator
+from warren_tdbp.store import StatementStore, get_watermark
+
+
+def _statement(statement_id, object_id, stored, **kwargs):
+    """Return a minimal xAPI statement stored in the LRS at a date."""
+    return {
+        "id": statement_id,
+        "timestamp": stored,
+        "stored": stored,
+        "actor": {"account": {"name": "student_1", "homePage": "http://lms.com"}},
+        "verb": {"id": "http://adlnet.gov/expapi/verbs/completed"},
+        "object": {"id": object_id, "definition": {"name": {"en": object_id}}},
+        **kwargs,
+    }
+
+
+def _frame(*statements):
+    """Return projected statements."""
+    accumulator = StatementsAccumulator()
+    for statement in statements:
+        accumulator.append(statement)
+    return accumulator.to_frame()
+
+
+def test_store_write_load(tmp_path):
+    """Test stored statements are loaded as they have been written."""
+    store = StatementStore(tmp_path, "https://lms.com/course")
+    assert store.load() is None
+
+    frame = _frame(
+        _statement(
+            "1", "a", "2024-01-01T10:00:00+00:00", result={"score": {"scaled": 0.5}}
+        ),
+        _statement("2", "b", "2024-01-02T10:00:00+00:00"),
+    )
+    store.write(frame, ["a", "b"], [])
+    stored = store.load()
+
+    pd.testing.assert_frame_equal(stored.frame, frame)
+    assert stored.actions == {"a", "b"}
+    assert stored.voided == set()
+    assert stored.watermark == datetime(2024, 1, 2, 10, tzinfo=timezone.utc)
+
+
+def test_store_append(tmp_path, monkeypatch):
+    """Test statements are appended to the store and segments are compacted."""
+    monkeypatch.setattr("warren_tdbp.conf.settings.STATEMENT_STORE_MAX_SEGMENTS", 2)
+    store = StatementStore(tmp_path, "https://lms.com/course")
+
+    for day in range(1, 5):
+        store.write(
+            _frame(_statement(str(day), "a", f"2024-01-0{day}T10:00:00+00:00")),
+            ["a"],
+            [],
+        )
+    # Empty ingestions do not move the watermark
+    store.write(_frame(), ["b"], [])
+    stored = store.load()
+
+    assert stored.frame[ID].tolist() == ["1", "2", "3", "4"]
+    assert stored.watermark == datetime(2024, 1, 4, 10, tzinfo=timezone.utc)
+    assert stored.actions == {"a", "b"}
+    assert len(list(store.path.glob("segment-*.npz"))) == 2
+
+    # Replacing the store content drops previous segments
+    store.write(
+        _frame(_statement("5", "a", "2024-01-05T10:00:00+00:00")), ["a"], [], True
+    )
+    assert store.load().frame[ID].tolist() == ["5"]
+    assert len(list(store.path.glob("segment-*.npz"))) == 1
+
+
+def test_store_concurrent_writes(tmp_path, monkeypatch):
+    """Test concurrent writers of a course store do not lose statements."""
+    monkeypatch.setattr("warren_tdbp.conf.settings.STATEMENT_STORE_MAX_SEGMENTS", 2)
+
+    def write(day):
+        # Each writer appends a new statement and one already written by another
+        StatementStore(tmp_path, "https://lms.com/course").write(
+            _frame(
+                _statement(str(day), "a", f"2024-01-{day:02}T10:00:00+00:00"),
+                _statement("0", "a", "2024-01-01T09:00:00+00:00"),
+            ),
+            ["a"],
+            [],
+        )
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(write, range(1, 25)))
+    stored = StatementStore(tmp_path, "https://lms.com/course").load()
+
+    assert sorted(stored.frame[ID].tolist(), key=int) == [str(i) for i in range(25)]
+    assert stored.watermark == datetime(2024, 1, 24, 10, tzinfo=timezone.utc)
+
+
+def test_store_voided(tmp_path):
+    """Test statements voided after their ingestion are not loaded."""
+    store = StatementStore(tmp_path, "https://lms.com/course")
+    store.write(
+        _frame(
+            _statement("1", "a", "2024-01-01T10:00:00+00:00"),
+            _statement("2", "a", "2024-01-01T11:00:00+00:00"),
+        ),
+        ["a"],
+        [],
+    )
+    store.write(_frame(), ["a"], ["1"])
+
+    stored = store.load()
+    assert stored.frame[ID].tolist() == ["2"]
+    assert stored.voided == {"1"}
+
+
+def test_store_corrupted(tmp_path):
+    """Test corrupted stores are not loaded."""
+    store = StatementStore(tmp_path, "https://lms.com/course")
+    store.write(_frame(_statement("1", "a", "2024-01-01T10:00:00+00:00")), ["a"], [])
+    next(store.path.glob("segment-*.npz")).write_bytes(b"corrupted")
+
+    assert store.load() is None
+
+
+def test_store_get_watermark():
+    """Test the watermark falls back to timestamps of statements."""
+    statement = _statement("1", "a", "2024-01-01T10:00:00+00:00")
+    del statement["stored"]
+    frame = _frame(statement)
+
+    assert get_watermark(frame) == frame[TIMESTAMP][0].to_pydatetime()
+    assert get_watermark(frame.iloc[:0]) is None
+
+
+@pytest.mark.anyio
+async def test_store_indicator_incremental_fetch(tmp_path, monkeypatch):
+    """Test indicators only fetch statements stored since the store watermark."""
+    from warren_tdbp.indicators import SlidingWindowIndicator
+
+    monkeypatch.setattr("warren_tdbp.conf.settings.STATEMENT_STORE_PATH", tmp_path)
+    monkeypatch.setattr("warren_tdbp.conf.settings.STATEMENT_STORE_OVERLAP", 60)
+    today = datetime.combine(date.today(), datetime.min.time(), timezone.utc)
+    lrs = [
+        _statement("1", "https://lms.com/a", (today - timedelta(days=3)).isoformat()),
+        _statement("2", "https://lms.com/b", (today - timedelta(days=2)).isoformat()),
+    ]
+    queries = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        params = {
+            key: values[-1]
+            for key, values in parse_qs(request.url.query.decode()).items()
+        }
+        queries.append(params)
+        since = params.get("since")
+        targets = {statement["id"]: statement for statement in lrs}
+        # Voiding statements match filters of the statement they void
+        statements = [
+            statement
+            for statement in lrs
+            if targets.get(statement["object"]["id"], statement)["object"]["id"]
+            == params["activity"]
+        ]
+        if since:
+            since = datetime.fromisoformat(since)
+            statements = [
+                statement
+                for statement in statements
+                if datetime.fromisoformat(statement["stored"]) > since
+            ]
+        return httpx.Response(200, json={"statements": statements})
+
+    lrs_client = AsyncLRSDataBackend(
+        settings=LRSDataBackendSettings(BASE_URL="http://fake-lrs.com")
+    )
+    lrs_client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(BaseIndicator, "lrs_client", lrs_client)
+
+    class StoreIndicator(SlidingWindowIndicator):
+        async def get_course_actions(self):
+            return ["https://lms.com/a", "https://lms.com/b"]
+
+    indicator = StoreIndicator(course_id="https://lms.com/course")
+
+    # The whole history is ingested first
+    statements = await indicator._load_statements()
+    assert len(statements) == 2
+    assert all("since" not in query and "until" not in query for query in queries)
+
+    # Then only statements stored since the watermark are fetched
+    queries.clear()
+    lrs.append(
+        _statement("3", "https://lms.com/a", (today - timedelta(days=1)).isoformat())
+    )
+    lrs.append(
+        _statement(
+            "4",
+            "https://lms.com/a",
+            (today - timedelta(hours=1)).isoformat(),
+            verb={"id": "http://adlnet.gov/expapi/verbs/voided"},
+            object={"objectType": "StatementRef", "id": "1"},
+        )
+    )
+    statements = await indicator._load_statements()
+    watermark = today - timedelta(days=2, seconds=60)
+    assert [query["since"] for query in queries] == [watermark.isoformat()] * 2
+    # The voided statement is dropped, statements after the indicator date as well
+    assert len(statements) == 2
+    assert StatementStore(tmp_path, "https://lms.com/course").load().frame[
+        ID
+    ].tolist() == ["2", "3"]
+
+    await lrs_client.close()
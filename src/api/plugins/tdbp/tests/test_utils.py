@@ -0,0 +1,86 @@
+"""Tests for the TdBP utilities."""
+
+import json
+from datetime import date
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from warren_tdbp.models import Action, Activities, Ressources
+from warren_tdbp.utils import dataframe_to_pydantic, iter_ndjson
+
+
+@pytest.fixture
+def actions():
+    """Return a dataframe of actions having an invalid row."""
+    return pd.DataFrame(
+        {
+            "iri": ["a", "b", "c", "d"],
+            "name": ["A", "B", None, "D"],
+            "module_type": [
+                Ressources.PAGE.value,
+                Activities.TEST.value,
+                Ressources.BOOK.value,
+                "\\mod_foo\\event\\course_module_viewed",
+            ],
+            "activation_date": [date(2024, 1, 1)] * 4,
+            "activation_rate": [0.5, 1.0, 0.2, 0.3],
+            "is_activator_student": [True, False, True, None],
+            "extra": [1, 2, 3, 4],
+        }
+    )
+
+
+@pytest.mark.parametrize("trusted", [False, True])
+def test_utils_dataframe_to_pydantic(trusted, actions):
+    """Test invalid rows are rejected at once and valid ones converted."""
+    with patch("warren_tdbp.utils.logger") as logger:
+        result = dataframe_to_pydantic(Action, actions, trusted=trusted)
+
+    assert result == [
+        Action(
+            iri="a",
+            name="A",
+            module_type=Ressources.PAGE,
+            activation_date=date(2024, 1, 1),
+            activation_rate=0.5,
+            is_activator_student=True,
+        ),
+        Action(
+            iri="b",
+            name="B",
+            module_type=Activities.TEST,
+            activation_date=date(2024, 1, 1),
+            activation_rate=1.0,
+            is_activator_student=False,
+        ),
+    ]
+    logger.warning.assert_called_once()
+    assert logger.warning.call_args.args[1:] == (2, "Action", [2, 3])
+
+
+def test_utils_dataframe_to_pydantic_missing_required_column(actions):
+    """Test no row is converted when a required column is missing."""
+    assert dataframe_to_pydantic(Action, actions.drop(columns="iri")) == []
+
+
+def test_utils_iter_ndjson():
+    """Test records are serialized as newline-delimited JSON, one at a time."""
+    action = Action(
+        iri="a",
+        name="A",
+        module_type=Ressources.PAGE,
+        activation_date=date(2024, 1, 1),
+        activation_rate=0.5,
+    )
+    rows = iter([{"student": "s1", "scores": [0.5]}, {"student": "s2", "scores": []}])
+
+    lines = iter_ndjson({"actions": [action]}, rows)
+
+    header = json.loads(next(lines))
+    assert header["actions"][0]["module_type"] == Ressources.PAGE.value
+    assert header["actions"][0]["activation_date"] == "2024-01-01"
+    # Rows are consumed lazily
+    assert next(rows) == {"student": "s1", "scores": [0.5]}
+    assert list(lines) == ['{"student": "s2", "scores": []}\n']
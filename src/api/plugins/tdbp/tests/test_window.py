@@ -0,0 +1,199 @@
+"""Tests for the TdBP sliding window search."""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from warren_tdbp.statements import StatementFrame, get_statement_frame_class
+from warren_tdbp.window import (
+    WindowHistorySearch,
+    WindowSearchResult,
+    find_sliding_window,
+)
+
+
+def _random_statements(seed: int, days: int = 60, size: int = 2000):
+    """Return a random statements frame spread over `days` days."""
+    rng = np.random.default_rng(seed)
+    actors = rng.integers(0, 40, size)
+    actions = rng.integers(0, 25, size)
+    data = pd.DataFrame(
+        {
+            "actor": actors,
+            "action": actions,
+            # Actions are mostly recorded with a single name and module type
+            "name": np.where(rng.random(size) < 0.05, -1, actions % 20),
+            "module_type": np.where(rng.random(size) < 0.05, rng.integers(-1, 3), 1),
+            "day": rng.integers(19000, 19000 + days, size),
+            "score": np.nan,
+        }
+    ).astype({column: np.int32 for column in ("actor", "action", "day")})
+    return get_statement_frame_class()(
+        data,
+        actors=pd.Index([f"student_{code}" for code in range(40)]),
+        actions=pd.Index([f"action_{code}" for code in range(25)]),
+        names=pd.Index([f"name_{code}" for code in range(20)]),
+        module_types=pd.Index(["assign", "page", "quiz"]),
+    )
+
+
+def _reference_sliding_window(
+    statements: StatementFrame,
+    until: int,
+    sliding_window_min: int,
+    active_actions_min: int,
+    dynamic_cohort_min: int,
+) -> Optional[WindowSearchResult]:
+    """Search the sliding window stepping back one day at a time."""
+    data = statements.data
+    since = until - sliding_window_min
+    active_actions = pd.DataFrame(columns=["action", "name", "module_type"])
+    described = (data["name"] >= 0) & (data["module_type"] >= 0)
+
+    while since >= data["day"].min():
+        in_window = since <= data["day"]
+        if not in_window.any():
+            since -= 1
+            continue
+        cohort = data[in_window]["actor"].unique()
+        actions = (
+            data[in_window & described]
+            .groupby(["action", "name", "module_type"])["actor"]
+            .nunique()
+            .reset_index()
+            .rename(columns={"actor": "cohort"})
+        )
+        for _, action in actions.iterrows():
+            if action.action in active_actions["action"].values:
+                continue
+            if (
+                0.1 * len(cohort) <= action.cohort
+                and action.cohort >= dynamic_cohort_min
+            ):
+                active_actions.loc[len(active_actions)] = action[
+                    ["action", "name", "module_type"]
+                ]
+        if len(active_actions) >= active_actions_min:
+            return WindowSearchResult(since, active_actions.astype(int), cohort)
+        since -= 1
+
+    return None
+
+
+@pytest.mark.parametrize("engine", ["pandas", "polars"])
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize(
+    "sliding_window_min,active_actions_min,dynamic_cohort_min",
+    [(1, 20, 20), (3, 25, 25), (2, 15, 12), (7, 10, 5), (30, 26, 1)],
+)
+def test_window_find_sliding_window_matches_reference(  # noqa:PLR0913
+    engine,
+    seed,
+    sliding_window_min,
+    active_actions_min,
+    dynamic_cohort_min,
+    monkeypatch,
+):
+    """Test the incremental search yields the same window as a day-by-day search."""
+    if engine == "polars":
+        pytest.importorskip("polars")
+    monkeypatch.setattr("warren_tdbp.conf.settings.COMPUTE_ENGINE", engine)
+    statements = _random_statements(seed)
+    until = int(statements.data["day"].max()) + 1
+    parameters = {
+        "until": until,
+        "sliding_window_min": sliding_window_min,
+        "active_actions_min": active_actions_min,
+        "dynamic_cohort_min": dynamic_cohort_min,
+    }
+
+    expected = _reference_sliding_window(statements, **parameters)
+    result = find_sliding_window(statements, **parameters)
+
+    if expected is None:
+        assert result is None
+        return
+    assert result.since == expected.since
+    pd.testing.assert_frame_equal(
+        result.active_actions.astype(int), expected.active_actions
+    )
+    np.testing.assert_array_equal(result.cohort, expected.cohort)
+
+
+def test_window_find_sliding_window_without_statements():
+    """Test no sliding window is found when there is no statement."""
+    statements = _random_statements(0)
+    statements.data = statements.data.iloc[:0]
+
+    assert find_sliding_window(statements, 19100, 7, 1, 1) is None
+
+
+def test_window_find_sliding_window_with_gaps():
+    """Test days without statements are skipped while growing the window."""
+    statements = _random_statements(1, days=3, size=300)
+    # No statement during the last twenty days
+    until = int(statements.data["day"].max()) + 20
+
+    result = find_sliding_window(statements, until, 7, 1, 1)
+
+    assert result.since == int(statements.data["day"].max())
+    assert len(result.active_actions) >= 1
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize(
+    "sliding_window_min,active_actions_min,dynamic_cohort_min",
+    [(1, 12, 10), (2, 15, 12), (7, 10, 5)],
+)
+def test_window_history_search_matches_filtered_searches(
+    seed, sliding_window_min, active_actions_min, dynamic_cohort_min
+):
+    """Test history searches yield the windows searched among previous statements."""
+    statements = _random_statements(seed, days=20, size=800)
+    parameters = {
+        "sliding_window_min": sliding_window_min,
+        "active_actions_min": active_actions_min,
+        "dynamic_cohort_min": dynamic_cohort_min,
+    }
+    search = WindowHistorySearch(statements, **parameters)
+    days = statements.data["day"].to_numpy()
+    student = 3
+
+    for until in range(18995, 19022):
+        previous = statements.filter(days < until)
+        expected = find_sliding_window(previous, until=until, **parameters)
+        result = search.search(until, until)
+
+        if expected is None:
+            assert result is None
+            continue
+        assert result.since == expected.since
+        pd.testing.assert_frame_equal(result.active_actions, expected.active_actions)
+        assert result.cohort_size == len(expected.cohort)
+
+        action_codes = expected.active_actions["action"]
+        activation = search.activations(action_codes, until, student)
+        expected_activation = previous.activations(action_codes).loc[action_codes]
+        expected_activators = previous.bitmaps(action_codes)
+        np.testing.assert_array_equal(activation["day"], expected_activation["day"])
+        np.testing.assert_array_equal(
+            activation["students"], expected_activators.count()
+        )
+        np.testing.assert_array_equal(
+            activation["is_activator"], expected_activators.contain(student)
+        )
+
+
+def test_window_polars_frame_shares_statements(monkeypatch):
+    """Test the polars engine does not hold a second copy of statements."""
+    pytest.importorskip("polars")
+    monkeypatch.setattr("warren_tdbp.conf.settings.COMPUTE_ENGINE", "polars")
+    statements = _random_statements(0)
+
+    frame = statements.frame
+    for column in ("actor", "action", "name", "module_type", "day"):
+        assert np.shares_memory(
+            frame[column].to_numpy(), statements.data[column].to_numpy()
+        )
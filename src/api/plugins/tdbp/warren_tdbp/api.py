@@ -2,21 +2,24 @@
 
 import logging
 from datetime import date
-from typing import Annotated, List, Optional
+from typing import Annotated, Any, Callable, Dict, List, Literal, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from lti_toolbox.launch_params import LTIRole
 from warren.exceptions import LrsClientException
 from warren.utils import get_lti_course_id, get_lti_roles, get_lti_user_id
 
+from .conf import settings
+from .etag import get_etag
 from .indicators import (
     CohortIndicator,
     GradesIndicator,
     ScoresIndicator,
     SlidingWindowIndicator,
 )
-from .models import Grades, Scores, SlidingWindow
-from .utils import is_instructor
+from .models import Dashboard, Grades, Scores, SlidingWindow, SlidingWindowHistory
+from .utils import dumps_compact, gather_or_cancel, is_instructor, iter_ndjson
 
 router = APIRouter(
     prefix="/tdbp",
@@ -24,8 +27,111 @@ router = APIRouter(
 
 logger = logging.getLogger(__name__)
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+ResponseFormat = Annotated[
+    Literal["json", "ndjson"],
+    Query(
+        description=(
+            "Response format: a JSON document, or newline-delimited JSON records "
+            "streamed as they are produced (a header record, then one record per "
+            "student)"
+        )
+    ),
+]
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# Formats listing per-student values in coordinate (COO) format
+COMPACT_FORMATS = ("compact", "msgpack")
+
+TableResponseFormat = Annotated[
+    Literal["json", "ndjson", "compact", "msgpack"],
+    Query(
+        description=(
+            "Response format: a JSON document, newline-delimited JSON records "
+            "streamed as they are produced (a header record, then one record per "
+            "student), or a compact document listing students and per-student "
+            "values in coordinate (COO) format, as JSON or MessagePack"
+        )
+    ),
+]
+
+
+def compact_response(
+    payload: Dict[str, Any], format: str, etag: Optional[str]
+) -> Response:
+    """Return the response of a compact payload, as JSON or MessagePack.
+
+    Raises:
+        HTTPException: if MessagePack is requested but not available.
+    """
+    try:
+        content = dumps_compact(payload, msgpack=format == "msgpack")
+    except ImportError as exception:
+        logger.error("%s", exception)
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail="MessagePack responses are not available",
+        ) from exception
+    return Response(
+        content=content,
+        media_type=MSGPACK_MEDIA_TYPE if format == "msgpack" else "application/json",
+        headers={"ETag": etag} if etag else None,
+    )
+
+
+def conditional_etag(*indicators: str) -> Callable:
+    """Return a dependency handling conditional requests of indicators responses.
 
-@router.get("/window")
+    Indicators of the dashboard are restricted to its `indicators` query parameter.
+    """
+
+    async def dependency(  # noqa: PLR0913
+        request: Request,
+        response: Response,
+        course_id: Annotated[str, Depends(get_lti_course_id)],
+        roles: Annotated[List[LTIRole], Depends(get_lti_roles)],
+        user_id: Annotated[str, Depends(get_lti_user_id)],
+        until: Annotated[
+            Optional[date],
+            Query(description="End date until when to compute the sliding window"),
+        ] = None,
+    ) -> Optional[str]:
+        """Set the entity tag of the response, answering 304 if the client has it.
+
+        The entity tag is computed without computing indicators (see `get_etag`),
+        for the role scope of the user and the request path and query parameters.
+
+        Returns:
+            str: The entity tag of the response, None if it could not be computed.
+        """
+        requested = request.query_params.getlist("indicators")
+        scope = None if is_instructor(roles) else user_id
+        etag = get_etag(
+            course_id,
+            until or date.today(),
+            scope,
+            [("path", request.url.path), *request.query_params.multi_items()],
+            [name for name in indicators if not requested or name in requested],
+        )
+        if etag is None:
+            return None
+
+        response.headers["ETag"] = etag
+        tags = {
+            tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")
+        }
+        if tags & {etag, f"W/{etag}", "*"}:
+            raise HTTPException(
+                status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+            )
+        return etag
+
+    return dependency
+
+
+@router.get("/window", dependencies=[Depends(conditional_etag("window"))])
 async def get_sliding_window(
     course_id: Annotated[str, Depends(get_lti_course_id)],
     roles: Annotated[List[LTIRole], Depends(get_lti_roles)],
@@ -77,15 +183,87 @@ async def get_sliding_window(
     return results
 
 
+@router.get("/window/history", dependencies=[Depends(conditional_etag("history"))])
+async def get_sliding_window_history(
+    course_id: Annotated[str, Depends(get_lti_course_id)],
+    roles: Annotated[List[LTIRole], Depends(get_lti_roles)],
+    user_id: Annotated[str, Depends(get_lti_user_id)],
+    since_until: Annotated[
+        date,
+        Query(description="First end date until when to compute the sliding window"),
+    ],
+    until: Annotated[
+        Optional[date],
+        Query(
+            description="Last end date until when to compute the sliding window",
+        ),
+    ] = None,
+) -> SlidingWindowHistory:
+    """Return course sliding windows until each day of a range of dates.
+
+    Args:
+        course_id (str): The course identifier on Moodle.
+        roles (LTIRole): The roles of the user.
+        user_id (str): The user identifier on Moodle.
+        since_until (date): First end date until when to compute the sliding window.
+        until (date): Last end date until when to compute the sliding window.
+
+    Returns:
+        Json: Sliding windows until each day from `since_until` to `until`.
+            - windows (List[SlidingWindow]): sliding windows (see the `/window`
+                endpoint), their dynamic cohort being reduced to its size and
+                active actions activators not being listed.
+    """
+    logger.debug("Start computing 'window history' indicator")
+
+    until = until or date.today()
+    if since_until > until:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="since_until date should be before the until date",
+        )
+    if (until - since_until).days >= settings.HISTORY_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"History cannot exceed {settings.HISTORY_MAX_DAYS} days",
+        )
+
+    # Instructors have access to activation information for the whole cohort
+    student_id = None
+    # Students can only read whether they activated active actions
+    if not is_instructor(roles):
+        student_id = user_id
+
+    indicator = SlidingWindowIndicator(
+        course_id=course_id,
+        until=until,
+        student_id=student_id,
+    )
+
+    try:
+        results = await indicator.compute_history(since_until)
+    except (KeyError, AttributeError, LrsClientException) as exception:
+        message = "An error occurred while computing sliding window history"
+        logger.exception("%s. Exception:", message)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=message
+        ) from exception
+
+    logger.debug("Finish computing 'window history' indicator")
+    return results
+
+
 @router.get("/cohort")
-async def get_cohort(
+async def get_cohort(  # noqa: PLR0913
     course_id: Annotated[str, Depends(get_lti_course_id)],
     roles: Annotated[List[LTIRole], Depends(get_lti_roles)],
     user_id: Annotated[str, Depends(get_lti_user_id)],
+    etag: Annotated[Optional[str], Depends(conditional_etag("cohort"))],
     until: Annotated[
         Optional[date],
         Query(description="End date until when to compute the sliding window"),
     ] = None,
+    format: ResponseFormat = "json",
 ):
     """Return course (static) cohort information.
 
@@ -93,10 +271,15 @@ async def get_cohort(
         course_id (str): The course identifier on Moodle.
         roles (LTIRole): The roles of the user.
         user_id (str): The user identifier on Moodle.
+        etag (str): The entity tag of the response (see `conditional_etag`).
         until (date): End date until when to compute the sliding window.
+        format (str): Response format, "json" or "ndjson".
 
     Returns:
         Json: Lists of completed active actions per student.
+            In the "ndjson" format, active actions are streamed first
+            (`{"actions": [...]}`), then completed active actions of each student
+            (`{"student": ..., "actions": [...]}`).
 
     """
     logger.debug("Start computing 'cohort' indicator")
@@ -110,7 +293,10 @@ async def get_cohort(
     indicator = CohortIndicator(course_id=course_id, until=until, student_id=student_id)
 
     try:
-        results = await indicator.compute()
+        if format == "ndjson":
+            records = await indicator.compute_records()
+        else:
+            results = await indicator.compute()
     except (KeyError, AttributeError, LrsClientException) as exception:
         message = "An error occurred while computing course cohort"
         logger.exception("%s. Exception:", message)
@@ -119,14 +305,21 @@ async def get_cohort(
         ) from exception
 
     logger.debug("Finish computing 'cohort' indicator")
+    if format == "ndjson":
+        return StreamingResponse(
+            iter_ndjson(*records),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers={"ETag": etag} if etag else None,
+        )
     return results
 
 
-@router.get("/scores")
+@router.get("/scores", response_model=Scores)
 async def get_scores(  # noqa: PLR0913
     course_id: Annotated[str, Depends(get_lti_course_id)],
     roles: Annotated[List[LTIRole], Depends(get_lti_roles)],
     user_id: Annotated[str, Depends(get_lti_user_id)],
+    etag: Annotated[Optional[str], Depends(conditional_etag("scores"))],
     until: Annotated[
         Optional[date],
         Query(
@@ -139,18 +332,21 @@ async def get_scores(  # noqa: PLR0913
     average: Annotated[
         bool, Query(description="Flag to activate to compute average scores")
     ] = False,
-) -> Scores:
+    format: TableResponseFormat = "json",
+) -> Union[Scores, Response]:
     """Return student or cohort scores on active actions.
 
     Args:
         course_id (str): The course identifier on Moodle.
         roles (LTIRole): The roles of the user.
         user_id (str): The user identifier on Moodle.
+        etag (str): The entity tag of the response (see `conditional_etag`).
         until (datetime): End date until when to compute the sliding window.
         totals (bool): Flag to activate cohort totals scores computing on active
             actions.
         average (bool): Flag to activate cohort average scores for computing on active
             actions.
+        format (str): Response format, "json", "ndjson", "compact" or "msgpack".
 
     Returns:
         Json: Active actions scores per student.
@@ -158,6 +354,12 @@ async def get_scores(  # noqa: PLR0913
             - scores (dict): Lists of active actions scores per student.
             - totals (list): Sum of students' scores per active action.
             - average (list): Average students' score per active action.
+            In the "ndjson" format, active actions, totals and average are streamed
+            first (`{"actions": [...], "average": [...], "total": [...]}`), then
+            scores of each student (`{"student": ..., "scores": [...]}`).
+            In compact formats, students are listed once (`students`) and positive
+            scores as `rows` (student index), `columns` (action index) and
+            `values` arrays, scores which are not listed being negative.
     """
     logger.debug("Start computing 'scores' indicator")
 
@@ -176,7 +378,12 @@ async def get_scores(  # noqa: PLR0913
     )
 
     try:
-        results = await indicator.compute()
+        if format == "ndjson":
+            records = await indicator.compute_records()
+        elif format in COMPACT_FORMATS:
+            payload = await indicator.compute_compact()
+        else:
+            results = await indicator.compute()
     except (KeyError, AttributeError, LrsClientException) as exception:
         message = "An error occurred while computing student score(s)"
         logger.exception("%s. Exception:", message)
@@ -185,14 +392,23 @@ async def get_scores(  # noqa: PLR0913
         ) from exception
 
     logger.debug("Finish computing 'scores' indicator")
+    if format == "ndjson":
+        return StreamingResponse(
+            iter_ndjson(*records),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers={"ETag": etag} if etag else None,
+        )
+    if format in COMPACT_FORMATS:
+        return compact_response(payload, format, etag)
     return results
 
 
-@router.get("/grades")
-async def get_grades(
+@router.get("/grades", response_model=Grades)
+async def get_grades(  # noqa: PLR0913
     course_id: Annotated[str, Depends(get_lti_course_id)],
     roles: Annotated[List[LTIRole], Depends(get_lti_roles)],
     user_id: Annotated[str, Depends(get_lti_user_id)],
+    etag: Annotated[Optional[str], Depends(conditional_etag("grades"))],
     until: Annotated[
         Optional[date],
         Query(
@@ -202,22 +418,31 @@ async def get_grades(
     average: Annotated[
         bool, Query(description="Flag to activate to compute average grades")
     ] = False,
-) -> Grades:
+    format: TableResponseFormat = "json",
+) -> Union[Grades, Response]:
     """Return average mark for graded active activities.
 
     Args:
         course_id (str): The course identifier on Moodle.
         roles (list): The roles of the user.
         user_id (str): The user identifier on Moodle.
+        etag (str): The entity tag of the response (see `conditional_etag`).
         until (datetime): End date until when to compute the sliding window.
         average (bool): Flag to activate average grade computing on each graded active
             activity.
+        format (str): Response format, "json", "ndjson", "compact" or "msgpack".
 
     Returns:
         Json: Active activities grades per student.
             - actions (list): Active activities IRIs (used as response index).
             - scores (dict): Lists of active activities grades per student.
             - average (list): Average students' grades per active activity.
+            In the "ndjson" format, graded activities and average are streamed first
+            (`{"actions": [...], "average": [...]}`), then grades of each student
+            (`{"student": ..., "grades": [...]}`).
+            In compact formats, students are listed once (`students`) and grades
+            as `rows` (student index), `columns` (activity index) and `values`
+            arrays, missing grades not being listed.
     """
     logger.debug("Start computing 'grades' indicator")
 
@@ -232,7 +457,12 @@ async def get_grades(
     )
 
     try:
-        results = await indicator.compute()
+        if format == "ndjson":
+            records = await indicator.compute_records()
+        elif format in COMPACT_FORMATS:
+            payload = await indicator.compute_compact()
+        else:
+            results = await indicator.compute()
     except (KeyError, AttributeError, LrsClientException) as exception:
         message = "An error occurred while computing grades"
         logger.exception("%s. Exception:", message)
@@ -241,4 +471,117 @@ async def get_grades(
         ) from exception
 
     logger.debug("Finish computing 'grades' indicator")
+    if format == "ndjson":
+        return StreamingResponse(
+            iter_ndjson(*records),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers={"ETag": etag} if etag else None,
+        )
+    if format in COMPACT_FORMATS:
+        return compact_response(payload, format, etag)
     return results
+
+
+@router.get(
+    "/dashboard",
+    dependencies=[Depends(conditional_etag("window", "cohort", "scores", "grades"))],
+)
+async def get_dashboard(  # noqa: PLR0913
+    course_id: Annotated[str, Depends(get_lti_course_id)],
+    roles: Annotated[List[LTIRole], Depends(get_lti_roles)],
+    user_id: Annotated[str, Depends(get_lti_user_id)],
+    until: Annotated[
+        Optional[date],
+        Query(
+            description="End date until when to compute the sliding window",
+        ),
+    ] = None,
+    indicators: Annotated[
+        Optional[List[Literal["window", "cohort", "scores", "grades"]]],
+        Query(description="Indicators to compute (defaults to all indicators)"),
+    ] = None,
+    totals: Annotated[
+        bool, Query(description="Flag to activate to compute total scores")
+    ] = False,
+    average: Annotated[
+        bool,
+        Query(description="Flag to activate to compute average scores and grades"),
+    ] = False,
+) -> Dashboard:
+    """Return a bundle of course indicators computed at once.
+
+    Requested indicators share the course actions, the statements and the sliding
+    window of the course, which are loaded and computed only once. Permissions are
+    the same as for the corresponding indicator endpoints.
+
+    Args:
+        course_id (str): The course identifier on Moodle.
+        roles (list): The roles of the user.
+        user_id (str): The user identifier on Moodle.
+        until (date): End date until when to compute the sliding window.
+        indicators (list): Indicators to compute among "window", "cohort", "scores"
+            and "grades".
+        totals (bool): Flag to activate cohort totals scores computing on active
+            actions.
+        average (bool): Flag to activate cohort average scores and grades computing
+            on active actions.
+
+    Returns:
+        Json: Requested indicators, see the corresponding endpoints.
+            - window (SlidingWindow): Course sliding window.
+            - cohort (dict): Lists of completed active actions per student.
+            - scores (Scores): Active actions scores per student.
+            - grades (Grades): Active activities grades per student.
+    """
+    logger.debug("Start computing 'dashboard' indicators")
+
+    # Instructors can see indicators of all students
+    student_id = None
+    # Students can only see their own indicators
+    if not is_instructor(roles):
+        student_id = user_id
+
+    factories: Dict[
+        str,
+        Callable[
+            [],
+            Union[
+                SlidingWindowIndicator,
+                CohortIndicator,
+                ScoresIndicator,
+                GradesIndicator,
+            ],
+        ],
+    ] = {
+        "window": lambda: SlidingWindowIndicator(
+            course_id=course_id, until=until, student_id=student_id
+        ),
+        "cohort": lambda: CohortIndicator(
+            course_id=course_id, until=until, student_id=student_id
+        ),
+        "scores": lambda: ScoresIndicator(
+            course_id=course_id,
+            until=until,
+            student_id=student_id,
+            totals=totals,
+            average=average,
+        ),
+        "grades": lambda: GradesIndicator(
+            course_id=course_id, until=until, student_id=student_id, average=average
+        ),
+    }
+    names = list(dict.fromkeys(indicators or factories))
+
+    try:
+        results = await gather_or_cancel(
+            *(factories[name]().compute() for name in names)
+        )
+    except (KeyError, AttributeError, LrsClientException) as exception:
+        message = "An error occurred while computing dashboard indicators"
+        logger.exception("%s. Exception:", message)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=message
+        ) from exception
+
+    logger.debug("Finish computing 'dashboard' indicators")
+    return Dashboard(**dict(zip(names, results)))
@@ -0,0 +1,355 @@
+"""Two-tier cache of intermediate artifacts computed by TdBP indicators."""
+
+import hashlib
+import json
+import logging
+import math
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from time import time
+from typing import Any, Awaitable, Callable, NamedTuple, Optional, Tuple
+
+from sqlmodel import Session, select
+from warren.indicators.models import CacheEntry
+
+from .conf import settings
+from .context import ContextMixin
+from .models import Grades, Scores, SlidingWindow
+from .statements import StatementFrame, get_statement_frame_class
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "tdbp"
+
+
+def _json_size(value: Any, dumped: Any) -> int:
+    """Estimate the memory footprint of an artifact from its JSON serialization."""
+    return len(json.dumps(dumped))
+
+
+def _frame_size(value: StatementFrame, dumped: Any) -> int:
+    """Return the memory footprint of a statements frame."""
+    return value.nbytes
+
+
+def _dump_grades(grades: Grades) -> dict:
+    """Serialize grades, averages of ungraded activities (NaN) being dumped to null."""
+    value = json.loads(grades.json())
+    if value["average"] is not None:
+        value["average"] = [
+            None if math.isnan(average) else average for average in value["average"]
+        ]
+    return value
+
+
+def _load_grades(value: dict) -> Grades:
+    """Deserialize grades dumped by `_dump_grades`."""
+    if value["average"] is not None:
+        value = {
+            **value,
+            "average": [
+                math.nan if average is None else average for average in value["average"]
+            ],
+        }
+    return Grades.parse_obj(value)
+
+
+class ArtifactKind(NamedTuple):
+    """Serialization of an artifact kind.
+
+    Attributes:
+        dumps (Callable): convert an artifact to a JSON-compatible value.
+        loads (Callable): convert a JSON-compatible value back to an artifact.
+        sizeof (Callable): estimate the in-process memory footprint of an artifact
+            given its value and serialized value.
+    """
+
+    dumps: Callable[[Any], Any]
+    loads: Callable[[Any], Any]
+    sizeof: Callable[[Any, Any], int]
+
+
+ARTIFACT_KINDS = {
+    "course_actions": ArtifactKind(dumps=list, loads=list, sizeof=_json_size),
+    "statements": ArtifactKind(
+        dumps=lambda statements: {"npz": b64encode(statements.dumps()).decode()},
+        loads=lambda value: get_statement_frame_class().loads(b64decode(value["npz"])),
+        sizeof=_frame_size,
+    ),
+    "sliding_window": ArtifactKind(
+        dumps=lambda sliding_window: json.loads(sliding_window.json()),
+        loads=SlidingWindow.parse_obj,
+        sizeof=_json_size,
+    ),
+    "cohort": ArtifactKind(dumps=dict, loads=dict, sizeof=_json_size),
+    "scores": ArtifactKind(
+        dumps=lambda scores: json.loads(scores.json()),
+        loads=Scores.parse_obj,
+        sizeof=_json_size,
+    ),
+    "grades": ArtifactKind(dumps=_dump_grades, loads=_load_grades, sizeof=_json_size),
+}
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Return an aware datetime, naive datetimes of database backends being UTC."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _digest(value: Any, length: int) -> str:
+    """Return a truncated hexadecimal digest of a JSON-serializable value."""
+    encoded = json.dumps(value, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()[:length]
+
+
+class Artifact(NamedTuple):
+    """A course artifact and the date it has been computed at.
+
+    The computation date is the version of the artifact: it changes whenever the
+    artifact is computed again, e.g. once it expired.
+    """
+
+    value: Any
+    created_at: datetime
+
+
+class _Entry(NamedTuple):
+    """In-process cache entry."""
+
+    value: Any
+    course: str
+    size: int
+    created_at: datetime
+    expires_at: float
+
+
+class ArtifactCache:
+    """Two-tier cache of artifacts computed for a course.
+
+    Artifacts are first looked up in an in-process LRU cache whose entries total
+    size is limited to `settings.ARTIFACT_CACHE_MAX_MEMORY` bytes, then in the
+    database cache shared by all API workers (if `settings.ARTIFACT_CACHE_SHARED`
+    is set). Artifacts expire `settings.ARTIFACT_CACHE_TTL[kind]` seconds after
+    their computation.
+
+    Cache keys are composed of the artifact kind, a digest of the course identifier
+    (allowing to invalidate all artifacts of a course) and a digest of the
+    parameters the artifact depends on, e.g.
+    tdbp-statements-3e1d2c8b2a9f0e17-6f1a9c30b4d8e2a7c5b1f0d9e8a7b6c5.
+    """
+
+    def __init__(self):
+        """Initialize an empty cache."""
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.size = 0
+
+    @staticmethod
+    def course_digest(course_id: str) -> str:
+        """Return the digest of a course identifier used in cache keys."""
+        return _digest(course_id, 16)
+
+    def key(self, kind: str, course_id: str, parameters: Tuple) -> str:
+        """Return the cache key of a course artifact."""
+        return "-".join(
+            (KEY_PREFIX, kind, self.course_digest(course_id), _digest(parameters, 32))
+        )
+
+    def __len__(self) -> int:
+        """Return the number of artifacts in the in-process cache."""
+        return len(self._entries)
+
+    def _discard(self, key: str):
+        """Remove an entry from the in-process cache."""
+        entry = self._entries.pop(key)
+        self.size -= entry.size
+
+    def _store(self, key: str, entry: _Entry):
+        """Add an entry to the in-process cache, evicting least recently used ones.
+
+        Artifacts larger than the memory budget are not kept in process.
+        """
+        if key in self._entries:
+            self._discard(key)
+        if entry.size > settings.ARTIFACT_CACHE_MAX_MEMORY:
+            return
+        self._entries[key] = entry
+        self.size += entry.size
+        while self.size > settings.ARTIFACT_CACHE_MAX_MEMORY:
+            self._discard(next(iter(self._entries)))
+
+    def _get_shared(self, session: Session, key: str) -> Optional[CacheEntry]:
+        """Get the database cache entry of an artifact."""
+        return session.exec(
+            select(CacheEntry).where(CacheEntry.key == key)
+        ).one_or_none()
+
+    def _save_shared(self, session: Session, key: str, value: Any, created_at):
+        """Save an artifact in the database cache."""
+        cache = self._get_shared(session, key)
+        if cache is None:
+            cache = CacheEntry(key=key, value=value, created_at=created_at)
+        else:
+            cache.value = value
+            cache.created_at = created_at
+        with session.begin_nested():
+            session.add(cache)
+        session.commit()
+
+    def version(
+        self, kind: str, course_id: str, parameters: Tuple, session: Session
+    ) -> Optional[datetime]:
+        """Return the computation date of a cached artifact, without loading it.
+
+        Returns:
+            The computation date, None if the artifact is not cached or expired.
+        """
+        ttl = timedelta(seconds=settings.ARTIFACT_CACHE_TTL[kind])
+        key = self.key(kind, course_id, parameters)
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > time():
+            return entry.created_at
+        if not settings.ARTIFACT_CACHE_SHARED:
+            return None
+        created_at = session.exec(
+            select(CacheEntry.created_at).where(CacheEntry.key == key)
+        ).one_or_none()
+        if created_at is None or _as_utc(created_at) + ttl <= datetime.now(
+            timezone.utc
+        ):
+            return None
+        return _as_utc(created_at)
+
+    async def get_or_compute(  # noqa: PLR0913
+        self,
+        kind: str,
+        course_id: str,
+        parameters: Tuple,
+        factory: Callable[[], Awaitable],
+        session: Session,
+    ) -> Any:
+        """Return a cached artifact, or compute and cache it.
+
+        Args:
+            kind (str): artifact kind (see `ARTIFACT_KINDS`).
+            course_id (str): course the artifact is computed for.
+            parameters (tuple): JSON-serializable parameters the artifact depends
+                on, besides the course.
+            factory (Callable): coroutine function computing the artifact.
+            session (Session): database session used for the shared cache.
+        """
+        artifact = await self.get_or_compute_artifact(
+            kind, course_id, parameters, factory, session
+        )
+        return artifact.value
+
+    async def get_or_compute_artifact(  # noqa: PLR0913
+        self,
+        kind: str,
+        course_id: str,
+        parameters: Tuple,
+        factory: Callable[[], Awaitable],
+        session: Session,
+    ) -> Artifact:
+        """Return a cached artifact along with its version (see `get_or_compute`)."""
+        artifact_kind = ARTIFACT_KINDS[kind]
+        ttl = timedelta(seconds=settings.ARTIFACT_CACHE_TTL[kind])
+        key = self.key(kind, course_id, parameters)
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > time():
+            self._entries.move_to_end(key)
+            return Artifact(entry.value, entry.created_at)
+
+        now = datetime.now(timezone.utc)
+        cache = (
+            self._get_shared(session, key) if settings.ARTIFACT_CACHE_SHARED else None
+        )
+        if cache is not None and _as_utc(cache.created_at) + ttl > now:
+            logger.debug("Loading %s %s from the shared cache", kind, key)
+            dumped = cache.value
+            value = artifact_kind.loads(dumped)
+            created_at = _as_utc(cache.created_at)
+        else:
+            value = await factory()
+            dumped = artifact_kind.dumps(value)
+            created_at = now
+            if settings.ARTIFACT_CACHE_SHARED:
+                self._save_shared(session, key, dumped, created_at)
+
+        self._store(
+            key,
+            _Entry(
+                value=value,
+                course=self.course_digest(course_id),
+                size=artifact_kind.sizeof(value, dumped),
+                created_at=created_at,
+                expires_at=(created_at + ttl).timestamp(),
+            ),
+        )
+        return Artifact(value, created_at)
+
+    def invalidate(self, course_id: str, session: Optional[Session] = None):
+        """Discard all artifacts of a course.
+
+        Artifacts are discarded from the in-process cache, and from the shared
+        cache if a database session is given.
+        """
+        course = self.course_digest(course_id)
+        for key in [
+            key for key, entry in self._entries.items() if entry.course == course
+        ]:
+            self._discard(key)
+
+        if session is None:
+            return
+        pattern = f"{KEY_PREFIX}-%-{course}-%"
+        for cache in session.exec(
+            select(CacheEntry).where(CacheEntry.key.like(pattern))  # type: ignore[attr-defined]
+        ).all():
+            session.delete(cache)
+        session.commit()
+
+    def clear(self):
+        """Discard all artifacts from the in-process cache."""
+        self._entries.clear()
+        self.size = 0
+
+
+artifacts = ArtifactCache()
+
+
+class ArtifactMixin(ContextMixin):
+    """A mixin caching indicators intermediate artifacts (see `ArtifactCache`)."""
+
+    db_session: Session
+
+    async def memoize_artifact(
+        self, kind: str, parameters: Tuple, factory: Callable[[], Awaitable]
+    ) -> Any:
+        """Return a course artifact, computing it once for the computation context.
+
+        Concurrent indicators of the same context wait for the same cache lookup.
+        """
+        artifact = await self.context.memoize(
+            (kind, *parameters),
+            lambda: artifacts.get_or_compute_artifact(
+                kind, self.course_id, parameters, factory, self.db_session
+            ),
+        )
+        return artifact.value
+
+    def get_artifact_version(self, kind: str, parameters: Tuple) -> Optional[datetime]:
+        """Return the version of the course artifact indicators would be served.
+
+        The artifact memoized in the computation context is served first, then the
+        cached one (see `ArtifactCache.version`). None is returned if the artifact
+        would be computed.
+        """
+        artifact = self.context.peek((kind, *parameters))
+        if artifact is not None:
+            return artifact.created_at
+        return artifacts.version(kind, self.course_id, parameters, self.db_session)
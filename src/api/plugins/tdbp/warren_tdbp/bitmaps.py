@@ -0,0 +1,44 @@
+"""Packed bitmaps of students sets for TdBP indicators."""
+
+import numpy as np
+
+# Number of set bits of each byte value
+POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+
+class StudentBitmaps:
+    """Sets of students stored as packed bitmaps, one row per set.
+
+    Students being coded with dense integers, bit `code` of a row is set if the
+    student belongs to the set. Bits are packed in bytes, most significant bit
+    first (see `np.packbits`), so that adding students to sets is a bitwise or,
+    whatever the number of times they are added, and set sizes are popcounts.
+
+    Attributes:
+        bits (np.ndarray): packed bitmaps, one row of `ceil(students / 8)` bytes
+            per set, `students` being the number of students codes.
+    """
+
+    def __init__(self, rows: int, students: int):
+        """Initialize empty sets of students."""
+        self.bits = np.zeros((rows, (students + 7) // 8), dtype=np.uint8)
+
+    def add(self, rows, codes):
+        """Add students to sets, the student `codes[i]` to the set `rows[i]`."""
+        codes = np.asarray(codes, dtype=np.int64)
+        np.bitwise_or.at(
+            self.bits,
+            (np.asarray(rows, dtype=np.int64), codes >> 3),
+            (0x80 >> (codes & 7)).astype(np.uint8),
+        )
+
+    def count(self, rows=None) -> np.ndarray:
+        """Return the number of students of sets, of all sets if rows are not given."""
+        bits = self.bits if rows is None else self.bits[rows]
+        return POPCOUNT[bits].sum(axis=1, dtype=np.int64)
+
+    def contain(self, code: int) -> np.ndarray:
+        """Return whether a student belongs to each set (False for code -1)."""
+        if code < 0:
+            return np.zeros(len(self.bits), dtype=bool)
+        return (self.bits[:, code >> 3] & (0x80 >> (code & 7))).astype(bool)
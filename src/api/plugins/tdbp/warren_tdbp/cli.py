@@ -0,0 +1,139 @@
+"""Warren TdBP command line tool."""
+
+import asyncio
+from collections import Counter
+from datetime import date, datetime, timedelta
+from time import perf_counter
+from typing import Optional, Tuple
+
+import click
+from warren.db import get_session
+
+from .artifacts import artifacts
+from .conf import settings
+from .precompute import list_courses, precompute
+from .snapshots import invalidate_snapshots
+
+
+@click.group(name="warren-tdbp")
+def cli():
+    """Warren TdBP command line tool."""
+
+
+@cli.command("precompute")
+@click.option(
+    "--course",
+    "-c",
+    "courses",
+    multiple=True,
+    help="Course IRI (defaults to all courses indexed in the Experience Index).",
+)
+@click.option(
+    "--until",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    default=None,
+    help="Date until when indicators are computed (defaults to today).",
+)
+@click.option(
+    "--since",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    default=None,
+    help=(
+        "Skip courses without new statements since this date "
+        "(defaults to the day before the --until date)."
+    ),
+)
+@click.option(
+    "--all",
+    "-a",
+    "all_courses",
+    is_flag=True,
+    default=False,
+    help="Precompute all courses, even those without new statements.",
+)
+@click.option(
+    "--workers",
+    "-w",
+    type=click.IntRange(min=1),
+    default=settings.PRECOMPUTE_WORKERS,
+    show_default=True,
+    help="Number of courses precomputed concurrently.",
+)
+def precompute_command(
+    courses: Tuple[str, ...],
+    until: Optional[datetime],
+    since: Optional[datetime],
+    all_courses: bool,
+    workers: int,
+):
+    """Precompute indicators of courses with new statements."""
+    until_date: date = date.today() if until is None else until.date()
+    since_date: Optional[date] = None
+    if not all_courses:
+        since_date = until_date - timedelta(days=1) if since is None else since.date()
+
+    async def run():
+        course_ids = list(courses) or await list_courses()
+        return await precompute(course_ids, until_date, since_date, workers)
+
+    start = perf_counter()
+    results = asyncio.run(run())
+    duration = perf_counter() - start
+    for result in results:
+        line = f"{result.course_id}\t{result.status}\t{result.duration:.3f}s"
+        if result.error:
+            line += f"\t{result.error}"
+        click.echo(line)
+
+    statuses = Counter(result.status for result in results)
+    click.echo(
+        f"{statuses['computed']} computed, {statuses['skipped']} skipped, "
+        f"{statuses['failed']} failed in {duration:.3f}s"
+    )
+    if statuses["failed"]:
+        raise click.ClickException(
+            f"Failed to precompute {statuses['failed']} course(s)"
+        )
+
+
+@cli.command("invalidate")
+@click.option(
+    "--course",
+    "-c",
+    "courses",
+    multiple=True,
+    required=True,
+    help="Course IRI.",
+)
+@click.option(
+    "--since",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    default=None,
+    help="Only invalidate snapshots of results until this date or later.",
+)
+@click.option(
+    "--until",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    default=None,
+    help="Only invalidate snapshots of results until this date or earlier.",
+)
+def invalidate_command(
+    courses: Tuple[str, ...],
+    since: Optional[datetime],
+    until: Optional[datetime],
+):
+    """Invalidate indicators snapshots of courses having late statements.
+
+    Cached artifacts of these courses are discarded as well, so that invalidated
+    results are recomputed by API workers once their in-process artifacts expire.
+    """
+    session = get_session()
+    for course_id in courses:
+        count = invalidate_snapshots(
+            session,
+            course_id,
+            since=None if since is None else since.date(),
+            until=None if until is None else until.date(),
+        )
+        artifacts.invalidate(course_id, session)
+        click.echo(f"{course_id}\t{count} snapshot(s) invalidated")
@@ -1,5 +1,7 @@
 """Warren TdBP settings."""
 
+from pathlib import Path
+from typing import Dict, Literal, Optional
 
 from warren.conf import Settings as WarrenSettings
 
@@ -14,8 +16,61 @@ class Settings(WarrenSettings):
     ACTIVE_ACTIONS_MIN: int = 6
     DYNAMIC_COHORT_MIN: int = 3
 
+    # Sliding window history: maximal number of days of a history
+    HISTORY_MAX_DAYS: int = 366
+
     # Experience Index
     BASE_XI_URL: str = "http://localhost:8100/api/v1"
+    XI_MAX_CONCURRENT_REQUESTS: int = 10
+
+    # LRS
+    # Statements can either be fetched with one query per course action ("action")
+    # or with a single paginated query for the whole course ("course")
+    LRS_FETCH_MODE: Literal["action", "course"] = "action"
+    LRS_MAX_CONCURRENT_REQUESTS: int = 10
+    LRS_READ_CHUNK_SIZE: int = 500
+
+    # Statements store: if a path is set, statements of each course are stored
+    # locally and only statements stored in the LRS since the last fetch (minus
+    # an overlap in seconds) are fetched. Stores are rebuilt from scratch after an
+    # interval (in seconds) so that statements voided since their ingestion are
+    # eventually dropped.
+    STATEMENT_STORE_PATH: Optional[Path] = None
+    STATEMENT_STORE_OVERLAP: int = 300
+    STATEMENT_STORE_REBUILD_INTERVAL: int = 7 * 24 * 3600
+    STATEMENT_STORE_MAX_SEGMENTS: int = 32
+
+    # Engine computing the sliding window cohort and activation aggregations only
+    # (the window search runs on students bitmaps, cohort, scores and grades are
+    # always derived with NumPy from the incidence matrix): "polars" requires the
+    # polars optional dependency
+    COMPUTE_ENGINE: Literal["pandas", "polars"] = "pandas"
+
+    # Computation contexts shared by indicators (TTL in seconds)
+    COMPUTATION_CONTEXT_TTL: int = 300
+    COMPUTATION_CONTEXT_MAX_SIZE: int = 32
+
+    # Artifacts cache: course actions, statements and sliding windows are kept in
+    # an in-process LRU cache (up to a memory budget in bytes), in front of the
+    # database cache shared by API workers. Artifacts expire after a time to live
+    # (in seconds) depending on their kind.
+    ARTIFACT_CACHE_MAX_MEMORY: int = 256 * 1024 * 1024
+    ARTIFACT_CACHE_SHARED: bool = True
+    ARTIFACT_CACHE_TTL: Dict[str, int] = {
+        "course_actions": 24 * 3600,
+        "statements": 6 * 3600,
+        "sliding_window": 6 * 3600,
+        "cohort": 6 * 3600,
+        "scores": 6 * 3600,
+        "grades": 6 * 3600,
+    }
+
+    # Snapshots: course-level results of past dates are stored once and served
+    # until they are invalidated (see the `warren-tdbp invalidate` command)
+    SNAPSHOT_PAST_RESULTS: bool = True
+
+    # Precomputation of indicators: number of courses precomputed concurrently
+    PRECOMPUTE_WORKERS: int = 4
 
 
 settings = Settings()
@@ -0,0 +1,107 @@
+"""Shared computation context for TdBP indicators."""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import date
+from time import monotonic
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from .conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ComputationContext:
+    """Memoize intermediate results of indicators computed for a course.
+
+    Indicators computed for the same course and `until` date share the same
+    context, so that the course actions, the statements and the sliding window
+    are computed once and reused by dependent indicators, even when they are
+    computed concurrently.
+    """
+
+    def __init__(self, course_id: str, until: date):
+        """Initialize an empty context."""
+        self.course_id = course_id
+        self.until = until
+        self.loop = asyncio.get_running_loop()
+        self.created_at = monotonic()
+        self._results: Dict[Hashable, asyncio.Future] = {}
+
+    @property
+    def expired(self) -> bool:
+        """Return whether the context lifetime exceeded its time to live."""
+        return monotonic() - self.created_at > settings.COMPUTATION_CONTEXT_TTL
+
+    async def memoize(self, key: Hashable, factory: Callable[[], Awaitable]) -> Any:
+        """Return the result of `factory` for `key`, computing it only once.
+
+        Concurrent calls with the same key wait for the same computation. Failed
+        computations are not memoized.
+        """
+        future = self._results.get(key)
+        if future is None:
+            logger.debug("Computing '%s' for course %s", key, self.course_id)
+            future = asyncio.ensure_future(factory())
+            self._results[key] = future
+        try:
+            # Cancelling a caller should not cancel a shared computation
+            return await asyncio.shield(future)
+        except Exception:
+            if self._results.get(key) is future:
+                del self._results[key]
+            raise
+
+    def peek(self, key: Hashable) -> Any:
+        """Return the memoized result for `key`, None if it has not been computed."""
+        future = self._results.get(key)
+        if future is None or not future.done() or future.cancelled():
+            return None
+        if future.exception() is not None:
+            return None
+        return future.result()
+
+
+_contexts: "OrderedDict[Tuple[str, date], ComputationContext]" = OrderedDict()
+
+
+def get_context(course_id: str, until: date) -> ComputationContext:
+    """Return the computation context shared for a course until a date.
+
+    At most `settings.COMPUTATION_CONTEXT_MAX_SIZE` contexts are kept (least
+    recently used contexts are discarded first), each for
+    `settings.COMPUTATION_CONTEXT_TTL` seconds.
+    """
+    key = (course_id, until)
+    context = _contexts.get(key)
+    if (
+        context is None
+        or context.expired
+        or context.loop is not asyncio.get_running_loop()
+    ):
+        context = ComputationContext(course_id, until)
+        _contexts[key] = context
+    _contexts.move_to_end(key)
+
+    while len(_contexts) > settings.COMPUTATION_CONTEXT_MAX_SIZE:
+        _contexts.popitem(last=False)
+
+    return context
+
+
+def clear_contexts():
+    """Discard all computation contexts."""
+    _contexts.clear()
+
+
+class ContextMixin:
+    """A mixin giving indicators access to their shared computation context."""
+
+    course_id: str
+    until: date
+
+    @property
+    def context(self) -> ComputationContext:
+        """Get the computation context of the indicator course and `until` date."""
+        return get_context(self.course_id, self.until)
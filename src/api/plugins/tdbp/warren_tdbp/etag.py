@@ -0,0 +1,49 @@
+"""Entity tags of TdBP indicators responses."""
+
+import hashlib
+import json
+from datetime import date
+from typing import Any, Iterable, Optional, Tuple
+
+from .indicators import SlidingWindowIndicator, get_artifact_parameters
+
+# Course artifacts each indicator response is served from
+INDICATOR_ARTIFACTS = {
+    "window": ("sliding_window",),
+    "history": ("statements",),
+    "cohort": ("sliding_window", "cohort"),
+    "scores": ("statements", "sliding_window", "scores"),
+    "grades": ("statements", "sliding_window", "grades"),
+}
+
+
+def get_etag(
+    course_id: str,
+    until: date,
+    scope: Optional[str],
+    parameters: Iterable[Tuple[str, Any]],
+    indicators: Iterable[str],
+) -> Optional[str]:
+    """Return the entity tag of an indicator response.
+
+    The tag is derived from the versions of the course artifacts the response is
+    served from (see `INDICATOR_ARTIFACTS` and `ArtifactMixin.get_artifact_version`),
+    the role scope (the student identifier, None for instructors) and the indicator
+    parameters, so that it is computed without computing the indicators and changes
+    whenever the served artifacts are computed again. None is returned if an
+    artifact is neither memoized nor cached, i.e. if it would be computed.
+    """
+    indicator = SlidingWindowIndicator(course_id=course_id, until=until)
+    kinds = sorted({kind for name in indicators for kind in INDICATOR_ARTIFACTS[name]})
+    versions = [
+        indicator.get_artifact_version(kind, get_artifact_parameters(indicator, kind))
+        for kind in kinds
+    ]
+    if any(version is None for version in versions):
+        return None
+
+    validator = json.dumps(
+        [course_id, until, scope, sorted(parameters), list(zip(kinds, versions))],
+        default=str,
+    )
+    return f'"{hashlib.sha256(validator.encode()).hexdigest()[:32]}"'
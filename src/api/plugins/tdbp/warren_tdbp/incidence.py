@@ -0,0 +1,151 @@
+"""Sparse students x actions incidence matrix of TdBP indicators."""
+
+from typing import NamedTuple, Tuple
+
+import numpy as np
+
+from .statements import StatementFrame
+
+
+class Incidence(NamedTuple):
+    """Sparse students x actions incidence matrix, in CSR format.
+
+    A (student, action) entry is stored if the student made the action, along
+    with the latest grade of the student for this action.
+
+    Attributes:
+        students (np.ndarray): student codes of rows, sorted.
+        actions (np.ndarray): action codes of columns.
+        indptr (np.ndarray): entries of row `i` are `indptr[i]:indptr[i + 1]`.
+        indices (np.ndarray): column of each entry. Entries of a row follow the
+            order in which the student made actions (statements order).
+        grades (np.ndarray): score of the most recent scored statement of each
+            entry, NaN if the action has not been graded.
+    """
+
+    students: np.ndarray
+    actions: np.ndarray
+    indptr: np.ndarray
+    indices: np.ndarray
+    grades: np.ndarray
+
+    @classmethod
+    def from_statements(
+        cls, statements: StatementFrame, action_codes: np.ndarray
+    ) -> "Incidence":
+        """Build the incidence matrix of students and actions from statements."""
+        action_codes = np.asarray(action_codes, dtype=np.int64)
+        columns = np.full(len(statements.actions), -1, dtype=np.int64)
+        columns[action_codes] = np.arange(len(action_codes))
+        data = statements.data
+        data = data[data["action"].isin(action_codes)]
+        actors = data["actor"].to_numpy().astype(np.int64)
+        days = data["day"].to_numpy()
+        scores = data["score"].to_numpy()
+        pairs = actors * len(action_codes) + columns[data["action"].to_numpy()]
+
+        # Entries are the distinct (student, action) pairs, sorted by student then
+        # by their first statement
+        entries, first = np.unique(pairs, return_index=True)
+        order = np.lexsort((first, actors[first]))
+        students, counts = np.unique(actors[first], return_counts=True)
+
+        # Latest grade of each entry: statements are sorted by entry then day
+        # (statements order breaking ties), the last scored one being kept
+        grades = np.full(len(entries), np.nan)
+        scored = ~np.isnan(scores)
+        if scored.any():
+            scored_order = np.lexsort((days[scored], pairs[scored]))
+            scored_pairs = pairs[scored][scored_order]
+            last = np.flatnonzero(
+                np.append(scored_pairs[1:] != scored_pairs[:-1], True)
+            )
+            grades[np.searchsorted(entries, scored_pairs[last])] = scores[scored][
+                scored_order
+            ][last]
+
+        return cls(
+            students=students,
+            actions=action_codes,
+            indptr=np.r_[0, np.cumsum(counts)],
+            indices=entries[order] % len(action_codes),
+            grades=grades[order],
+        )
+
+    @property
+    def rows(self) -> np.ndarray:
+        """Return the row of each entry."""
+        return np.repeat(np.arange(len(self.students)), np.diff(self.indptr))
+
+    def row_actions(self, row: int) -> np.ndarray:
+        """Return codes of actions made by the student of a row, in order."""
+        return self.actions[self.indices[self.indptr[row] : self.indptr[row + 1]]]
+
+    def student_rows(self, students: np.ndarray) -> np.ndarray:
+        """Return the rows of students given their codes, -1 if not in the matrix."""
+        students = np.asarray(students, dtype=np.int64)
+        if not len(self.students):
+            return np.full(len(students), -1, dtype=np.int64)
+        rows = np.minimum(
+            np.searchsorted(self.students, students), len(self.students) - 1
+        )
+        return np.where(self.students[rows] == students, rows, -1)
+
+    def student_actions(self, student: int) -> np.ndarray:
+        """Return codes of actions made by a student given its code, in order.
+
+        No action is returned for students who are not a row of the matrix.
+        """
+        row = int(self.student_rows(np.array([student]))[0])
+        if row < 0:
+            return self.actions[:0]
+        return self.row_actions(row)
+
+    def entries(
+        self, rows: np.ndarray, columns: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return entries of a submatrix in coordinate (COO) format.
+
+        Args:
+            rows (np.ndarray): rows of the submatrix, -1 for rows without entries.
+            columns (np.ndarray): columns of the submatrix.
+
+        Returns:
+            The row and column of each entry in the submatrix and its index in the
+            matrix (e.g. to look up its grade), in row-major order.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = np.asarray(columns, dtype=np.int64)
+        row_mapping = np.full(len(self.students), -1, dtype=np.int64)
+        kept = rows >= 0
+        row_mapping[rows[kept]] = np.flatnonzero(kept)
+        column_mapping = np.full(len(self.actions), -1, dtype=np.int64)
+        column_mapping[columns] = np.arange(len(columns))
+
+        entry_rows = row_mapping[self.rows]
+        entry_columns = column_mapping[self.indices]
+        entries = np.flatnonzero((entry_rows >= 0) & (entry_columns >= 0))
+        entries = entries[np.lexsort((entry_columns[entries], entry_rows[entries]))]
+        return entry_rows[entries], entry_columns[entries], entries
+
+    def to_dense(self) -> np.ndarray:
+        """Return the dense actions x students boolean incidence matrix."""
+        dense = np.zeros((len(self.actions), len(self.students)), dtype=bool)
+        dense[self.indices, self.rows] = True
+        return dense
+
+    def grades_table(self, columns: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the dense students x columns grades table, NaN if missing.
+
+        Only students having made at least one of the columns are kept.
+
+        Returns:
+            The codes of kept students and their grades table.
+        """
+        mapping = np.full(len(self.actions), -1, dtype=np.int64)
+        mapping[columns] = np.arange(len(columns))
+        kept = mapping[self.indices] >= 0
+        table = np.full((len(self.students), len(columns)), np.nan)
+        table[self.rows[kept], mapping[self.indices[kept]]] = self.grades[kept]
+        rows = np.unique(self.rows[kept])
+        return self.students[rows], table[rows]
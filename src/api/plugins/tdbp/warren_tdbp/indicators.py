@@ -1,9 +1,22 @@
 """Warren TdBP indicators."""
 
+import asyncio
+import json
 import logging
-import re
-from datetime import date, datetime, time, timedelta
-from typing import List, Optional, Union
+from datetime import date, datetime, time, timedelta, timezone
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+    cast,
+)
 
 import numpy as np
 import pandas as pd
@@ -20,20 +33,82 @@ from .exceptions import (
     ExperienceIndexException,
     IndicatorConsistencyException,
 )
+from .incidence import Incidence
 from .models import (
     Action,
     Activities,
     Grades,
     Scores,
     SlidingWindow,
+    SlidingWindowHistory,
     Window,
 )
-from .utils import dataframe_to_pydantic
+from .snapshots import SnapshotMixin
+from .statements import (
+    ID,
+    OBJECT_ID,
+    TIMESTAMP,
+    StatementFrame,
+    StatementsAccumulator,
+    from_epoch_day,
+    get_statement_frame_class,
+    is_voiding_statement,
+    to_epoch_day,
+)
+from .store import StatementStore
+from .utils import dataframe_to_pydantic, gather_or_cancel
+from .window import WindowHistoryResult, WindowHistorySearch, find_sliding_window
 
 logger = logging.getLogger(__name__)
 
 
-class SlidingWindowIndicator(BaseIndicator, CacheMixin):
+class IndicatorRecords(NamedTuple):
+    """Records of a cohort indicator, produced student by student.
+
+    Attributes:
+        header (dict): cohort-wide information (active actions, aggregates).
+        rows (Iterator[dict]): one record per student, lazily produced.
+    """
+
+    header: Dict[str, Any]
+    rows: Iterator[Dict[str, Any]]
+
+
+def get_course_sliding_window_indicator(indicator) -> "SlidingWindowIndicator":
+    """Return the course sliding window indicator a composite indicator relies on.
+
+    The sliding window indicator shares the course, the `until` date and the
+    sliding window parameters of the composite indicator, but is computed for
+    the whole cohort.
+    """
+    return SlidingWindowIndicator(
+        course_id=indicator.course_id,
+        until=indicator.until,
+        sliding_window_min=indicator.sliding_window_min,
+        active_actions_min=indicator.active_actions_min,
+        dynamic_cohort_min=indicator.dynamic_cohort_min,
+    )
+
+
+def get_artifact_parameters(indicator, kind: str) -> Tuple:
+    """Return the parameters a course artifact computed by an indicator depends on.
+
+    Course actions only depend on the course, statements on the `until` date, and
+    course-level results on the sliding window parameters as well.
+    """
+    if kind == "course_actions":
+        return ()
+    if kind == "statements":
+        return (indicator.until,)
+    return (
+        indicator.until,
+        indicator.sliding_window_min,
+        indicator.active_actions_min,
+        indicator.dynamic_cohort_min,
+    )
+
+
+class SlidingWindowIndicator(BaseIndicator, CacheMixin, SnapshotMixin):
     """Compute course sliding window."""
 
     course_experiences: List[str] = []
@@ -62,95 +137,352 @@ class SlidingWindowIndicator(BaseIndicator, CacheMixin):
         )
 
     async def get_course_actions(self) -> List[str]:
-        """Return actions related to course read from Experience Index."""
-        relations = []
+        """Return actions related to course read from Experience Index.
+
+        Course actions are shared by indicators computed in the same context and
+        cached as an artifact of the course (see `ArtifactCache`).
+        """
+        return await self.memoize_artifact(
+            "course_actions",
+            get_artifact_parameters(self, "course_actions"),
+            self._get_course_actions,
+        )
+
+    async def _get_course_actions(self) -> List[str]:
+        """Read actions related to course from Experience Index.
 
+        Course contents are resolved concurrently (up to
+        `settings.XI_MAX_CONCURRENT_REQUESTS` simultaneous requests), each distinct
+        content being requested only once.
+        """
         xi = ExperienceIndex(url=settings.BASE_XI_URL)
-        # Get the course given its experience UUID
-        experience = await xi.experience.get(object_id=self.course_id)
-        if experience is None:
-            raise ExperienceIndexException(
-                f"Unknown course {self.course_id}. It should be indexed first!"
+        try:
+            # Get the course given its experience UUID
+            experience = await xi.experience.get(object_id=self.course_id)
+            if experience is None:
+                raise ExperienceIndexException(
+                    f"Unknown course {self.course_id}. It should be indexed first!"
+                )
+            if not experience.relations_target:
+                raise ExperienceIndexException(
+                    f"No content indexed for course {self.course_id}"
+                )
+
+            # The Experience Index does not expose a bulk read returning contents
+            # IRI, hence we fall back to concurrent requests on unique sources
+            source_ids = list(
+                dict.fromkeys(
+                    source.source_id for source in experience.relations_target
+                )
             )
-        if not experience.relations_target:
-            raise ExperienceIndexException(
-                f"No content indexed for course {self.course_id}"
+            semaphore = asyncio.Semaphore(settings.XI_MAX_CONCURRENT_REQUESTS)
+
+            async def get_content(source_id):
+                async with semaphore:
+                    return await xi.experience.get(object_id=source_id)
+
+            contents = await gather_or_cancel(
+                *(get_content(source_id) for source_id in source_ids)
             )
+        finally:
+            await xi.close()
 
-        for source in experience.relations_target:
-            content = await xi.experience.get(object_id=source.source_id)
+        relations = []
+        for source_id, content in zip(source_ids, contents):
             if content is None:
                 raise ExperienceIndexException(
-                    f"Cannot find content with id {source.source_id} for "
+                    f"Cannot find content with id {source_id} for "
                     f"course {self.course_id}"
                 )
             relations.append(content.iri)
 
         return relations
 
-    def get_lrs_query(self):
-        """Construct the LRS query for statements whose object is the course.
+    def _get_time_range(self) -> Dict[str, str]:
+        """Return LRS query parameters selecting statements until the indicator date."""
+        return {"until": datetime.combine(self.until, time.min).isoformat()}
 
-        WARNING: this method is used only for key cache computing as the LRS
-        query requires to look for statements which object is related to the course.
+    def get_lrs_query(self, time_range: Optional[Dict[str, str]] = None):
+        """Construct the LRS query for statements related to the course.
+
+        Statements whose object is the course or which have the course in their
+        context activities are selected. This query is only used to fetch
+        statements in the "course" fetch mode (see `settings.LRS_FETCH_MODE`).
+
+        Statements are selected until the indicator date unless a time range
+        (`since` and/or `until` query parameters) is given.
         """
         return LRSStatementsQuery(
             activity=self.course_id,
-            until=datetime.combine(self.until, time.min).isoformat(),
+            related_activities=True,
+            **(self._get_time_range() if time_range is None else time_range),
         )
 
-    def _get_lrs_query_for_activity(self, activity):
+    def _get_lrs_query_for_activity(
+        self, activity, time_range: Optional[Dict[str, str]] = None
+    ):
         """Return LRS query for a course-related activity."""
         return LRSStatementsQuery(
             activity=activity,
-            until=datetime.combine(self.until, time.min).isoformat(),
+            **(self._get_time_range() if time_range is None else time_range),
         )
 
-    async def get_statements(self) -> pd.DataFrame:
-        """Return LRS statements related to course actions."""
-        raw_statements = pd.DataFrame()
-        course_actions = await self.get_course_actions()
-        for action_id in course_actions:
-            try:
-                data = [
-                    value
-                    async for value in self.lrs_client.read(
-                        target=self.lrs_client.settings.STATEMENTS_ENDPOINT,
-                        query=self._get_lrs_query_for_activity(activity=action_id),
-                    )
-                ]
-            except BackendException as exception:
-                raise LrsClientException("Failed to fetch statements") from exception
+    async def _read_statements(
+        self,
+        query: LRSStatementsQuery,
+        seen_ids: Set[str],
+        actions: Optional[Set[str]] = None,
+    ) -> StatementsAccumulator:
+        """Stream statements matching the LRS query into an accumulator.
+
+        Statements whose identifier belongs to `seen_ids` are skipped. If `actions`
+        is given, statements whose object is not one of these actions are skipped
+        as well (voiding statements excepted).
+        """
+        accumulator = StatementsAccumulator(
+            chunk_size=settings.LRS_READ_CHUNK_SIZE, seen_ids=seen_ids
+        )
+        try:
+            async for statement in self.lrs_client.read(
+                target=self.lrs_client.settings.STATEMENTS_ENDPOINT,
+                query=query,
+                chunk_size=settings.LRS_READ_CHUNK_SIZE,
+            ):
+                if (
+                    actions is not None
+                    and statement.get("object", {}).get("id") not in actions
+                    and not is_voiding_statement(statement)
+                ):
+                    continue
+                accumulator.append(statement)
+        except BackendException as exception:
+            raise LrsClientException("Failed to fetch statements") from exception
+        return accumulator
+
+    async def _fetch_activity_statements(
+        self,
+        activity: str,
+        semaphore: asyncio.Semaphore,
+        seen_ids: Set[str],
+        time_range: Optional[Dict[str, str]] = None,
+    ) -> StatementsAccumulator:
+        """Fetch LRS statements for a course-related activity.
+
+        The semaphore bounds the number of LRS requests running concurrently.
+        """
+        async with semaphore:
+            return await self._read_statements(
+                self._get_lrs_query_for_activity(activity, time_range), seen_ids
+            )
+
+    async def _fetch_course_statements(
+        self,
+        course_actions: List[str],
+        seen_ids: Set[str],
+        time_range: Optional[Dict[str, str]] = None,
+    ) -> StatementsAccumulator:
+        """Fetch LRS statements related to the course with a single query.
 
-            raw_statements = pd.concat([raw_statements, pd.json_normalize(data)])
+        Statements whose object is not a course action are filtered out.
+        """
+        return await self._read_statements(
+            self.get_lrs_query(time_range), seen_ids, actions=set(course_actions)
+        )
+
+    async def _fetch_statements(
+        self,
+        course_actions: List[str],
+        seen_ids: Set[str],
+        time_range: Optional[Dict[str, str]] = None,
+    ) -> StatementsAccumulator:
+        """Fetch LRS statements of course actions.
+
+        Depending on `settings.LRS_FETCH_MODE`, statements are either fetched
+        concurrently for all course actions (up to
+        `settings.LRS_MAX_CONCURRENT_REQUESTS` simultaneous requests) and merged
+        following the course actions order, or fetched with a single paginated query
+        on the course and filtered against course actions.
+
+        Fetched statements are projected on fields used by indicators, de-duplicated
+        and streamed into columnar chunks.
+        """
+        if not course_actions:
+            return StatementsAccumulator()
+        if settings.LRS_FETCH_MODE == "course":
+            accumulators = [
+                await self._fetch_course_statements(
+                    course_actions, seen_ids, time_range
+                )
+            ]
+        else:
+            semaphore = asyncio.Semaphore(settings.LRS_MAX_CONCURRENT_REQUESTS)
+            accumulators = await gather_or_cancel(
+                *(
+                    self._fetch_activity_statements(
+                        action_id, semaphore, seen_ids, time_range
+                    )
+                    for action_id in course_actions
+                )
+            )
+        return StatementsAccumulator.merge(accumulators)
+
+    async def _load_stored_statements(
+        self, store_path: Path, course_actions: List[str]
+    ) -> pd.DataFrame:
+        """Load statements of course actions from the course statements store.
+
+        Only statements stored in the LRS since the store watermark (minus
+        `settings.STATEMENT_STORE_OVERLAP` seconds) are fetched and appended to the
+        store. The whole history of course actions unknown to the store is fetched.
+        The store is rebuilt from scratch if it is missing, corrupted or older than
+        `settings.STATEMENT_STORE_REBUILD_INTERVAL` seconds.
+        """
+        store = StatementStore(store_path, self.course_id)
+        loop = asyncio.get_running_loop()
+        stored = await loop.run_in_executor(None, store.load)
+        rebuild_interval = timedelta(seconds=settings.STATEMENT_STORE_REBUILD_INTERVAL)
+
+        if stored is None or stored.created_at + rebuild_interval < datetime.now(
+            timezone.utc
+        ):
+            logger.info("Ingesting statements history of %s", self.course_id)
+            accumulator = await self._fetch_statements(course_actions, set(), {})
+            frame = accumulator.to_frame()
+            await loop.run_in_executor(
+                None, store.write, frame, course_actions, accumulator.voided, True
+            )
+        else:
+            seen_ids = set(stored.frame[ID].dropna())
+            known_actions = [
+                action for action in course_actions if action in stored.actions
+            ]
+            new_actions = [
+                action for action in course_actions if action not in stored.actions
+            ]
+            since = {}
+            if stored.watermark is not None:
+                overlap = timedelta(seconds=settings.STATEMENT_STORE_OVERLAP)
+                since = {"since": (stored.watermark - overlap).isoformat()}
+            accumulator = StatementsAccumulator.merge(
+                await gather_or_cancel(
+                    self._fetch_statements(known_actions, seen_ids, since),
+                    self._fetch_statements(new_actions, seen_ids, {}),
+                )
+            )
+            new_statements = accumulator.to_frame()
+            await loop.run_in_executor(
+                None, store.write, new_statements, course_actions, accumulator.voided
+            )
+            frame = pd.concat(
+                [data for data in (stored.frame, new_statements) if len(data)]
+                or [new_statements],
+                ignore_index=True,
+            )
+            if accumulator.voided:
+                frame = frame[~frame[ID].isin(accumulator.voided)]
+
+        # Select statements of course actions until the indicator date
+        until = pd.Timestamp(datetime.combine(self.until, time.min), tz="UTC")
+        if frame.empty:
+            return frame
+        return frame[
+            frame[OBJECT_ID].isin(course_actions) & (frame[TIMESTAMP] <= until)
+        ].reset_index(drop=True)
+
+    async def _load_statements(self) -> StatementFrame:
+        """Load LRS statements related to course actions.
+
+        Statements are fetched from the LRS (see `_fetch_statements`), or from the
+        course statements store if `settings.STATEMENT_STORE_PATH` is set (see
+        `_load_stored_statements`). They are then encoded in a statements frame of
+        the compute engine selected by `settings.COMPUTE_ENGINE`.
+        """
+        course_actions = await self.get_course_actions()
+        if settings.STATEMENT_STORE_PATH is None:
+            accumulator = await self._fetch_statements(course_actions, set())
+            raw_statements = accumulator.to_frame()
+        else:
+            raw_statements = await self._load_stored_statements(
+                settings.STATEMENT_STORE_PATH, course_actions
+            )
 
         if raw_statements.empty:
             raise IndicatorConsistencyException(
                 "Sliding window will not be computed. No statements have been found."
             )
 
-        # Find object.definition.name.<lang> columns
-        matching_columns = [
-            column
-            for column in raw_statements.columns
-            if re.match(r"^object\.definition\.name.*$", column)
-        ]
+        return get_statement_frame_class().from_frame(raw_statements)
 
-        # Select the first one by renaming it
-        if matching_columns:
-            raw_statements.rename(
-                columns={matching_columns[0]: "object.definition.name"},
-                inplace=True,
-            )
+    async def _read_watermark(
+        self, query: LRSStatementsQuery, semaphore: asyncio.Semaphore
+    ) -> Optional[str]:
+        """Return the storage date (or identifier) of the latest statement of a query.
 
-        raw_statements["timestamp"] = pd.to_datetime(
-            raw_statements["timestamp"], errors="raise", utc=True
+        The semaphore bounds the number of LRS requests running concurrently.
+        """
+        async with semaphore:
+            try:
+                async for statement in self.lrs_client.read(
+                    target=self.lrs_client.settings.STATEMENTS_ENDPOINT,
+                    query=query,
+                    chunk_size=1,
+                    max_statements=1,
+                ):
+                    return statement.get("stored") or statement.get("id")
+            except BackendException as exception:
+                raise LrsClientException("Failed to fetch statements") from exception
+        return None
+
+    async def get_lrs_watermark(
+        self, time_range: Optional[Dict[str, str]] = None
+    ) -> Optional[str]:
+        """Return a marker of the most recent LRS statements related to the course.
+
+        Statements are read with the queries they are fetched with (see
+        `settings.LRS_FETCH_MODE`), with one request per course action in the
+        "action" mode (up to `settings.LRS_MAX_CONCURRENT_REQUESTS` simultaneous
+        requests). The LRS returns most recently stored statements first, so that
+        the storage date (or the identifier) of the first statement of a query
+        changes whenever a statement is stored, including voiding statements.
+
+        Args:
+            time_range (dict): `since` and/or `until` query parameters restricting
+                the statements storage date (until the indicator date if not set).
+
+        Returns:
+            The marker, None if no statement has been found.
+        """
+        if settings.LRS_FETCH_MODE == "course":
+            queries = [self.get_lrs_query(time_range)]
+        else:
+            queries = [
+                self._get_lrs_query_for_activity(action_id, time_range)
+                for action_id in await self.get_course_actions()
+            ]
+        semaphore = asyncio.Semaphore(settings.LRS_MAX_CONCURRENT_REQUESTS)
+        markers = await gather_or_cancel(
+            *(self._read_watermark(query, semaphore) for query in queries)
+        )
+        if all(marker is None for marker in markers):
+            return None
+        return json.dumps(markers)
+
+    async def get_statements(self) -> StatementFrame:
+        """Return LRS statements related to course actions.
+
+        Statements are loaded once for indicators computed in the same context
+        (see `_load_statements`), cached as an artifact of the course and checked
+        against the indicator requirements.
+        """
+        statements = await self.memoize_artifact(
+            "statements",
+            get_artifact_parameters(self, "statements"),
+            self._load_statements,
         )
-        raw_statements["date"] = raw_statements["timestamp"].dt.date
 
         # Check whether statements are distributed at least over the sliding window
-        statements_window = self.until - raw_statements["date"].min()
-        if statements_window.days < self.sliding_window_min:
+        statements_window = to_epoch_day(self.until) - statements.data["day"].min()
+        if statements_window < self.sliding_window_min:
             raise IndicatorConsistencyException(
                 f"Sliding window will not be computed. "
                 f"Statements are distributed on a window lower than "
@@ -158,7 +490,7 @@ class SlidingWindowIndicator(BaseIndicator, CacheMixin):
             )
 
         # Check if there are at least enough actions for active actions computing.
-        actions = raw_statements["object.id"].nunique()
+        actions = statements.data["action"].nunique()
         if actions < self.active_actions_min:
             raise IndicatorConsistencyException(
                 f"Sliding window will not be computed. "
@@ -167,7 +499,7 @@ class SlidingWindowIndicator(BaseIndicator, CacheMixin):
             )
 
         # Check if there are enough students to compute the dynamic cohort.
-        cohort = raw_statements["actor.account.name"].nunique()
+        cohort = statements.data["actor"].nunique()
         if cohort < self.dynamic_cohort_min:
             raise IndicatorConsistencyException(
                 f"Sliding window will not be computed. "
@@ -175,127 +507,222 @@ class SlidingWindowIndicator(BaseIndicator, CacheMixin):
                 f"less than {self.dynamic_cohort_min} students."
             )
 
-        return raw_statements
+        return statements
 
     async def compute(self) -> SlidingWindow:
-        """Return parameters of computed sliding window."""
+        """Return parameters of computed sliding window.
+
+        The sliding window is computed once for the whole cohort and cached as an
+        artifact of the course, student sliding windows being derived from it.
+        """
+        sliding_window = await self.memoize_artifact(
+            "sliding_window",
+            get_artifact_parameters(self, "sliding_window"),
+            self._compute,
+        )
+        if self.student_id is None or sliding_window.active_actions is None:
+            return sliding_window
+
+        # Students can only read aggregated information about the sliding window
+        return SlidingWindow(
+            window=sliding_window.window,
+            active_actions=[
+                action.copy(
+                    update={
+                        "activation_students": None,
+                        "is_activator_student": self.student_id
+                        in action.activation_students,
+                    }
+                )
+                for action in sliding_window.active_actions
+            ],
+            dynamic_cohort=None,
+        )
+
+    async def _compute(self) -> SlidingWindow:
+        """Compute the sliding window of the whole cohort."""
         statements = await self.get_statements()
-        min_datetime = statements["date"].min()
-        since = self.until - timedelta(self.sliding_window_min)
+        result = find_sliding_window(
+            statements,
+            until=to_epoch_day(self.until),
+            sliding_window_min=self.sliding_window_min,
+            active_actions_min=self.active_actions_min,
+            dynamic_cohort_min=self.dynamic_cohort_min,
+        )
+
+        if result is None:
+            return SlidingWindow(window=Window(since=self.until, until=self.until))
 
-        # Instantiate indicator
-        sliding_window = SlidingWindow(
-            window=Window(since=self.until, until=self.until)
+        return SlidingWindow(
+            window=Window(since=from_epoch_day(result.since), until=self.until),
+            active_actions=self._compute_activation(
+                statements, result.active_actions, len(result.cohort), None
+            ),
+            dynamic_cohort=statements.decode_actors(result.cohort),
         )
-        active_actions = pd.DataFrame(columns=["iri", "name", "module_type"])
 
-        while since >= min_datetime:
-            # Filter on statements emitted within the sliding window
-            window_statements = statements[since <= statements["date"]]
+    async def compute_history(self, since_until: date) -> SlidingWindowHistory:
+        """Return sliding windows until each day from `since_until` to `until`.
 
-            if window_statements.empty:
-                since -= timedelta(days=1)  # step back from one day
+        Statements are loaded once until the last day (and shared with the sliding
+        window), the sliding window until a previous day being searched among
+        statements of days before it. Statements entries are sorted once for all
+        days (see `WindowHistorySearch`), each search only stepping over the days
+        of its window.
+        """
+        statements = await self.get_statements()
+        search = WindowHistorySearch(
+            statements,
+            sliding_window_min=self.sliding_window_min,
+            active_actions_min=self.active_actions_min,
+            dynamic_cohort_min=self.dynamic_cohort_min,
+        )
+        student = (
+            -1 if self.student_id is None else statements.actor_code(self.student_id)
+        )
+        until = to_epoch_day(self.until)
+
+        windows = []
+        for day in range(to_epoch_day(since_until), until + 1):
+            # Statements are loaded until the last day midnight included
+            before = until + 1 if day == until else day
+            result = search.search(day, before)
+            day_until = from_epoch_day(day)
+            if result is None:
+                windows.append(
+                    SlidingWindow(window=Window(since=day_until, until=day_until))
+                )
                 continue
-
-            # Count unique active students in the sliding window
-            cohort = window_statements["actor.account.name"].unique()
-            cohort_size = len(cohort)
-
-            # Loop on actions
-            actions = (
-                window_statements.groupby(
-                    [
-                        "object.id",
-                        "object.definition.name",
-                        "context.extensions.http://lrs.learninglocker.net/define/extensions/info.event_name",
-                    ]
-                )["actor.account.name"]
-                .nunique()
-                .reset_index()
-            )
-            actions.rename(
-                columns={
-                    "object.id": "iri",
-                    "object.definition.name": "name",
-                    (
-                        "context.extensions.http://lrs.learninglocker.net"
-                        "/define/extensions/info.event_name"
-                    ): "module_type",
-                    "actor.account.name": "cohort",
-                },
-                inplace=True,
+            windows.append(
+                SlidingWindow(
+                    window=Window(since=from_epoch_day(result.since), until=day_until),
+                    active_actions=self._compute_history_activation(
+                        statements, search, result, before, student
+                    ),
+                    dynamic_cohort=result.cohort_size,
+                )
             )
+        return SlidingWindowHistory(windows=windows)
 
-            # Find active actions on the current window
-            for _, action in actions.iterrows():
-                # Check for action not recorded as an active action
-                if action.iri in active_actions["iri"].values:
-                    continue
-                # Record new active action
-                if (
-                    0.1 * cohort_size <= action.cohort
-                    and action.cohort >= self.dynamic_cohort_min
-                ):
-                    active_actions.loc[len(active_actions)] = action[  # type: ignore[call-overload]
-                        ["iri", "name", "module_type"]
-                    ]
+    def _compute_history_activation(  # noqa: PLR0913
+        self,
+        statements: StatementFrame,
+        search: WindowHistorySearch,
+        result: WindowHistoryResult,
+        before: int,
+        student: int,
+    ) -> List[Action]:
+        """Compute activation information of a sliding window of a history.
 
-            if len(active_actions) < self.active_actions_min:
-                since -= timedelta(days=1)  # step back from one day
-                continue
+        Activators are not listed so that histories remain compact.
+        """
+        active_actions = result.active_actions.astype(int)
+        activation = search.activations(active_actions["action"], before, student)
 
-            dynamic_cohort = None
-            if self.student_id is None:
-                dynamic_cohort = cohort.tolist()
+        active_actions["iri"] = statements.actions[active_actions["action"]]
+        active_actions["name"] = statements.names[active_actions["name"]]
+        active_actions["module_type"] = statements.module_types[
+            active_actions["module_type"]
+        ]
+        active_actions["activation_date"] = [
+            from_epoch_day(day) for day in activation["day"]
+        ]
+        active_actions["activation_rate"] = np.minimum(
+            activation["students"].to_numpy() / result.cohort_size, 1.0
+        )
+        active_actions["is_activator_student"] = (
+            None if self.student_id is None else activation["is_activator"].tolist()
+        )
+        active_actions["activation_students"] = None
+
+        return cast(
+            List[Action], dataframe_to_pydantic(Action, active_actions, trusted=True)
+        )
+
+    async def get_incidence(self) -> Incidence:
+        """Return the incidence matrix of students and active actions of the course.
+
+        The matrix is built once from statements for indicators computed in the
+        same context (see `Incidence`), active actions being sorted by IRI.
+        """
+        return await self.context.memoize(
+            (
+                "incidence",
+                self.sliding_window_min,
+                self.active_actions_min,
+                self.dynamic_cohort_min,
+            ),
+            self._compute_incidence,
+        )
 
-            return SlidingWindow(
-                window=Window(since=since, until=self.until),
-                active_actions=self._compute_activation(
-                    statements, active_actions, cohort_size, self.student_id
-                ),
-                dynamic_cohort=dynamic_cohort,
+    async def _compute_incidence(self) -> Incidence:
+        """Build the incidence matrix of students and active actions."""
+        sliding_window = await self.compute()
+        if not sliding_window.active_actions:
+            raise IndicatorConsistencyException(
+                "Sliding window will not be computed. "
+                "Not enough active actions have been found."
             )
 
-        return sliding_window
+        statements = await self.get_statements()
+        return Incidence.from_statements(
+            statements,
+            np.sort(
+                statements.action_codes(
+                    action.iri for action in sliding_window.active_actions
+                )
+            ),
+        )
 
     def _compute_activation(
         self,
-        statements,
-        active_actions,
+        statements: StatementFrame,
+        active_actions: pd.DataFrame,
         dynamic_cohort_size: int,
         student_id: Union[str, None],
     ) -> List[Action]:
-        """Compute activation information over the course."""
-        active_actions["activation_date"] = None
-        active_actions["activation_rate"] = None
-        active_actions["is_activator_student"] = None
-        active_actions["activation_students"] = None
+        """Compute activation information over the course.
 
-        for index, action in active_actions.iterrows():
-            # Retrieve all statements related to the action
-            action_statements = statements[statements["object.id"] == action["iri"]]
-            activation_date = min(action_statements["date"])
-            activation_students = (
-                action_statements["actor.account.name"].unique().tolist()
-            )
-            activation_rate = len(activation_students) / dynamic_cohort_size
-            if activation_rate > 1.0:  # noqa PLR2004
-                activation_rate = 1.0
+        Activation dates and activators of all active actions are computed with a
+        single aggregation over their statements. Activation rates and student
+        activations are popcounts and bit tests of bitmaps of their activators
+        (see `StudentBitmaps`).
+        """
+        active_actions = active_actions.astype(int)
+        activation = statements.activations(active_actions["action"]).loc[
+            active_actions["action"]
+        ]
+        activators = statements.bitmaps(active_actions["action"])
 
-            active_actions.loc[index, "activation_date"] = activation_date
-            active_actions.loc[index, "activation_rate"] = activation_rate
+        active_actions["iri"] = statements.actions[active_actions["action"]]
+        active_actions["name"] = statements.names[active_actions["name"]]
+        active_actions["module_type"] = statements.module_types[
+            active_actions["module_type"]
+        ]
+        active_actions["activation_date"] = [
+            from_epoch_day(day) for day in activation["day"]
+        ]
+        active_actions["activation_rate"] = np.minimum(
+            activators.count() / dynamic_cohort_size, 1.0
+        )
+        active_actions["is_activator_student"] = None
+        active_actions["activation_students"] = None
 
-            if student_id:
-                active_actions.loc[index, "is_activator_student"] = (
-                    True if student_id in activation_students else False
-                )
-            else:
-                active_actions.at[index, "activation_students"] = activation_students
+        if student_id:
+            active_actions["is_activator_student"] = activators.contain(
+                statements.actor_code(student_id)
+            ).tolist()
+        else:
+            active_actions["activation_students"] = [
+                statements.decode_actors(codes) for codes in activation["activators"]
+            ]
 
-        return dataframe_to_pydantic(Action, active_actions)
+        return cast(
+            List[Action], dataframe_to_pydantic(Action, active_actions, trusted=True)
+        )
 
 
-class CohortIndicator(BaseIndicator, CacheMixin):
+class CohortIndicator(BaseIndicator, CacheMixin, SnapshotMixin):
     """Compute student active actions activities."""
 
     until: date = date.today()
@@ -311,6 +738,9 @@ class CohortIndicator(BaseIndicator, CacheMixin):
         dynamic_cohort_min: int = settings.DYNAMIC_COHORT_MIN,
     ):
         """Initialize Cohort indicator."""
+        if until is None:
+            until = date.today()
+
         super().__init__(
             course_id=course_id,
             until=until,
@@ -332,51 +762,60 @@ class CohortIndicator(BaseIndicator, CacheMixin):
         )
 
     async def compute(self) -> Json:
-        """Return list of active actions per student in the course cohort."""
-        sliding_window_indicator = SlidingWindowIndicator(
-            course_id=self.course_id,
-            until=self.until,
+        """Return list of active actions per student in the course cohort.
+
+        Active actions of the whole cohort are computed once and cached as an
+        artifact of the course, students looking up their own active actions
+        (students without statements on active actions have none).
+        """
+        cohort = await self.memoize_artifact(
+            "cohort",
+            get_artifact_parameters(self, "cohort"),
+            self._compute_course_cohort,
         )
-        sliding_window = await sliding_window_indicator.compute()
-        statements = await sliding_window_indicator.get_statements()
-        active_actions = sliding_window.active_actions
 
-        if not active_actions:
-            raise IndicatorConsistencyException(
-                "Sliding window will not be computed. "
-                "Not enough active actions have been found."
-            )
+        if self.student_id:
+            return {self.student_id: cohort.get(self.student_id, [])}
 
-        # Filter statements from active actions
-        filtered_statements = statements[
-            statements["object.id"].isin([action.iri for action in active_actions])
-        ]
+        return cohort
 
-        # Function to remove duplicates from a list
-        def remove_duplicates(values: List):
-            return list(dict.fromkeys(values))
+    async def compute_records(self) -> IndicatorRecords:
+        """Return active actions, then the active actions of each student.
 
-        student_active_actions = (
-            filtered_statements.groupby("actor.account.name")["object.id"]
-            .apply(remove_duplicates)
-            .agg(list)
-            .reset_index()
+        Active actions of a student request are those of the student sliding window,
+        which do not expose other students who made them.
+        """
+        sliding_window = await SlidingWindowIndicator(
+            course_id=self.course_id,
+            until=self.until,
+            student_id=self.student_id,
+            sliding_window_min=self.sliding_window_min,
+            active_actions_min=self.active_actions_min,
+            dynamic_cohort_min=self.dynamic_cohort_min,
+        ).compute()
+        cohort = await self.compute()
+        return IndicatorRecords(
+            header={"actions": sliding_window.active_actions},
+            rows=(
+                {"student": student, "actions": actions}
+                for student, actions in cohort.items()
+            ),
         )
 
-        if self.student_id:
-            return (
-                student_active_actions.set_index("actor.account.name")
-                .loc[[self.student_id]]["object.id"]
-                .to_dict()
-            )
+    async def _compute_course_cohort(self) -> Dict[str, List[str]]:
+        """Compute the list of active actions of every student of the cohort."""
+        sliding_window_indicator = get_course_sliding_window_indicator(self)
+        incidence = await sliding_window_indicator.get_incidence()
+        statements = await sliding_window_indicator.get_statements()
 
-        # add unique filter
-        return student_active_actions.set_index("actor.account.name")[
-            "object.id"
-        ].to_dict()
+        # Distinct active actions per student follow statements order
+        return {
+            actor: statements.decode_actions(incidence.row_actions(row))
+            for row, actor in enumerate(statements.decode_actors(incidence.students))
+        }
 
 
-class ScoresIndicator(BaseIndicator, CacheMixin):
+class ScoresIndicator(BaseIndicator, CacheMixin, SnapshotMixin):
     """Compute student or cohort scores on active actions."""
 
     until: date = date.today()
@@ -394,6 +833,9 @@ class ScoresIndicator(BaseIndicator, CacheMixin):
         dynamic_cohort_min: int = settings.DYNAMIC_COHORT_MIN,
     ):
         """Initialize Scores indicator."""
+        if until is None:
+            until = date.today()
+
         super().__init__(
             course_id=course_id,
             student_id=student_id,
@@ -417,107 +859,130 @@ class ScoresIndicator(BaseIndicator, CacheMixin):
         )
 
     async def compute(self) -> Scores:
-        """Return cohort scores for active actions."""
-        sliding_window_indicator = SlidingWindowIndicator(
-            course_id=self.course_id, until=self.until
-        )
-        sliding_window = await sliding_window_indicator.compute()
+        """Return cohort scores for active actions.
 
-        if not sliding_window.active_actions:
-            raise IndicatorConsistencyException(
-                "Sliding window will not be computed. "
-                "Not enough active actions have been found."
+        Scores of the whole cohort, their average and totals are computed once and
+        cached as an artifact of the course, students looking up their own scores.
+        """
+        sliding_window = await get_course_sliding_window_indicator(self).compute()
+        course_scores = await self._get_course_scores()
+        average = course_scores.average if self.average else None
+        total = course_scores.total if self.totals else None
+
+        if self.student_id:
+            # Student has been inactive
+            if self.student_id not in course_scores.scores:
+                active_actions = sliding_window.active_actions or []
+                return Scores(
+                    actions=active_actions,
+                    scores={
+                        self.student_id: [
+                            -action.activation_rate for action in active_actions
+                        ]
+                    },
+                )
+            return Scores(
+                actions=course_scores.actions,
+                scores={self.student_id: course_scores.scores[self.student_id]},
+                average=average,
+                total=total,
             )
 
-        active_actions = pd.DataFrame(
-            [action.dict() for action in sliding_window.active_actions]
+        return Scores(
+            actions=course_scores.actions,
+            scores=course_scores.scores,
+            average=average,
+            total=total,
         )
-        active_actions.set_index("iri", inplace=True)
 
-        course_cohort_indicator = CohortIndicator(
-            course_id=self.course_id, until=self.until
-        )
-        course_cohort = await course_cohort_indicator.compute()
+    async def compute_records(self) -> IndicatorRecords:
+        """Return active actions and aggregated scores, then scores of each student.
 
-        # Get unique activities from cohort
-        cohort_activities = sorted(
-            {
-                activity
-                for activities in course_cohort.values()
-                for activity in activities
-            }
+        Records of the whole cohort are streamed from the course scores artifact,
+        per-student scores being neither copied nor validated again.
+        """
+        scores = await (
+            self.compute() if self.student_id else self._get_course_scores()
         )
-
-        # Create a DataFrame with 0s and 1s
-        df = pd.DataFrame(
-            {
-                activity: [
-                    1 if activity in course_cohort[student] else 0
-                    for student in course_cohort
-                ]
-                for activity in cohort_activities
+        return IndicatorRecords(
+            header={
+                "actions": scores.actions,
+                "average": scores.average if self.average else None,
+                "total": scores.total if self.totals else None,
             },
-            index=course_cohort.keys(),
+            rows=(
+                {"student": student, "scores": student_scores}
+                for student, student_scores in scores.scores.items()
+            ),
         )
 
-        def compute_students_score(column: pd.Series, action_id, actions: pd.DataFrame):
-            """Apply a transformation on a column."""
-            score = actions.loc[action_id]["activation_rate"]
-            return column.apply(lambda x: float(score) if x == 1 else -float(score))
+    async def compute_compact(self) -> Dict[str, Any]:
+        """Return active actions, aggregated scores and scores in COO format.
 
-        cohort_scores = df.apply(
-            lambda col: compute_students_score(
-                column=col, action_id=col.name, actions=active_actions
-            )
+        Entries are read from the incidence matrix, so that only positive scores
+        are listed: the score of a student for an action which is not listed is the
+        opposite of its activation rate.
+        """
+        scores = await (
+            self.compute() if self.student_id else self._get_course_scores()
         )
+        sliding_window_indicator = get_course_sliding_window_indicator(self)
+        incidence = await sliding_window_indicator.get_incidence()
+        statements = await sliding_window_indicator.get_statements()
 
-        average_scores = None
-        totals_scores = None
-
-        if self.average:
-            average_scores = cohort_scores.mean().tolist()
-
-        if self.totals:
-            totals_scores = cohort_scores.sum().tolist()
+        # Incidence matrix columns follow scores actions (IRI order)
+        students = list(scores.scores)
+        rows, columns, _ = incidence.entries(
+            incidence.student_rows(statements.actor_codes(students)),
+            np.arange(len(incidence.actions)),
+        )
+        rates = np.array([action.activation_rate for action in scores.actions])
+        return {
+            "actions": scores.actions,
+            "average": scores.average if self.average else None,
+            "total": scores.total if self.totals else None,
+            "students": students,
+            "rows": rows.tolist(),
+            "columns": columns.tolist(),
+            "values": rates[columns].tolist(),
+        }
 
-        if self.student_id:
-            # Student has been inactive
-            if self.student_id not in course_cohort.keys():
-                scores = {
-                    self.student_id: [
-                        -action.activation_rate
-                        for action in sliding_window.active_actions
-                    ]
-                }
-                return Scores(
-                    actions=sliding_window.active_actions,
-                    scores=scores,
-                    average_scores=average_scores,
-                    totals_scores=totals_scores,
-                )
+    async def _get_course_scores(self) -> Scores:
+        """Return scores of the whole cohort, cached as an artifact of the course."""
+        return await self.memoize_artifact(
+            "scores",
+            get_artifact_parameters(self, "scores"),
+            self._compute_course_scores,
+        )
 
-            else:
-                # Course cohort is reduced to the student only
-                cohort_scores = cohort_scores.loc[[self.student_id]]
+    async def _compute_course_scores(self) -> Scores:
+        """Compute scores of every student of the cohort, their average and totals."""
+        sliding_window_indicator = get_course_sliding_window_indicator(self)
+        sliding_window = await sliding_window_indicator.compute()
+        incidence = await sliding_window_indicator.get_incidence()
+        statements = await sliding_window_indicator.get_statements()
 
-        scores = {
-            key: list(values.values())
-            for key, values in cohort_scores.to_dict(orient="index").items()
-        }
+        # Incidence matrix columns follow active actions codes, hence IRI order
         actions = sorted(
-            sliding_window.active_actions,
-            key=lambda x: cohort_scores.columns.tolist().index(x.iri),
+            sliding_window.active_actions or [], key=lambda action: action.iri
         )
+        students = statements.decode_actors(incidence.students)
+
+        # Actions x students matrix of activation rates, positive if the student
+        # made the action, negative otherwise (stored action-wise so that
+        # aggregations sum contiguous values)
+        rates = np.array([action.activation_rate for action in actions])[:, None]
+        cohort_scores = np.where(incidence.to_dense(), rates, -rates)
 
         return Scores(
             actions=actions,
-            scores=scores,
-            average=average_scores,
-            total=totals_scores,
+            scores=dict(zip(students, cohort_scores.T.tolist())),
+            average=cohort_scores.mean(axis=1).tolist(),
+            total=cohort_scores.sum(axis=1).tolist(),
         )
 
 
-class GradesIndicator(BaseIndicator, CacheMixin):
+class GradesIndicator(BaseIndicator, CacheMixin, SnapshotMixin):
     """Compute marks on graded activities."""
 
     until: date = date.today()
@@ -534,6 +999,9 @@ class GradesIndicator(BaseIndicator, CacheMixin):
         dynamic_cohort_min: int = settings.DYNAMIC_COHORT_MIN,
     ):
         """Initialize Grades indicator."""
+        if until is None:
+            until = date.today()
+
         super().__init__(
             course_id=course_id,
             student_id=student_id,
@@ -558,45 +1026,136 @@ class GradesIndicator(BaseIndicator, CacheMixin):
     async def compute(self) -> Grades:
         """Compute list of marks for graded active activities either for cohort students
         or a specific student.
+
+        Grades of the whole cohort and their average are computed once and cached as
+        an artifact of the course, students looking up their own grades on the
+        activities they made.
         """  # noqa: D205
-        sliding_window_indicator = SlidingWindowIndicator(
-            course_id=self.course_id, until=self.until
+        course_grades = await self._get_course_grades()
+
+        if self.student_id is None:
+            return Grades(
+                actions=course_grades.actions,
+                grades=course_grades.grades,
+                average=course_grades.average if self.average else None,
+            )
+
+        # Activities made by the student are sliced from the incidence matrix
+        sliding_window_indicator = get_course_sliding_window_indicator(self)
+        incidence = await sliding_window_indicator.get_incidence()
+        statements = await sliding_window_indicator.get_statements()
+        made = set(
+            statements.decode_actions(
+                incidence.student_actions(
+                    int(statements.actor_codes([self.student_id])[0])
+                )
+            )
+        )
+        student_grades = course_grades.grades.get(self.student_id)
+        indices = [
+            index
+            for index, activity in enumerate(course_grades.actions)
+            if student_grades is not None and activity.iri in made
+        ]
+        grades = [student_grades[index] for index in indices]  # type: ignore[index]
+
+        return Grades(
+            actions=[course_grades.actions[index] for index in indices],
+            grades={self.student_id: grades} if student_grades is not None else {},
+            average=(
+                [np.nan if grade is None else grade for grade in grades]
+                if self.average
+                else None
+            ),
+        )
+
+    async def compute_records(self) -> IndicatorRecords:
+        """Return graded activities and average grades, then grades of each student.
+
+        Records of the whole cohort are streamed from the course grades artifact,
+        per-student grades being neither copied nor validated again.
+        """
+        grades = await (
+            self.compute() if self.student_id else self._get_course_grades()
+        )
+        return IndicatorRecords(
+            header={
+                "actions": grades.actions,
+                "average": grades.average if self.average else None,
+            },
+            rows=(
+                {"student": student, "grades": student_grades}
+                for student, student_grades in grades.grades.items()
+            ),
         )
-        sliding_window = await sliding_window_indicator.compute()
 
+    async def compute_compact(self) -> Dict[str, Any]:
+        """Return graded activities, average grades and grades in COO format.
+
+        Entries having a grade are read from the incidence matrix.
+        """
+        grades = await (
+            self.compute() if self.student_id else self._get_course_grades()
+        )
+        sliding_window_indicator = get_course_sliding_window_indicator(self)
+        incidence = await sliding_window_indicator.get_incidence()
         statements = await sliding_window_indicator.get_statements()
 
-        active_actions = sliding_window.active_actions
+        students = list(grades.grades)
+        rows, columns, entries = incidence.entries(
+            incidence.student_rows(statements.actor_codes(students)),
+            np.asarray(
+                np.searchsorted(
+                    incidence.actions,
+                    statements.action_codes(action.iri for action in grades.actions),
+                )
+            ),
+        )
+        values = incidence.grades[entries]
+        graded = ~np.isnan(values)
+        return {
+            "actions": grades.actions,
+            "average": grades.average if self.average else None,
+            "students": students,
+            "rows": rows[graded].tolist(),
+            "columns": columns[graded].tolist(),
+            "values": values[graded].tolist(),
+        }
 
-        if not active_actions:
-            raise IndicatorConsistencyException(
-                "Sliding window will not be computed. "
-                "Not enough active actions have been found."
-            )
+    async def _get_course_grades(self) -> Grades:
+        """Return grades of the whole cohort, cached as an artifact of the course."""
+        return await self.memoize_artifact(
+            "grades",
+            get_artifact_parameters(self, "grades"),
+            self._compute_course_grades,
+        )
 
-        # Filter on active activities
+    async def _compute_course_grades(self) -> Grades:
+        """Compute grades of every student of the cohort and their average."""
+        sliding_window_indicator = get_course_sliding_window_indicator(self)
+        sliding_window = await sliding_window_indicator.compute()
+        incidence = await sliding_window_indicator.get_incidence()
+        statements = await sliding_window_indicator.get_statements()
+
+        # Filter on active activities made by at least one student
         active_activities = [
             activity
-            for activity in active_actions
+            for activity in sliding_window.active_actions or []
             if activity.module_type in Activities
         ]
-        filtered_statements = statements[
-            statements["object.id"].isin([action.iri for action in active_activities])
-        ]
-
-        if self.student_id:
-            filtered_statements = filtered_statements[
-                filtered_statements["actor.account.name"] == self.student_id
-            ]
-
-        # select statements associated to a grade
-        filtered_statements.dropna(subset=["result.score.scaled"])
-        results = filtered_statements.pivot(
-            index="actor.account.name",
-            columns="object.id",
-            values="result.score.scaled",
+        columns = np.flatnonzero(
+            np.isin(
+                incidence.actions,
+                statements.action_codes(action.iri for action in active_activities),
+            )
+            & np.isin(np.arange(len(incidence.actions)), incidence.indices)
         )
-        results = results.replace(np.nan, None)
+        students, table = incidence.grades_table(columns)
+        results = pd.DataFrame(
+            table,
+            index=statements.decode_actors(students),
+            columns=statements.decode_actions(incidence.actions[columns]),
+        ).replace(np.nan, None)
 
         graded_active_activities = [
             activity
@@ -613,8 +1172,6 @@ class GradesIndicator(BaseIndicator, CacheMixin):
             key: list(values.values())
             for key, values in results.to_dict(orient="index").items()
         }
-        average = None
-        if self.average:
-            average = results.mean().tolist()
-
-        return Grades(actions=activities, grades=grades, average=average)
+        return Grades(
+            actions=activities, grades=grades, average=results.mean().tolist()
+        )
@@ -76,6 +76,16 @@ class SlidingWindow(BaseModel):
     dynamic_cohort: Optional[Union[List[str], int]]
 
 
+class SlidingWindowHistory(BaseModel):
+    """Model for course sliding windows computed for a range of dates.
+
+    Sliding windows are listed day by day, their dynamic cohort being reduced to
+    its size.
+    """
+
+    windows: List[SlidingWindow]
+
+
 class Scores(BaseModel):
     """Model for computed score indicator."""
 
@@ -91,3 +101,15 @@ class Grades(BaseModel):
     actions: List[Action]
     grades: Dict
     average: Optional[List[float]]
+
+
+class Dashboard(BaseModel):
+    """Model for the bundle of indicators displayed by the dashboard.
+
+    Indicators which have not been requested are not set.
+    """
+
+    window: Optional[SlidingWindow] = None
+    cohort: Optional[Dict[str, List[str]]] = None
+    scores: Optional[Scores] = None
+    grades: Optional[Grades] = None
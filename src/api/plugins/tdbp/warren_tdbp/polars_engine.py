@@ -0,0 +1,74 @@
+"""Polars compute engine for TdBP indicators.
+
+Only the aggregations of the statements frame giving the sliding window cohort
+and the activation of actions are run with Polars, benefiting from
+multi-threaded group-bys. The sliding window search runs on students bitmaps
+(see `StudentBitmaps`), cohort, scores and grades are derived with NumPy from
+the incidence matrix (see `Incidence`), whatever the engine. Results are
+converted back to the pandas and NumPy objects returned by the default engine.
+"""
+
+import numpy as np
+import pandas as pd
+
+try:
+    import polars as pl
+except ImportError as error:  # pragma: no cover
+    raise ImportError(
+        "The polars compute engine requires the polars optional dependency, "
+        "install it with: pip install warren-tdbp[polars]"
+    ) from error
+
+from .statements import FACT_COLUMNS, StatementFrame
+
+
+class PolarsStatementFrame(StatementFrame):
+    """Statements frame computing aggregations with Polars."""
+
+    @property
+    def frame(self) -> pl.DataFrame:
+        """Return encoded statements columns as a Polars frame.
+
+        Polars series are built over the NumPy arrays of the pandas frame without
+        copying them, so that statements are not held twice in memory. Scores are
+        left out as no Polars aggregation uses them.
+        """
+        return pl.DataFrame(
+            [pl.Series(column, self.data[column].to_numpy()) for column in FACT_COLUMNS]
+        )
+
+    def _statements_of(self, action_codes) -> pl.DataFrame:
+        """Return statements of given actions."""
+        return self.frame.filter(
+            pl.col("action").is_in(np.asarray(action_codes, dtype=np.int32))
+        )
+
+    def students_since(self, day: int) -> np.ndarray:
+        """Return codes of students active since an epoch day, in statements order."""
+        return (
+            self.frame.filter(pl.col("day") >= day)["actor"]
+            .unique(maintain_order=True)
+            .to_numpy()
+        )
+
+    def activations(self, action_codes) -> pd.DataFrame:
+        """Return the activation of actions, indexed by action code.
+
+        Columns are the first statement `day` and the codes of distinct students
+        who made the action (`activators`), in statements order.
+        """
+        activations = (
+            self._statements_of(action_codes)
+            .group_by("action")
+            .agg(
+                pl.col("day").min(),
+                pl.col("actor").unique(maintain_order=True).alias("activators"),
+            )
+        )
+        return pd.DataFrame(
+            {
+                "day": activations["day"].to_numpy(),
+                "activators": activations["activators"].to_list(),
+            },
+            index=pd.Index(activations["action"].to_numpy(), name="action"),
+        )
@@ -0,0 +1,177 @@
+"""Precompute TdBP indicators of indexed courses."""
+
+import asyncio
+import logging
+from datetime import date, datetime, time
+from time import perf_counter
+from typing import List, NamedTuple, Optional, Sequence
+
+from httpx import HTTPError
+from warren.exceptions import LrsClientException
+from warren.xi.client import ExperienceIndex
+from warren.xi.enums import AggregationLevel
+
+from .conf import settings
+from .exceptions import ExperienceIndexException, IndicatorConsistencyException
+from .indicators import (
+    CohortIndicator,
+    GradesIndicator,
+    ScoresIndicator,
+    SlidingWindowIndicator,
+)
+from .utils import gather_or_cancel
+
+logger = logging.getLogger(__name__)
+
+PRECOMPUTED_INDICATORS = (
+    SlidingWindowIndicator,
+    CohortIndicator,
+    ScoresIndicator,
+    GradesIndicator,
+)
+XI_PAGE_SIZE = 100
+
+
+class CoursePrecomputation(NamedTuple):
+    """Outcome of the precomputation of a course indicators.
+
+    Attributes:
+        course_id (str): IRI of the course.
+        status (str): "computed", "skipped" (no new statements) or "failed".
+        duration (float): duration of the precomputation in seconds.
+        error (str): error message of failed precomputations.
+    """
+
+    course_id: str
+    status: str
+    duration: float
+    error: Optional[str] = None
+
+
+async def list_courses() -> List[str]:
+    """Return IRIs of courses indexed in the Experience Index.
+
+    Course experiences are listed page by page, then resolved concurrently (up to
+    `settings.XI_MAX_CONCURRENT_REQUESTS` simultaneous requests) since listed
+    experiences do not expose their IRI.
+    """
+    xi = ExperienceIndex(url=settings.BASE_XI_URL)
+    semaphore = asyncio.Semaphore(settings.XI_MAX_CONCURRENT_REQUESTS)
+
+    async def get_iri(experience_id):
+        async with semaphore:
+            experience = await xi.experience.get(object_id=experience_id)
+        return None if experience is None else experience.iri
+
+    try:
+        experiences: list = []
+        while True:
+            page = await xi.experience.read(
+                aggregation_level=AggregationLevel.THREE,
+                offset=len(experiences),
+                limit=XI_PAGE_SIZE,
+            )
+            experiences.extend(page)
+            if len(page) < XI_PAGE_SIZE:
+                break
+        iris = await gather_or_cancel(
+            *(get_iri(experience.id) for experience in experiences)
+        )
+    except HTTPError as exception:
+        raise ExperienceIndexException("Failed to list courses") from exception
+    finally:
+        await xi.close()
+
+    return [iri for iri in iris if iri is not None]
+
+
+async def has_new_statements(course_id: str, since: datetime, until: datetime) -> bool:
+    """Return whether statements related to a course were stored in a period.
+
+    The LRS is queried the way course statements are fetched (see
+    `settings.LRS_FETCH_MODE`), so that statements only reachable from course
+    actions are taken into account.
+    """
+    indicator = SlidingWindowIndicator(course_id=course_id, until=until.date())
+    watermark = await indicator.get_lrs_watermark(
+        {"since": since.isoformat(), "until": until.isoformat()}
+    )
+    return watermark is not None
+
+
+async def precompute_course(course_id: str, until: date):
+    """Compute and cache indicators of a course for the whole cohort.
+
+    Indicators are computed in the same computation context, so that the course
+    actions, the statements and the sliding window are only computed once. Their
+    course-level results are stored in the artifacts cache along with these
+    artifacts, where API endpoints look them up.
+    """
+    for indicator_class in PRECOMPUTED_INDICATORS:
+        await indicator_class(course_id=course_id, until=until).compute()
+
+
+async def precompute(
+    courses: Sequence[str],
+    until: date,
+    since: Optional[date] = None,
+    workers: int = settings.PRECOMPUTE_WORKERS,
+) -> List[CoursePrecomputation]:
+    """Precompute indicators of courses with a pool of workers.
+
+    Args:
+        courses (list): IRIs of courses to precompute indicators for.
+        until (date): date until when indicators are computed.
+        since (date): courses without statements stored in the LRS since this date
+            (and until the `until` date) are skipped. All courses are precomputed
+            if not set.
+        workers (int): number of courses precomputed concurrently.
+
+    Returns:
+        The precomputation outcome of each course, following courses order.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    for index, course_id in enumerate(courses):
+        queue.put_nowait((index, course_id))
+    results: List[Optional[CoursePrecomputation]] = [None] * len(courses)
+
+    async def run(course_id: str) -> CoursePrecomputation:
+        start = perf_counter()
+        try:
+            if since is not None and not await has_new_statements(
+                course_id,
+                datetime.combine(since, time.min),
+                datetime.combine(until, time.min),
+            ):
+                return CoursePrecomputation(
+                    course_id, "skipped", perf_counter() - start
+                )
+            await precompute_course(course_id, until)
+        except (
+            ExperienceIndexException,
+            IndicatorConsistencyException,
+            LrsClientException,
+            HTTPError,
+        ) as error:
+            logger.warning("Failed to precompute %s: %s", course_id, error)
+            return CoursePrecomputation(
+                course_id, "failed", perf_counter() - start, str(error)
+            )
+        except Exception as error:
+            # Unexpected errors of a course should not cancel other courses
+            logger.exception("Failed to precompute %s", course_id)
+            return CoursePrecomputation(
+                course_id, "failed", perf_counter() - start, str(error)
+            )
+        return CoursePrecomputation(course_id, "computed", perf_counter() - start)
+
+    async def worker():
+        while not queue.empty():
+            index, course_id = queue.get_nowait()
+            results[index] = result = await run(course_id)
+            logger.info(
+                "Course %s %s in %.3fs", course_id, result.status, result.duration
+            )
+
+    await gather_or_cancel(*(worker() for _ in range(max(workers, 1))))
+    return results  # type: ignore[return-value]
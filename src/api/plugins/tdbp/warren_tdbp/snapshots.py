@@ -0,0 +1,157 @@
+"""Snapshots of TdBP indicators results for past dates."""
+
+import logging
+from datetime import date, datetime, time, timezone
+from functools import partial
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from sqlmodel import Session, select
+from warren.indicators.models import CacheEntry
+
+from .artifacts import ARTIFACT_KINDS, ArtifactCache, ArtifactMixin, _digest
+from .conf import settings
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY_PREFIX = "tdbp_snapshot"
+
+# Course-level results which are snapshotted for past dates
+SNAPSHOT_KINDS = ("sliding_window", "cohort", "scores", "grades")
+
+
+def _until_datetime(until: date) -> datetime:
+    """Return the UTC datetime of the midnight ending statements of a date."""
+    return datetime.combine(until, time.min, tzinfo=timezone.utc)
+
+
+def snapshot_key(kind: str, course_id: str, parameters: Tuple) -> str:
+    """Return the key of a course result snapshot.
+
+    Keys are composed like artifacts cache keys (see `ArtifactCache`), e.g.
+    tdbp_snapshot-scores-3e1d2c8b2a9f0e17-6f1a9c30b4d8e2a7c5b1f0d9e8a7b6c5.
+    """
+    return "-".join(
+        (
+            SNAPSHOT_KEY_PREFIX,
+            kind,
+            ArtifactCache.course_digest(course_id),
+            _digest(parameters, 32),
+        )
+    )
+
+
+def is_snapshottable(kind: str, until: date) -> bool:
+    """Return whether a result is snapshotted: a course-level result for a past date.
+
+    Statements until past dates are not expected to change, hence their results.
+    """
+    return kind in SNAPSHOT_KINDS and until < date.today()
+
+
+async def get_or_compute_snapshot(  # noqa: PLR0913
+    kind: str,
+    course_id: str,
+    until: date,
+    parameters: Tuple,
+    factory: Callable[[], Awaitable],
+    session: Session,
+) -> Any:
+    """Return the snapshot of a course result for a past date, or compute it.
+
+    Snapshots are append-only: a computed result is stored once and served until
+    it is explicitly invalidated (see `invalidate_snapshots`), for instance when
+    late statements have been stored in the LRS.
+
+    Args:
+        kind (str): result kind (see `SNAPSHOT_KINDS`).
+        course_id (str): course the result is computed for.
+        until (date): date until when statements the result is computed from have
+            been made.
+        parameters (tuple): JSON-serializable parameters the result depends on.
+        factory (Callable): coroutine function computing the result.
+        session (Session): database session storing snapshots.
+    """
+    artifact_kind = ARTIFACT_KINDS[kind]
+    key = snapshot_key(kind, course_id, parameters)
+    snapshot = session.exec(
+        select(CacheEntry).where(CacheEntry.key == key)
+    ).one_or_none()
+    if snapshot is not None:
+        logger.debug("Loading %s %s from snapshots", kind, key)
+        return artifact_kind.loads(snapshot.value)
+
+    value = await factory()
+
+    # Another worker may have stored the snapshot during the computation
+    if session.exec(select(CacheEntry.id).where(CacheEntry.key == key)).first():
+        return value
+    with session.begin_nested():
+        session.add(
+            CacheEntry(
+                key=key,
+                value=artifact_kind.dumps(value),
+                until=_until_datetime(until),
+            )
+        )
+    session.commit()
+    return value
+
+
+def invalidate_snapshots(
+    session: Session,
+    course_id: str,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+) -> int:
+    """Delete snapshots of a course, optionally restricted to a range of dates.
+
+    Args:
+        session (Session): database session storing snapshots.
+        course_id (str): course whose snapshots are deleted.
+        since (date): only delete snapshots of results until this date or later.
+        until (date): only delete snapshots of results until this date or earlier.
+
+    Returns:
+        The number of deleted snapshots.
+    """
+    pattern = f"{SNAPSHOT_KEY_PREFIX}-%-{ArtifactCache.course_digest(course_id)}-%"
+    query = select(CacheEntry).where(
+        CacheEntry.key.like(pattern)  # type: ignore[attr-defined]
+    )
+    if since is not None:
+        query = query.where(CacheEntry.until >= _until_datetime(since))  # type: ignore[operator]
+    if until is not None:
+        query = query.where(CacheEntry.until <= _until_datetime(until))  # type: ignore[operator]
+
+    snapshots = session.exec(query).all()
+    for snapshot in snapshots:
+        session.delete(snapshot)
+    session.commit()
+    return len(snapshots)
+
+
+class SnapshotMixin(ArtifactMixin):
+    """A mixin serving course-level results of past dates from snapshots.
+
+    Results of past dates are looked up in snapshots when they are missing from
+    the artifacts cache (see `get_or_compute_snapshot`), if
+    `settings.SNAPSHOT_PAST_RESULTS` is set.
+    """
+
+    until: date
+
+    async def memoize_artifact(
+        self, kind: str, parameters: Tuple, factory: Callable[[], Awaitable]
+    ) -> Any:
+        """Return a course artifact, snapshotting course-level results of past dates."""
+        if settings.SNAPSHOT_PAST_RESULTS and is_snapshottable(kind, self.until):
+            factory = partial(
+                get_or_compute_snapshot,
+                kind,
+                self.course_id,
+                self.until,
+                parameters,
+                factory,
+                self.db_session,
+            )
+        return await super().memoize_artifact(kind, parameters, factory)
@@ -0,0 +1,413 @@
+"""Statements ingestion for TdBP indicators."""
+
+import io
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Type
+
+import numpy as np
+import pandas as pd
+
+from .bitmaps import StudentBitmaps
+from .conf import settings
+
+# Statements DataFrame columns
+ID = "id"
+TIMESTAMP = "timestamp"
+OBJECT_ID = "object.id"
+OBJECT_NAME = "object.definition.name"
+ACTOR = "actor.account.name"
+EVENT_NAME = (
+    "context.extensions.http://lrs.learninglocker.net/define/extensions/info.event_name"
+)
+SCORE = "result.score.scaled"
+STORED = "stored"
+
+COLUMNS = (ID, TIMESTAMP, OBJECT_ID, OBJECT_NAME, ACTOR, EVENT_NAME, SCORE, STORED)
+
+# Datetime columns, stored as naive UTC datetimes in chunks
+DATETIME_COLUMNS = (TIMESTAMP, STORED)
+
+LEARNING_LOCKER_INFO_EXTENSION = "http://lrs.learninglocker.net/define/extensions/info"
+VOIDED_VERB = "http://adlnet.gov/expapi/verbs/voided"
+
+
+def project_statement(statement: dict) -> Tuple:
+    """Extract fields used by indicators from a statement.
+
+    Returned values follow the `COLUMNS` order. The object name is the first
+    language map value of the object definition name.
+    """
+    object_ = statement.get("object") or {}
+    name = (object_.get("definition") or {}).get("name") or {}
+    actor = statement.get("actor") or {}
+    extensions = (statement.get("context") or {}).get("extensions") or {}
+    score = ((statement.get("result") or {}).get("score") or {}).get("scaled")
+    return (
+        statement.get("id"),
+        statement.get("timestamp"),
+        object_.get("id"),
+        next(iter(name.values()), None),
+        (actor.get("account") or {}).get("name"),
+        (extensions.get(LEARNING_LOCKER_INFO_EXTENSION) or {}).get("event_name"),
+        score,
+        statement.get("stored"),
+    )
+
+
+def is_voiding_statement(statement: dict) -> bool:
+    """Return whether a statement voids another statement."""
+    return (statement.get("verb") or {}).get("id") == VOIDED_VERB
+
+
+class StatementsAccumulator:
+    """Accumulate projected LRS statements in typed columnar chunks.
+
+    Only fields used by indicators are extracted from statements (see `COLUMNS`)
+    and statements with an already seen identifier are skipped. Extracted values
+    are buffered until a page of `chunk_size` statements is complete. The page is
+    then converted to typed column arrays, so that the accumulator never holds
+    more than one page of Python values. Chunks are only concatenated when
+    building the final DataFrame.
+
+    Accumulators sharing the same `seen_ids` set de-duplicate statements across
+    each other.
+
+    Voiding statements are not accumulated: identifiers of the statements they
+    void are collected in `voided` instead, and voided statements are dropped when
+    building the final DataFrame.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = settings.LRS_READ_CHUNK_SIZE,
+        seen_ids: Optional[Set[str]] = None,
+    ):
+        """Initialize an empty accumulator."""
+        self.chunk_size = chunk_size
+        self.seen_ids = seen_ids if seen_ids is not None else set()
+        self.voided: Set[str] = set()
+        self._page: List[Tuple] = []
+        self._chunks: List[Dict[str, np.ndarray]] = []
+        self._size = 0
+
+    def __len__(self) -> int:
+        """Return the number of accumulated statements."""
+        return self._size + len(self._page)
+
+    def append(self, statement: dict):
+        """Add a statement to the current page unless it has already been seen."""
+        if is_voiding_statement(statement):
+            voided_id = (statement.get("object") or {}).get("id")
+            if voided_id:
+                self.voided.add(voided_id)
+            return
+        values = project_statement(statement)
+        statement_id = values[0]
+        if statement_id is not None:
+            if statement_id in self.seen_ids:
+                return
+            self.seen_ids.add(statement_id)
+        self._page.append(values)
+        if len(self._page) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Convert the current page into a new typed columnar chunk."""
+        if not self._page:
+            return
+        ids, timestamps, objects, names, actors, events, scores, stored = zip(
+            *self._page
+        )
+        self._chunks.append(
+            {
+                ID: np.array(ids, dtype=object),
+                # Timestamps are stored as naive UTC datetimes
+                TIMESTAMP: pd.to_datetime(
+                    list(timestamps), format="ISO8601", errors="raise", utc=True
+                )
+                .tz_localize(None)
+                .to_numpy(),
+                OBJECT_ID: np.array(objects, dtype=object),
+                OBJECT_NAME: np.array(names, dtype=object),
+                ACTOR: np.array(actors, dtype=object),
+                EVENT_NAME: np.array(events, dtype=object),
+                SCORE: np.array(scores, dtype=float),
+                # Stored timestamps are optional
+                STORED: pd.to_datetime(
+                    list(stored), format="ISO8601", errors="coerce", utc=True
+                )
+                .tz_localize(None)
+                .to_numpy(),
+            }
+        )
+        self._size += len(self._page)
+        self._page = []
+
+    @classmethod
+    def merge(
+        cls, accumulators: Iterable["StatementsAccumulator"]
+    ) -> "StatementsAccumulator":
+        """Merge accumulators chunks following the accumulators order."""
+        merged = cls()
+        for accumulator in accumulators:
+            accumulator.flush()
+            merged._chunks.extend(accumulator._chunks)
+            merged._size += accumulator._size
+            merged.voided |= accumulator.voided
+            accumulator._chunks = []
+            accumulator._size = 0
+        return merged
+
+    def to_frame(self) -> pd.DataFrame:
+        """Concatenate accumulated chunks into a single DataFrame.
+
+        Chunks are consumed column by column.
+        """
+        self.flush()
+        if not self._chunks:
+            return pd.DataFrame(columns=COLUMNS)
+        data = {
+            column: np.concatenate([chunk.pop(column) for chunk in self._chunks])
+            for column in COLUMNS
+        }
+        self._chunks = []
+        self._size = 0
+        frame = pd.DataFrame(data)
+        for column in DATETIME_COLUMNS:
+            frame[column] = frame[column].dt.tz_localize("UTC")
+        if self.voided:
+            frame = frame[~frame[ID].isin(self.voided)].reset_index(drop=True)
+        return frame
+
+
+EPOCH = date(1970, 1, 1)
+
+
+def to_epoch_day(value: date) -> int:
+    """Return the number of days elapsed since the epoch for a date."""
+    return (value - EPOCH).days
+
+
+def from_epoch_day(value: int) -> date:
+    """Return the date of an epoch day."""
+    return EPOCH + timedelta(days=int(value))
+
+
+# Encoded statements columns and lookup indexes of a StatementFrame
+STATEMENT_FRAME_COLUMNS = ("actor", "action", "name", "module_type", "day", "score")
+# Columns identifying a daily fact: a student made an action on a day
+FACT_COLUMNS = ["actor", "action", "name", "module_type", "day"]
+LOOKUPS = ("actors", "actions", "names", "module_types")
+
+
+class StatementFrame:
+    """Dictionary-encoded statements shared by TdBP indicators.
+
+    Actors, actions IRI, actions name and module types are stored as integer codes
+    referring to sorted lookup indexes (hence codes order follows values order),
+    timestamps are reduced to UTC epoch days and scores are kept as floats:
+
+        - `actor` (int32): actor account name code (see `actors`),
+        - `action` (int32): object IRI code (see `actions`),
+        - `name` (int32): object name code (see `names`), -1 if missing,
+        - `module_type` (int32): event name code (see `module_types`), -1 if
+          missing,
+        - `day` (int32): statement epoch day,
+        - `score` (float64): scaled score, NaN if missing.
+
+    Statements are rolled up into daily facts: a single row is kept for each
+    (actor, action, name, module type, day), indicators only depending on whether
+    a student made an action on a given day and on its latest score.
+
+    Strings are only expected to be decoded when building indicators responses.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        data: pd.DataFrame,
+        actors: pd.Index,
+        actions: pd.Index,
+        names: pd.Index,
+        module_types: pd.Index,
+    ):
+        """Initialize the frame from encoded data and lookup indexes."""
+        self.data = data
+        self.actors = actors
+        self.actions = actions
+        self.names = names
+        self.module_types = module_types
+
+    def __len__(self) -> int:
+        """Return the number of statements."""
+        return len(self.data)
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "StatementFrame":
+        """Encode projected statements (see `StatementsAccumulator.to_frame`).
+
+        Statements without actor or object cannot be attributed and are dropped.
+        """
+        actor_codes, actors = pd.factorize(frame[ACTOR], sort=True)
+        action_codes, actions = pd.factorize(frame[OBJECT_ID], sort=True)
+        name_codes, names = pd.factorize(frame[OBJECT_NAME], sort=True)
+        module_type_codes, module_types = pd.factorize(frame[EVENT_NAME], sort=True)
+        days = (
+            frame[TIMESTAMP]
+            .dt.tz_convert(None)
+            .to_numpy()
+            .astype("datetime64[D]")
+            .astype(np.int64)
+        )
+
+        mask = (actor_codes >= 0) & (action_codes >= 0) & frame[TIMESTAMP].notna()
+        data = pd.DataFrame(
+            {
+                "actor": actor_codes[mask].astype(np.int32),
+                "action": action_codes[mask].astype(np.int32),
+                "name": name_codes[mask].astype(np.int32),
+                "module_type": module_type_codes[mask].astype(np.int32),
+                "day": days[mask].astype(np.int32),
+                "score": frame[SCORE].to_numpy(dtype=float)[mask],
+            }
+        )
+        timestamps = frame[TIMESTAMP].dt.tz_convert(None).to_numpy()[mask]
+        return cls(cls._rollup(data, timestamps), actors, actions, names, module_types)
+
+    @staticmethod
+    def _rollup(data: pd.DataFrame, timestamps: np.ndarray) -> pd.DataFrame:
+        """Roll encoded statements up into daily facts (see `FACT_COLUMNS`).
+
+        Facts follow the order of their first statement, so that orders derived
+        from statements order (e.g. students order) are preserved. The score of a
+        fact is the score of its most recent scored statement.
+        """
+        facts = data.groupby(FACT_COLUMNS, sort=False).ngroup().to_numpy()
+        _, first = np.unique(facts, return_index=True)
+        if len(first) == len(data):
+            return data
+
+        scores = np.full(len(first), np.nan)
+        scored = ~np.isnan(data["score"].to_numpy())
+        if scored.any():
+            scored_facts = facts[scored]
+            # Sort scored statements by fact, then timestamp: the last statement of
+            # each fact is the most recent one
+            order = np.lexsort((timestamps[scored].astype(np.int64), scored_facts))
+            scored_facts = scored_facts[order]
+            last = np.flatnonzero(
+                np.append(scored_facts[1:] != scored_facts[:-1], True)
+            )
+            scores[scored_facts[last]] = data["score"].to_numpy()[scored][order][last]
+
+        rolled = data.take(first).reset_index(drop=True)
+        rolled["score"] = scores
+        return rolled
+
+    @property
+    def nbytes(self) -> int:
+        """Return the memory footprint of the frame and its lookup indexes."""
+        return int(self.data.memory_usage(deep=True).sum()) + sum(
+            getattr(self, name).memory_usage(deep=True) for name in LOOKUPS
+        )
+
+    def dumps(self) -> bytes:
+        """Serialize the frame as a compressed NumPy archive."""
+        arrays: Dict[str, Any] = {
+            column: self.data[column].to_numpy() for column in self.data.columns
+        }
+        for name in LOOKUPS:
+            arrays[f"lookup_{name}"] = np.array(getattr(self, name).tolist(), dtype=str)
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def loads(cls, value: bytes) -> "StatementFrame":
+        """Deserialize a frame serialized with `dumps`."""
+        with np.load(io.BytesIO(value), allow_pickle=False) as archive:
+            data = pd.DataFrame(
+                {column: archive[column] for column in STATEMENT_FRAME_COLUMNS}
+            )
+            lookups = {
+                name: pd.Index(archive[f"lookup_{name}"].tolist(), dtype=object)
+                for name in LOOKUPS
+            }
+        return cls(data, **lookups)
+
+    def filter(self, mask) -> "StatementFrame":
+        """Return a frame restricted to statements matching a boolean mask.
+
+        Lookup indexes are shared with the original frame.
+        """
+        return self.__class__(
+            self.data[mask].reset_index(drop=True),
+            self.actors,
+            self.actions,
+            self.names,
+            self.module_types,
+        )
+
+    def actor_code(self, actor: str) -> int:
+        """Return the code of an actor, -1 if unknown."""
+        return int(self.actors.get_indexer([actor])[0])
+
+    def actor_codes(self, actors: Iterable[str]) -> np.ndarray:
+        """Return the codes of actors, -1 for unknown actors."""
+        return self.actors.get_indexer(list(actors))
+
+    def action_codes(self, iris: Iterable[str]) -> np.ndarray:
+        """Return the codes of actions IRI, -1 for unknown IRI."""
+        return self.actions.get_indexer(list(iris))
+
+    def decode_actors(self, codes) -> List[str]:
+        """Return actors account names given their codes."""
+        return self.actors[codes].tolist()
+
+    def decode_actions(self, codes) -> List[str]:
+        """Return actions IRI given their codes."""
+        return self.actions[codes].tolist()
+
+    # Aggregations used by indicators. Results are plain pandas or NumPy objects
+    # so that alternative compute engines only have to override these methods.
+
+    def students_since(self, day: int) -> np.ndarray:
+        """Return codes of students active since an epoch day, in statements order."""
+        data = self.data
+        return data["actor"][data["day"] >= day].unique()
+
+    def activations(self, action_codes) -> pd.DataFrame:
+        """Return the activation of actions, indexed by action code.
+
+        Columns are the first statement `day` and the codes of distinct students
+        who made the action (`activators`), in statements order.
+        """
+        data = self.data
+        statements = data.loc[data["action"].isin(action_codes)]
+        activators = statements.drop_duplicates(["action", "actor"])
+        return pd.concat(
+            [
+                statements.groupby("action")["day"].min(),
+                activators.groupby("action")["actor"].agg(list).rename("activators"),
+            ],
+            axis=1,
+        )
+
+    def bitmaps(self, action_codes) -> StudentBitmaps:
+        """Return bitmaps of students who made actions, one row per action code."""
+        action_codes = np.asarray(action_codes, dtype=np.int64)
+        rows = np.full(len(self.actions), -1, dtype=np.int64)
+        rows[action_codes] = np.arange(len(action_codes))
+        data = self.data
+        statements = data[data["action"].isin(action_codes)]
+        bitmaps = StudentBitmaps(len(action_codes), len(self.actors))
+        bitmaps.add(rows[statements["action"].to_numpy()], statements["actor"])
+        return bitmaps
+
+
+def get_statement_frame_class() -> Type[StatementFrame]:
+    """Return the statements frame class of the configured compute engine."""
+    if settings.COMPUTE_ENGINE == "polars":
+        from .polars_engine import PolarsStatementFrame
+
+        return PolarsStatementFrame
+    return StatementFrame
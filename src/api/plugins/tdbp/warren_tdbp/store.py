@@ -0,0 +1,265 @@
+"""Incremental store of course statements for TdBP indicators."""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set
+from uuid import uuid4
+
+import numpy as np
+import pandas as pd
+
+from .conf import settings
+from .statements import COLUMNS, DATETIME_COLUMNS, ID, SCORE, STORED, TIMESTAMP
+
+logger = logging.getLogger(__name__)
+
+METADATA = "metadata.json"
+LOCK = ".lock"
+
+
+class StoredStatements(NamedTuple):
+    """Content of a course statements store.
+
+    Attributes:
+        frame (pd.DataFrame): projected statements (see `COLUMNS`), following
+            their ingestion order.
+        watermark (datetime): most recent LRS storage date of ingested statements,
+            None if no statement has been ingested.
+        actions (set): course actions whose statements have been ingested.
+        voided (set): identifiers of statements known to be voided.
+        created_at (datetime): date of the last full ingestion.
+    """
+
+    frame: pd.DataFrame
+    watermark: Optional[datetime]
+    actions: Set[str]
+    voided: Set[str]
+    created_at: datetime
+
+
+def get_watermark(frame: pd.DataFrame) -> Optional[datetime]:
+    """Return the most recent storage date of projected statements.
+
+    Statements lacking a storage date fall back to their timestamp.
+    """
+    watermark = frame[STORED].fillna(frame[TIMESTAMP]).max() if len(frame) else None
+    return None if pd.isna(watermark) else watermark.to_pydatetime()
+
+
+class StatementStore:
+    """Store projected statements of a course in compressed NumPy segments.
+
+    The store of a course is a directory (named after a digest of the course
+    identifier) holding a `metadata.json` file and `segment-*.npz` files, each
+    segment holding statements ingested at once. Files are written atomically, so
+    that concurrent readers never see partial writes. Segments are compacted
+    once there are more than `settings.STATEMENT_STORE_MAX_SEGMENTS`.
+
+    Writers (API workers or precompute workers refreshing the same course) hold an
+    exclusive lock on the course store while updating its metadata and segments,
+    readers a shared one, so that a segment is never removed while it is still
+    referenced. As concurrent writers may append the same statements, statements
+    are de-duplicated by identifier when loading the store.
+
+    Voided statements are handled in two ways: voiding statements returned by
+    incremental fetches are recorded and the statements they void are filtered
+    out when loading the store, and the store is regularly rebuilt from scratch to
+    drop statements whose voiding statement cannot be fetched (see
+    `settings.STATEMENT_STORE_REBUILD_INTERVAL`).
+    """
+
+    def __init__(self, root: Path, course_id: str):
+        """Initialize the store of a course."""
+        self.course_id = course_id
+        self.path = Path(root) / hashlib.sha256(course_id.encode()).hexdigest()[:32]
+
+    @contextmanager
+    def _lock(self, shared: bool = False) -> Iterator[None]:
+        """Hold the store lock, shared for readers and exclusive for writers."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        with (self.path / LOCK).open("a") as file:
+            fcntl.flock(file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def _write(self, name: str, write):
+        """Atomically write a file of the store given a writing function."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        temporary = self.path / f".{name}.{uuid4().hex}.tmp"
+        with temporary.open("wb") as file:
+            write(file)
+        os.replace(temporary, self.path / name)
+
+    def _read_metadata(self) -> Optional[dict]:
+        """Read the store metadata, None if the store does not exist."""
+        try:
+            return json.loads((self.path / METADATA).read_text())
+        except FileNotFoundError:
+            return None
+
+    def _write_segment(self, frame: pd.DataFrame) -> str:
+        """Write statements in a new segment and return its name."""
+        arrays: Dict[str, Any] = {}
+        for index, column in enumerate(COLUMNS):
+            values = frame[column]
+            if column in DATETIME_COLUMNS:
+                arrays[f"c{index}"] = values.dt.tz_convert(None).to_numpy()
+            elif column == SCORE:
+                arrays[f"c{index}"] = values.to_numpy(dtype=float)
+            else:
+                missing = values.isna().to_numpy()
+                arrays[f"c{index}"] = values.fillna("").to_numpy(dtype=str)
+                arrays[f"m{index}"] = missing
+        name = f"segment-{uuid4().hex}.npz"
+        self._write(name, lambda file: np.savez_compressed(file, **arrays))
+        return name
+
+    def _read_segment(self, name: str) -> pd.DataFrame:
+        """Read statements of a segment."""
+        data: Dict[str, Any] = {}
+        with np.load(self.path / name, allow_pickle=False) as archive:
+            for index, column in enumerate(COLUMNS):
+                values = archive[f"c{index}"]
+                if column in DATETIME_COLUMNS:
+                    data[column] = pd.Series(values).dt.tz_localize("UTC")
+                elif column == SCORE:
+                    data[column] = values
+                else:
+                    data[column] = np.where(
+                        archive[f"m{index}"], None, values.astype(object)
+                    )
+        return pd.DataFrame(data)
+
+    def _read_segments(self, names: List[str]) -> pd.DataFrame:
+        """Read and concatenate statements of segments."""
+        frames = [self._read_segment(name) for name in names]
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return pd.DataFrame(columns=COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+    def load(self) -> Optional[StoredStatements]:
+        """Load stored statements, None if the store does not exist or is corrupted.
+
+        Voided statements are filtered out.
+        """
+        if not self.path.exists():
+            return None
+        with self._lock(shared=True):
+            metadata = self._read_metadata()
+            if metadata is None:
+                return None
+            try:
+                frame = self._read_segments(metadata["segments"])
+            except (OSError, ValueError, KeyError) as error:
+                logger.warning(
+                    "Statements store of %s is corrupted: %s", self.path, error
+                )
+                return None
+
+        voided = set(metadata["voided"])
+        duplicated = frame[ID].notna() & frame[ID].duplicated()
+        if voided or duplicated.any():
+            frame = frame[~frame[ID].isin(voided) & ~duplicated].reset_index(drop=True)
+        watermark = metadata["watermark"]
+        return StoredStatements(
+            frame=frame,
+            watermark=datetime.fromisoformat(watermark) if watermark else None,
+            actions=set(metadata["actions"]),
+            voided=voided,
+            created_at=datetime.fromisoformat(metadata["created_at"]),
+        )
+
+    def read_watermark(self) -> Optional[datetime]:
+        """Read the store watermark without loading statements.
+
+        Returns:
+            The watermark, None if the store does not exist or is empty.
+        """
+        if not self.path.exists():
+            return None
+        with self._lock(shared=True):
+            metadata = self._read_metadata()
+        if metadata is None or not metadata["watermark"]:
+            return None
+        return datetime.fromisoformat(metadata["watermark"])
+
+    def write(
+        self,
+        frame: pd.DataFrame,
+        actions: Iterable[str],
+        voided: Iterable[str],
+        replace: bool = False,
+    ):
+        """Append newly ingested statements to the store.
+
+        Args:
+            frame (pd.DataFrame): projected statements (see `COLUMNS`).
+            actions (iterable): course actions whose statements have been ingested.
+            voided (iterable): identifiers of newly voided statements.
+            replace (bool): whether statements replace the store content (full
+                ingestion) instead of being appended to it.
+        """
+        with self._lock():
+            self._update(frame, actions, voided, replace)
+
+    def _update(
+        self,
+        frame: pd.DataFrame,
+        actions: Iterable[str],
+        voided: Iterable[str],
+        replace: bool,
+    ):
+        """Update the store metadata and segments, holding the store lock."""
+        metadata = self._read_metadata()
+        previous = metadata["segments"] if metadata else []
+        if metadata is None or replace:
+            metadata = {
+                "course_id": self.course_id,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "watermark": None,
+                "actions": [],
+                "voided": [],
+                "segments": [],
+            }
+
+        segments = list(metadata["segments"])
+        if len(frame):
+            if len(segments) >= settings.STATEMENT_STORE_MAX_SEGMENTS:
+                # Compact segments
+                frame = pd.concat(
+                    [self._read_segments(segments), frame], ignore_index=True
+                )
+                segments = []
+            segments.append(self._write_segment(frame))
+
+        watermarks = [
+            watermark
+            for watermark in (
+                get_watermark(frame),
+                datetime.fromisoformat(metadata["watermark"])
+                if metadata["watermark"]
+                else None,
+            )
+            if watermark is not None
+        ]
+        metadata.update(
+            {
+                "watermark": max(watermarks).isoformat() if watermarks else None,
+                "actions": sorted(set(metadata["actions"]) | set(actions)),
+                "voided": sorted(set(metadata["voided"]) | set(voided)),
+                "segments": segments,
+            }
+        )
+        self._write(METADATA, lambda file: file.write(json.dumps(metadata).encode()))
+
+        for name in set(previous) - set(segments):
+            (self.path / name).unlink(missing_ok=True)
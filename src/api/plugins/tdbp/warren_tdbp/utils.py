@@ -1,28 +1,105 @@
 """Utils for TdbP."""
 
+import asyncio
+import json
 import logging
-from typing import List
+from enum import Enum
+from typing import (
+    Any,
+    Coroutine,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Type,
+    cast,
+    get_args,
+)
 
-from pydantic import ValidationError
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, ValidationError
+from pydantic.fields import ModelField
+from pydantic.json import pydantic_encoder
 
 logger = logging.getLogger(__name__)
 
 
-def dataframe_to_pydantic(model_class, dataframe):
-    """Convert a dataframe to a list of Pydantic model instances."""
-    columns = model_class.__annotations__.keys()
-    existing_columns = [col for col in columns if col in dataframe.columns]
+def _enum_members(field: ModelField) -> Optional[Dict[Any, Enum]]:
+    """Return members of enumerations accepted by a model field, by value.
+
+    Return None if the field does not only accept enumeration members.
+    """
+    types = get_args(field.outer_type_) or (field.outer_type_,)
+    if not all(isinstance(type_, type) and issubclass(type_, Enum) for type_ in types):
+        return None
+    return {member.value: member for type_ in types for member in type_}
+
+
+def dataframe_to_pydantic(
+    model_class: Type[BaseModel], dataframe: pd.DataFrame, trusted: bool = False
+) -> List[BaseModel]:
+    """Convert a dataframe to a list of Pydantic model instances.
+
+    Rows lacking a required value, or having a value outside accepted enumerations
+    members, are rejected at once and reported in a single warning.
+
+    Args:
+        model_class (Type[BaseModel]): Pydantic model to instantiate for each row.
+        dataframe (pd.DataFrame): dataframe whose columns match model fields.
+        trusted (bool): whether remaining rows are trusted to have valid types. If
+            so, instances are constructed without validation, enumerations values
+            being mapped to their members.
+
+    Returns:
+        List[BaseModel]: model instances, following dataframe rows order.
+    """
+    columns = [name for name in model_class.__fields__ if name in dataframe.columns]
+    rejected = np.zeros(len(dataframe), dtype=bool)
+    values = {}
+    for name, field in model_class.__fields__.items():
+        if name not in dataframe.columns:
+            rejected |= field.required
+            continue
+        column = dataframe[name]
+        if field.required and not field.allow_none:
+            rejected |= column.isna().to_numpy()
+        members = _enum_members(field)
+        if members is not None:
+            rejected |= (column.notna() & ~column.isin(list(members))).to_numpy()
+            if trusted:
+                values[name] = column.map(members)
+
+    if rejected.any():
+        logger.warning(
+            "Could not convert %d dataframe rows to %s: %s",
+            rejected.sum(),
+            model_class.__name__,
+            dataframe.index[rejected].tolist(),
+        )
+
+    records = cast(
+        List[Dict[str, Any]],
+        dataframe[columns].assign(**values).loc[~rejected].to_dict(orient="records"),
+    )
+    if trusted:
+        return [model_class.construct(**record) for record in records]
 
     model = []
-    for _, row in dataframe.iterrows():
+    errors = []
+    for record in records:
         try:
-            row_dict = {col: row[col] for col in existing_columns}
-            # Create an instance of the model class
-            model_instance = model_class(**row_dict)
-            model.append(model_instance)
-        except ValidationError as e:
-            logger.warning("Could not convert dataframe to pydantic: %s", e)
-            continue
+            model.append(model_class(**record))
+        except ValidationError as error:
+            errors.append(error)
+    if errors:
+        logger.warning(
+            "Could not convert %d dataframe rows to %s: %s",
+            len(errors),
+            model_class.__name__,
+            errors,
+        )
     return model
 
 
@@ -37,3 +114,51 @@ def is_instructor(roles: List[str]):
         `staff`, otherwise False.
     """
     return any(role in ["instructor", "teacher", "staff"] for role in roles)
+
+
+async def gather_or_cancel(*coroutines: Coroutine) -> List[Any]:
+    """Run coroutines concurrently and return their results in the given order.
+
+    Contrary to `asyncio.gather`, remaining coroutines are cancelled as soon as one
+    of them raises an exception, which is then propagated.
+    """
+    tasks = [asyncio.create_task(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def iter_ndjson(
+    header: Dict[str, Any], rows: Iterable[Dict[str, Any]]
+) -> Iterator[str]:
+    """Serialize a header record followed by row records as newline-delimited JSON.
+
+    Records are serialized one at a time as rows are produced, Pydantic models,
+    enumerations and dates being encoded as in JSON responses.
+    """
+    yield json.dumps(header, default=pydantic_encoder) + "\n"
+    for row in rows:
+        yield json.dumps(row, default=pydantic_encoder) + "\n"
+
+
+def dumps_compact(payload: Dict[str, Any], msgpack: bool = False) -> bytes:
+    """Serialize a compact payload as JSON, or MessagePack if `msgpack` is set.
+
+    Pydantic models, enumerations and dates are encoded as in JSON responses.
+
+    Raises:
+        ImportError: if MessagePack is requested but the msgpack optional
+            dependency is not installed.
+    """
+    if not msgpack:
+        return json.dumps(payload, default=pydantic_encoder).encode()
+    try:
+        import msgpack as _msgpack
+    except ImportError as error:
+        raise ImportError(
+            "MessagePack responses require the msgpack optional dependency, "
+            "install it with: pip install warren-tdbp[msgpack]"
+        ) from error
+    return _msgpack.packb(payload, default=pydantic_encoder)
@@ -0,0 +1,279 @@
+"""Sliding window search for TdBP indicators."""
+
+from functools import cached_property
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .bitmaps import StudentBitmaps
+from .statements import StatementFrame
+
+# Columns identifying a candidate action
+ACTION_KEYS = ["action", "name", "module_type"]
+
+# Cut-off day of searches among all statements
+NEVER = 2**63 - 1
+
+
+class WindowSearchResult(NamedTuple):
+    """Result of a sliding window search.
+
+    Attributes:
+        since (int): epoch day when the sliding window starts.
+        active_actions (pd.DataFrame): active actions codes (see `ACTION_KEYS`),
+            following their activation order.
+        cohort (np.ndarray): codes of students active during the sliding window,
+            following statements order.
+    """
+
+    since: int
+    active_actions: pd.DataFrame
+    cohort: np.ndarray
+
+
+class WindowHistoryResult(NamedTuple):
+    """Result of a sliding window search of a `WindowHistorySearch`.
+
+    Attributes:
+        since (int): epoch day when the sliding window starts.
+        active_actions (pd.DataFrame): active actions codes (see `ACTION_KEYS`),
+            following their activation order.
+        cohort_size (int): number of students active during the sliding window.
+    """
+
+    since: int
+    active_actions: pd.DataFrame
+    cohort_size: int
+
+
+def _activate(  # noqa: PLR0913
+    counts: np.ndarray,
+    cohort_size: int,
+    dynamic_cohort_min: int,
+    candidates_actions: np.ndarray,
+    is_active_action: np.ndarray,
+    active: List[int],
+):
+    """Activate candidate actions made by enough students of the window."""
+    qualified = np.flatnonzero(
+        (0.1 * cohort_size <= counts)
+        & (counts >= dynamic_cohort_min)
+        & ~is_active_action[candidates_actions]
+    )
+    # Keep the first qualified candidate of each action
+    _, first = np.unique(candidates_actions[qualified], return_index=True)
+    for candidate in qualified[np.sort(first)]:
+        active.append(candidate)
+        is_active_action[candidates_actions[candidate]] = True
+
+
+def find_sliding_window(
+    statements: StatementFrame,
+    until: int,
+    sliding_window_min: int,
+    active_actions_min: int,
+    dynamic_cohort_min: int,
+) -> Optional[WindowSearchResult]:
+    """Search the shortest sliding window having enough active actions.
+
+    The window grows backwards from `until - sliding_window_min`, one day at a
+    time, until at least `active_actions_min` actions have been active. An action
+    becomes active as soon as it has been made by at least `dynamic_cohort_min`
+    students representing at least 10% of the students active in the window.
+    Actions lacking a name or a module type cannot be active actions. An action
+    can be recorded with a single (name, module type) pair: the first one (in
+    codes order) reaching the activation threshold.
+
+    As the window only grows, students active in the window and students who made
+    each (action, name, module type) candidate in the window only grow as well:
+    they are kept as bitmaps, united with the students of each day entering the
+    window, and counted with popcounts (see `WindowHistorySearch`). A step thus
+    only depends on the statements of the entering day, not on the number of
+    statements in the window, which makes the search O(N) instead of O(days x N)
+    for N statements.
+
+    Returns:
+        WindowSearchResult: the sliding window, or None if no sliding window
+            satisfies requirements.
+    """
+    search = WindowHistorySearch(
+        statements, sliding_window_min, active_actions_min, dynamic_cohort_min
+    )
+    result = search.search(until, NEVER)
+    if result is None:
+        return None
+    return WindowSearchResult(
+        since=result.since,
+        active_actions=result.active_actions,
+        cohort=statements.students_since(result.since),
+    )
+
+
+class WindowHistorySearch:
+    """Sliding window searches until successive days, among statements before them.
+
+    Searching the sliding window until a day among statements of previous days is
+    the search of `find_sliding_window`. Daily facts of statements (one per
+    student, action, name, module type and day) are sorted once by decreasing
+    day. Each search then steps back from its cut-off day, finding facts of the
+    day entering the window by bisection and adding their students to the bitmap
+    of the students active in the window and to the bitmaps of the candidates
+    they made (see `StudentBitmaps`): the window bitmaps are the unions of the
+    (candidate, day) bitmaps of its days, which are never materialized. Cohort
+    size and candidates activators counts are popcounts of these bitmaps, only
+    updated for the candidates made on the entering day, so that statements are
+    never filtered nor aggregated again.
+
+    Activations of actions are computed from the first day each student made each
+    action.
+    """
+
+    def __init__(
+        self,
+        statements: StatementFrame,
+        sliding_window_min: int,
+        active_actions_min: int,
+        dynamic_cohort_min: int,
+    ):
+        """Sort daily facts of the searches."""
+        self.sliding_window_min = sliding_window_min
+        self.active_actions_min = active_actions_min
+        self.dynamic_cohort_min = dynamic_cohort_min
+        self.actions_count = len(statements.actions)
+        self.students_count = len(statements.actors)
+        self.statements = statements
+
+        data = statements.data
+        self.min_day = int(data["day"].min()) if len(data) else NEVER
+        # Days are negated so that facts entering the window are found by bisection
+        days = data["day"].to_numpy(dtype=np.int64)
+        order = np.argsort(-days, kind="stable")
+        self.days = -days[order]
+        self.students = data["actor"].to_numpy()[order]
+
+        # Candidate of each fact, -1 for facts lacking a name or a module type
+        facts = data.iloc[order]
+        described = ((facts["name"] >= 0) & (facts["module_type"] >= 0)).to_numpy()
+        candidates = facts.loc[described, ACTION_KEYS]
+        codes = candidates.groupby(ACTION_KEYS).ngroup().to_numpy()
+        self.keys = (
+            candidates.assign(candidate=codes)
+            .drop_duplicates("candidate")
+            .set_index("candidate")[ACTION_KEYS]
+            .sort_index()
+        )
+        self.candidates_actions = self.keys["action"].to_numpy()
+        self.candidates = np.full(len(order), -1, dtype=np.int64)
+        self.candidates[described] = codes
+
+    @cached_property
+    def activators(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the first day each student made each action.
+
+        Returns:
+            The action, student and first day of each (action, student), sorted by
+            action and day.
+        """
+        activators = (
+            self.statements.data.groupby(["action", "actor"])["day"]
+            .min()
+            .reset_index()
+            .sort_values(["action", "day"], kind="stable")
+        )
+        return (
+            activators["action"].to_numpy(),
+            activators["actor"].to_numpy(),
+            activators["day"].to_numpy(),
+        )
+
+    def search(self, until: int, before: int) -> Optional[WindowHistoryResult]:
+        """Search the sliding window until an epoch day (see `find_sliding_window`).
+
+        Args:
+            until (int): epoch day when the sliding window ends.
+            before (int): epoch day before which statements are searched (`NEVER`
+                to search among all statements).
+
+        Returns:
+            WindowHistoryResult: the sliding window, or None if no sliding window
+                satisfies requirements.
+        """
+        since = until - self.sliding_window_min
+        if self.min_day >= before or since < self.min_day:
+            return None
+
+        cohort = StudentBitmaps(1, self.students_count)
+        window = StudentBitmaps(len(self.keys), self.students_count)
+        counts = np.zeros(len(self.keys), dtype=np.int64)
+        is_active_action = np.zeros(self.actions_count, dtype=bool)
+        active: list = []
+        cohort_size = 0
+        # Facts of days after the cut-off are skipped
+        position = int(np.searchsorted(self.days, -before, side="right"))
+
+        while since >= self.min_day:
+            # Add students of the facts entering the window
+            end = int(np.searchsorted(self.days, -since, side="right"))
+            if end > position:
+                students = self.students[position:end]
+                candidates = self.candidates[position:end]
+                described = candidates >= 0
+                cohort.add(np.zeros(len(students), dtype=np.int64), students)
+                window.add(candidates[described], students[described])
+                touched = np.unique(candidates[described])
+                counts[touched] = window.count(touched)
+                cohort_size = int(cohort.count()[0])
+                position = end
+
+            if cohort_size:
+                _activate(
+                    counts,
+                    cohort_size,
+                    self.dynamic_cohort_min,
+                    self.candidates_actions,
+                    is_active_action,
+                    active,
+                )
+
+                if len(active) >= self.active_actions_min:
+                    return WindowHistoryResult(
+                        since=since,
+                        active_actions=self.keys.loc[active].reset_index(drop=True),
+                        cohort_size=cohort_size,
+                    )
+
+            since -= 1  # step back from one day
+
+        return None
+
+    def activations(self, action_codes, before: int, student: int) -> pd.DataFrame:
+        """Return the activation of actions among statements before an epoch day.
+
+        Columns are the first statement `day`, the number of distinct `students`
+        who made the action and whether a student code is one of them
+        (`is_activator`), following action codes order.
+        """
+        activators_actions, activators_students, activators_days = self.activators
+        action_codes = np.asarray(action_codes, dtype=np.int64)
+        starts = np.asarray(np.searchsorted(activators_actions, action_codes))
+        ends = np.asarray(
+            np.searchsorted(activators_actions, action_codes, side="right")
+        )
+        students = [
+            int(np.searchsorted(activators_days[starts[i] : ends[i]], before))
+            for i in range(len(action_codes))
+        ]
+        activators = [
+            activators_students[starts[i] : starts[i] + students[i]]
+            for i in range(len(action_codes))
+        ]
+        return pd.DataFrame(
+            {
+                "day": activators_days[starts],
+                "students": students,
+                "is_activator": [
+                    bool(np.any(codes == student)) for codes in activators
+                ],
+            }
+        )